@@ -1,5 +1,6 @@
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework import serializers
+from main.middleware import TimedModelSerializer
 from django.contrib.auth import get_user_model
 from account.models import Grade
 
@@ -7,7 +8,7 @@ from account.models import Grade
 User = get_user_model()
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(TimedModelSerializer):
     class Meta:
         model = User
         fields = [
@@ -32,13 +33,13 @@ class ProfileSerializer(serializers.ModelSerializer):
         return instance
 
 
-class UpdateProfileSerializer(serializers.ModelSerializer):
+class UpdateProfileSerializer(TimedModelSerializer):
     class Meta:
         model = User
         fields = ["username", "first_name", "last_name", "grade"]
 
 
-class UpdateProfilePictureSerializer(serializers.ModelSerializer):
+class UpdateProfilePictureSerializer(TimedModelSerializer):
     class Meta:
         model = User
         fields = ["picture"]
@@ -77,19 +78,19 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         return add_custom_claims(user, token)
 
 
-class GradeSerializer(serializers.ModelSerializer):
+class GradeSerializer(TimedModelSerializer):
     class Meta:
         model = Grade
         fields = ["id", "name"]
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedModelSerializer):
     class Meta:
         model = User
         fields = "__all__"
 
 
-class UserSerializerList(serializers.ModelSerializer):
+class UserSerializerList(TimedModelSerializer):
     grade = GradeSerializer()
 
     class Meta:
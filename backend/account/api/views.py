@@ -1,9 +1,10 @@
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework import viewsets, permissions, generics, pagination, filters
+from rest_framework import viewsets, permissions, generics, filters
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from account.models import Grade
+from main.pagination import HybridPagination
 from .serializers import (
     MyTokenObtainPairSerializer,
     GradeSerializer,
@@ -108,14 +109,16 @@ class GradeViewSet(viewsets.ModelViewSet):
         return (permission() for permission in permission_classes)
 
 
-class UserPagination(pagination.PageNumberPagination):
-    page_szie = 20
-    page_size_query_param = "per_page"
-    max_page_size = 10000
+class UserPagination(HybridPagination):
+    pass
 
 
 class UserViewsSet(viewsets.ModelViewSet):
-    queryset = User.objects.order_by("first_name")
+    queryset = (
+        User.objects.select_related("grade")
+        .prefetch_related("groups", "user_permissions")
+        .order_by("first_name")
+    )
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]
     pagination_class = UserPagination
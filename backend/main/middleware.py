@@ -0,0 +1,150 @@
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger(__name__)
+
+# Per request query count, database time, serializer time, render time and
+# view time of a sample of the requests, logged as one JSON line. Staff users and
+# INTERNAL_IPS also get them in a Server-Timing header, other clients never
+# see them. Enabled by SERVER_TIMING, SERVER_TIMING_SAMPLE_RATE is the share
+# of the requests that are measured. The times of streaming responses stop
+# when the response starts.
+
+_current = threading.local()
+
+
+class RequestTimings:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.serializing = False
+        self.view_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - started
+
+
+class TimedSerializerMixin:
+    # Adds the time spent turning instances into data, queries included, to
+    # the timings of the request. Nested serializers run inside the outermost
+    # one and are not counted again.
+    def to_representation(self, instance):
+        timings = getattr(_current, "timings", None)
+        if timings is None or timings.serializing:
+            return super().to_representation(instance)
+        timings.serializing = True
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timings.serializing = False
+            timings.serialize += time.perf_counter() - started
+
+
+class TimedModelSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    pass
+
+
+class TimedJSONRenderer(JSONRenderer):
+    # Default DRF renderer, adds the time spent encoding the response to the
+    # timings of the request.
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        timings = getattr(_current, "timings", None)
+        started = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            if timings is not None:
+                timings.render += time.perf_counter() - started
+
+
+def shows_timings(request) -> bool:
+    # DRF sets the user it authenticated on the Django request too
+    user = getattr(request, "user", None)
+    return (
+        getattr(user, "is_staff", False)
+        or request.META.get("REMOTE_ADDR") in settings.INTERNAL_IPS
+    )
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.SERVER_TIMING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        _current.timings = timings
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            _current.timings = None
+        finished = time.perf_counter()
+
+        metrics = {
+            "db": timings.db * 1000,
+            "serialize": timings.serialize * 1000,
+            "render": timings.render * 1000,
+            "view": (
+                (finished - timings.view_started) * 1000
+                if timings.view_started
+                else 0.0
+            ),
+            "total": (finished - started) * 1000,
+        }
+        if shows_timings(request):
+            response["Server-Timing"] = ", ".join(
+                [
+                    f'db;dur={metrics["db"]:.1f};desc="{timings.queries} queries"',
+                    *(
+                        f"{name};dur={metrics[name]:.1f}"
+                        for name in ("serialize", "render", "view", "total")
+                    ),
+                ]
+            )
+        logger.info(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "view": getattr(request.resolver_match, "view_name", None),
+                    "status": response.status_code,
+                    "queries": timings.queries,
+                    **{
+                        f"{name}_ms": round(value, 1) for name, value in metrics.items()
+                    },
+                }
+            )
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = getattr(_current, "timings", None)
+        if timings is not None:
+            timings.view_started = time.perf_counter()
@@ -0,0 +1,141 @@
+import json
+from datetime import datetime, time
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+# Page number pagination that switches to keyset pagination when the request
+# has a ``cursor`` parameter (an empty one for the first page). Keyset pages
+# continue after the sort values of the last row, on the queryset ordering
+# plus id, so they never COUNT(*) and never use OFFSET.
+
+
+def estimate_count(queryset) -> int:
+    # The planner's row estimate on PostgreSQL, an exact count elsewhere
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder cuts times to milliseconds, the next page would then
+    # repeat or skip rows sorted by a time inside the same millisecond
+    def default(self, o):
+        if isinstance(o, (datetime, time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class HybridPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "per_page"
+    max_page_size = 10000
+    cursor_query_param = "cursor"
+    estimate_query_param = "estimate"
+    estimate_header = "X-Estimated-Count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+        self.page_size_value = self.get_page_size(request) or self.page_size
+        self.estimated_count = (
+            estimate_count(queryset)
+            if request.query_params.get(self.estimate_query_param)
+            else None
+        )
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.after(self.decode_cursor(cursor)))
+        rows = list(queryset.order_by(*self.ordering)[: self.page_size_value + 1])
+
+        self.has_next = len(rows) > self.page_size_value
+        rows = rows[: self.page_size_value]
+        self.last_values = (
+            [self.sort_value(rows[-1], field) for field in self.ordering]
+            if rows
+            else None
+        )
+        return rows
+
+    def get_ordering(self, queryset) -> list:
+        ordering = [
+            field
+            for field in queryset.query.order_by or queryset.model._meta.ordering
+            if isinstance(field, str)
+        ]
+        if not any(field.lstrip("-") in ("id", "pk") for field in ordering):
+            ordering.append("id")
+        return ordering
+
+    @staticmethod
+    def sort_value(row, field):
+        value = row
+        for name in field.lstrip("-").split("__"):
+            value = getattr(value, name)
+        return value
+
+    def after(self, values) -> Q:
+        # (a, b, id) > (x, y, z) taking the direction of every column into
+        # account: a > x OR (a = x AND b > y) OR (a = x AND b = y AND id > z)
+        if len(values) != len(self.ordering):
+            raise NotFound("Invalid cursor")
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return condition
+
+    def encode_cursor(self, values) -> str:
+        data = json.dumps(values, cls=CursorEncoder).encode()
+        return urlsafe_b64encode(data).decode().rstrip("=")
+
+    def decode_cursor(self, cursor) -> list:
+        try:
+            data = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            values = json.loads(data)
+        except ValueError:
+            raise NotFound("Invalid cursor")
+        if not isinstance(values, list):
+            raise NotFound("Invalid cursor")
+        return values
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), "page")
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.last_values)
+        )
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        headers = {}
+        if self.estimated_count is not None:
+            headers[self.estimate_header] = str(self.estimated_count)
+        return Response(
+            {"next": self.get_next_link(), "previous": None, "results": data},
+            headers=headers,
+        )
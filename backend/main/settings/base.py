@@ -35,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "main.middleware.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -73,15 +74,17 @@ DATABASES = {"default": {}}
 
 
 # Cache settings
-# CACHES = {
-#     "default": {
-#         "BACKEND": "django_redis.cache.RedisCache",
-#         "LOCATION": os.environ['REDIS_URL'],
-#         "OPTIONS": {
-#             "CLIENT_CLASS": "django_redis.client.DefaultClient",
-#         }
-#     }
-# }
+# Quiz blueprints, question pools, visibility and admission tickets are
+# invalidated by deleting their keys, which only reaches every worker when
+# they share one cache. Without REDIS_URL each process keeps its own cache,
+# which is only right for a single process like the development server.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
 
 
 # Password validation
@@ -140,6 +143,10 @@ REST_FRAMEWORK = {
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
+    "DEFAULT_RENDERER_CLASSES": (
+        "main.middleware.TimedJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
 }
 
 
@@ -178,3 +185,32 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
+
+
+# quiz settings
+
+# "rows" stores one QuizInstanceOption per option of every attempt question,
+# "seed" stores a random seed on the attempt and derives the option order
+# from it when the attempt is read.
+QUIZ_ATTEMPT_STORAGE = os.environ.get("QUIZ_ATTEMPT_STORAGE", "rows")
+
+# Answers reach the leaderboard in one batch per process at most
+# QUIZ_LEADERBOARD_DELAY seconds after they are committed, 0 updates it right
+# after every commit.
+QUIZ_LEADERBOARD_DELAY = float(os.environ.get("QUIZ_LEADERBOARD_DELAY", 2))
+
+# When enabled, start-quiz answers with a ticket and attempts are built by a
+# pool of QUIZ_ADMISSION_WORKERS threads per process. At most
+# QUIZ_ADMISSION_MAX_DEPTH starts wait in the queue before new ones get 503.
+QUIZ_ADMISSION_QUEUE = json.loads(os.environ.get("QUIZ_ADMISSION_QUEUE", "false"))
+QUIZ_ADMISSION_WORKERS = int(os.environ.get("QUIZ_ADMISSION_WORKERS", 4))
+QUIZ_ADMISSION_MAX_DEPTH = int(os.environ.get("QUIZ_ADMISSION_MAX_DEPTH", 2000))
+
+# request timing settings
+
+# main.middleware.ServerTimingMiddleware logs a "main.middleware" line with
+# the query count, database, serializer, render and view times of a
+# SERVER_TIMING_SAMPLE_RATE share of the requests. Staff users and
+# INTERNAL_IPS also get them in a Server-Timing header.
+SERVER_TIMING = json.loads(os.environ.get("SERVER_TIMING", "false"))
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get("SERVER_TIMING_SAMPLE_RATE", 1))
@@ -14,4 +14,14 @@ DATABASES = {
     }
 }
 
-CROSS_ALLOWED_ORIGINS = []
\ No newline at end of file
+# Production runs several workers, they must share the cache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+}
+
+CROSS_ALLOWED_ORIGINS = []
+
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get("SERVER_TIMING_SAMPLE_RATE", 0.01))
\ No newline at end of file
@@ -0,0 +1,520 @@
+import io
+import json
+from datetime import timedelta
+from itertools import count
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+from openpyxl import Workbook
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from account.models import Grade, Profile
+from main.middleware import RequestTimings, _current
+from quiz.models import (
+    QuestionCategory,
+    QuestionOption,
+    QuizCategory,
+    Quiz,
+    QuizQuestionGroup,
+    AllowedUser,
+    UserAttempt,
+    QuizInstanceQuestion,
+    QuizInstanceOption,
+)
+from quiz.api.admission import ticket_cache_key
+from quiz.api.crud import create_user_attempt
+from quiz.api.grading import grade_attempts
+from quiz.api.leaderboard import update_leaderboard
+from quiz.api.serializers import QuestionSerializer
+from quiz.tests import create_questions, create_quiz
+
+# Maximum number of queries of every endpoint of the quiz and account APIs,
+# measured with a cold cache on the fixtures of QueryBudgetTests. The
+# fixtures hold more rows than any budget, so a query per row breaks it.
+
+API_URLCONFS = {
+    "quiz": ("quiz.api.urls", "/api/v1/quiz"),
+    "account": ("account.api.urls", "/api/v1/account"),
+}
+
+
+def budget(queries, user="admin", kwargs=None, data=None, status=None, **extra):
+    # ``kwargs`` and ``data`` are functions of the test case, so they can use
+    # its fixtures. ``status`` is the expected status, any success by default.
+    return {
+        "queries": queries,
+        "user": user,
+        "kwargs": kwargs or (lambda f: {}),
+        "data": data or (lambda f: None),
+        "status": status,
+        **extra,
+    }
+
+
+def pk(name):
+    return lambda f: {"pk": getattr(f, name).pk}
+
+
+def question_data(f):
+    return {"category_id": f.category.id, "body_text": "Question", "score": 2}
+
+
+def option_data(f):
+    return {
+        "question": f.question.id,
+        "body_text": "Option",
+        "order_number": 5,
+        "is_correct": False,
+    }
+
+
+def quiz_data(f):
+    return {
+        "title": "Final",
+        "start_time": timezone.now().isoformat(),
+        "duration": 30,
+        "total_questions": 5,
+        "category": f.quiz_category.id,
+    }
+
+
+def group_data(f):
+    return {
+        "quiz": f.group_quiz.id,
+        "title": "Group",
+        "group": f.category.id,
+        "total_questions": 2,
+    }
+
+
+def profile_data(f):
+    return {
+        "username": "student0",
+        "first_name": "Student",
+        "last_name": "Zero",
+        "grade": f.grade.id,
+    }
+
+
+def password_data(f):
+    return {
+        "current_password": "password",
+        "new_password": "new password",
+        "new_password_confirm": "new password",
+    }
+
+
+def excel_data(f):
+    workbook = Workbook()
+    for row in (
+        ("Question", "Correct", "Wrong"),
+        ("2 + 2", "4", "5"),
+        ("3 + 3", "6", "7"),
+    ):
+        workbook.active.append(row)
+    content = io.BytesIO()
+    workbook.save(content)
+    return {
+        "excel_file": SimpleUploadedFile("questions.xlsx", content.getvalue()),
+        "options": 2,
+        "category": f.category.id,
+    }
+
+
+def import_data(f):
+    content = b"question,correct,wrong\n2 + 2,4,5\n3 + 3,6,7\n"
+    return {
+        "file": SimpleUploadedFile("questions.csv", content),
+        "options": 2,
+        "category": f.category.id,
+    }
+
+
+def finish_attempt(f):
+    UserAttempt.objects.filter(pk=f.attempt.pk).update(is_completed=True)
+
+
+def set_ticket(f):
+    cache.set(
+        ticket_cache_key("ticket"),
+        {"status": "ready", "user_id": f.student.id, "attempt_id": f.attempt.id},
+    )
+
+
+# fmt: off
+QUERY_BUDGETS = {
+    # quiz.api.urls
+    ("quiz", "api-root", "get"): budget(0),
+    ("quiz", "questioncategory-list", "get"): budget(1),
+    ("quiz", "questioncategory-list", "post"): budget(1, data=lambda f: {"name": "Biology"}),
+    ("quiz", "questioncategory-detail", "get"): budget(1, kwargs=pk("category")),
+    ("quiz", "questioncategory-detail", "put"): budget(2, kwargs=pk("category"), data=lambda f: {"name": "Biology"}),
+    ("quiz", "questioncategory-detail", "patch"): budget(2, kwargs=pk("category"), data=lambda f: {"name": "Biology"}),
+    ("quiz", "questioncategory-detail", "delete"): budget(4, kwargs=pk("spare_category")),
+    ("quiz", "question-list", "get"): budget(2),
+    ("quiz", "question-list", "post"): budget(6, data=question_data),
+    ("quiz", "question-detail", "get"): budget(1, kwargs=pk("question")),
+    ("quiz", "question-detail", "put"): budget(7, kwargs=pk("question"), data=question_data),
+    ("quiz", "question-detail", "patch"): budget(7, kwargs=pk("question"), data=lambda f: {"score": 3}),
+    ("quiz", "question-detail", "delete"): budget(12, kwargs=pk("spare_question")),
+    ("quiz", "questionoption-list", "get"): budget(1),
+    ("quiz", "questionoption-list", "post"): budget(5, data=option_data),
+    ("quiz", "questionoption-detail", "get"): budget(1, kwargs=pk("option")),
+    ("quiz", "questionoption-detail", "put"): budget(6, kwargs=pk("option"), data=option_data),
+    ("quiz", "questionoption-detail", "patch"): budget(5, kwargs=pk("option"), data=lambda f: {"body_text": "Option"}),
+    ("quiz", "questionoption-detail", "delete"): budget(7, kwargs=pk("option")),
+    ("quiz", "excel-upload", "post"): budget(11, data=excel_data, format="multipart"),
+    ("quiz", "question-import", "post"): budget(11, data=import_data, format="multipart"),
+    ("quiz", "quizcategory-list", "get"): budget(1),
+    ("quiz", "quizcategory-list", "post"): budget(1, data=lambda f: {"name": "Olympiad"}),
+    ("quiz", "quizcategory-detail", "get"): budget(1, kwargs=pk("quiz_category")),
+    ("quiz", "quizcategory-detail", "put"): budget(2, kwargs=pk("quiz_category"), data=lambda f: {"name": "Olympiad"}),
+    ("quiz", "quizcategory-detail", "patch"): budget(2, kwargs=pk("quiz_category"), data=lambda f: {"name": "Olympiad"}),
+    ("quiz", "quizcategory-detail", "delete"): budget(3, kwargs=pk("spare_quiz_category")),
+    ("quiz", "quiz-list", "get"): budget(2),
+    ("quiz", "quiz-list", "post"): budget(3, data=quiz_data),
+    ("quiz", "quiz-detail", "get"): budget(1, kwargs=pk("quiz")),
+    ("quiz", "quiz-detail", "put"): budget(4, kwargs=pk("quiz"), data=quiz_data),
+    ("quiz", "quiz-detail", "patch"): budget(3, kwargs=pk("quiz"), data=lambda f: {"title": "Final"}),
+    ("quiz", "quiz-detail", "delete"): budget(13, kwargs=pk("group_quiz")),
+    ("quiz", "quizquestion-list", "get"): budget(3, data=lambda f: {"quiz": f.quiz.id}),
+    # Nested question writes aren't supported, the budget is the one of the
+    # validation error
+    ("quiz", "quizquestion-list", "post"): budget(0, data=lambda f: {"order_number": 1}, status=400),
+    ("quiz", "quizquestion-detail", "get"): budget(1, kwargs=pk("quiz_question")),
+    ("quiz", "quizquestion-detail", "put"): budget(1, kwargs=pk("quiz_question"), data=lambda f: {"order_number": 1}, status=400),
+    ("quiz", "quizquestion-detail", "patch"): budget(4, kwargs=pk("quiz_question"), data=lambda f: {"score": 2}),
+    ("quiz", "quizquestion-detail", "delete"): budget(3, kwargs=pk("quiz_question")),
+    ("quiz", "quizquestiongroup-list", "get"): budget(1),
+    ("quiz", "quizquestiongroup-list", "post"): budget(5, data=group_data),
+    ("quiz", "quizquestiongroup-detail", "get"): budget(1, kwargs=pk("group")),
+    ("quiz", "quizquestiongroup-detail", "put"): budget(6, kwargs=pk("group"), data=group_data),
+    ("quiz", "quizquestiongroup-detail", "patch"): budget(3, kwargs=pk("group"), data=lambda f: {"title": "Group"}),
+    ("quiz", "quizquestiongroup-detail", "delete"): budget(5, kwargs=pk("group")),
+    ("quiz", "question-ids", "get"): budget(2, data=lambda f: {"quiz_id": f.quiz.id}),
+    ("quiz", "swap-questions", "put"): budget(4, data=lambda f: {"object1": f.quiz_question.id, "object2": f.other_quiz_question.id}),
+    ("quiz", "swap-question-groups", "put"): budget(6, data=lambda f: {"object1": f.group.id, "object2": f.other_group.id}),
+    ("quiz", "quiz-question-bulk", "get"): budget(1),
+    ("quiz", "quiz-question-bulk", "post"): budget(5, data=lambda f: [{"quiz": f.quiz.id, "question": f.question.id, "order_number": 11}]),
+    ("quiz", "quiz-question-bulk", "put"): budget(2, data=lambda f: {"objects": [f.quiz_question.id], "score": 2}),
+    ("quiz", "quiz-question-bulk", "patch"): budget(2, data=lambda f: {"objects": [f.quiz_question.id], "score": 2}),
+    ("quiz", "quiz-question-bulk", "delete"): budget(3, data=lambda f: [{"id": f.quiz_question.question_id}]),
+    ("quiz", "allowed-grade", "get"): budget(1, kwargs=pk("quiz")),
+    ("quiz", "allowed-grade", "post"): budget(7, kwargs=pk("quiz"), data=lambda f: {"values": [f.other_grade.id]}),
+    ("quiz", "allowed-grade", "delete"): budget(2, kwargs=pk("quiz"), data=lambda f: {"values": [f.other_grade.id]}),
+    ("quiz", "alloweduser-list", "get"): budget(3, data=lambda f: {"quiz": f.quiz.id}),
+    # Nested user writes aren't supported either
+    ("quiz", "alloweduser-list", "post"): budget(0, data=lambda f: {}, status=400),
+    ("quiz", "alloweduser-detail", "get"): budget(1, kwargs=pk("allowed_user")),
+    ("quiz", "alloweduser-detail", "put"): budget(1, kwargs=pk("allowed_user"), data=lambda f: {}, status=400),
+    ("quiz", "alloweduser-detail", "patch"): budget(2, kwargs=pk("allowed_user"), data=lambda f: {}),
+    ("quiz", "alloweduser-detail", "delete"): budget(3, kwargs=pk("allowed_user")),
+    ("quiz", "allowed-user-bulk", "get"): budget(2, kwargs=pk("quiz")),
+    ("quiz", "allowed-user-bulk", "post"): budget(6, kwargs=pk("quiz"), data=lambda f: {"values": [user.id for user in f.outsiders]}),
+    ("quiz", "allowed-user-bulk", "delete"): budget(4, kwargs=pk("quiz"), data=lambda f: {"values": [f.students[-1].id]}),
+    ("quiz", "grade-quiz", "post"): budget(7, kwargs=pk("quiz")),
+    ("quiz", "export-results", "get"): budget(5, kwargs=pk("quiz")),
+    ("quiz", "leaderboard", "get"): budget(5, "student", kwargs=pk("quiz"), setup=finish_attempt),
+    ("quiz", "user-quiz", "get"): budget(4, "student"),
+    ("quiz", "user-quiz-retrieve", "get"): budget(4, "student", kwargs=pk("quiz")),
+    # With a cold cache, the blueprint and the pools of both groups are read
+    ("quiz", "start-quiz", "post"): budget(14, "student", kwargs=pk("group_quiz")),
+    ("quiz", "start-quiz-ticket", "get"): budget(0, "student", kwargs=lambda f: {"ticket": "ticket"}, setup=set_ticket),
+    ("quiz", "start-quiz-metrics", "get"): budget(0),
+    ("quiz", "get-user-attempt", "get"): budget(4, "student", kwargs=pk("attempt")),
+    ("quiz", "user-attempt-paper", "get"): budget(4, "student", kwargs=pk("attempt")),
+    # Clicks: the question and its options, the batch also locks and reads the attempt
+    ("quiz", "select-option", "post"): budget(2, "student", data=lambda f: {"questionId": f.attempt_question.id, "optionId": f.attempt_option.id}),
+    ("quiz", "select-options", "post"): budget(5, "student", data=lambda f: {"attemptId": f.attempt.id, "answers": [{"questionId": f.attempt_question.id, "optionId": f.attempt_option.id, "version": 0}]}),
+    # account.api.urls
+    ("account", "api-root", "get"): budget(0),
+    ("account", "signup", "post"): budget(2, None, data=lambda f: {"username": "newcomer", "password": "password", "first_name": "New", "last_name": "Comer"}),
+    ("account", "token_obtain_pair", "post"): budget(2, None, data=lambda f: {"username": "student0", "password": "password"}),
+    ("account", "token_refresh", "post"): budget(0, None, data=lambda f: {"refresh": str(RefreshToken.for_user(f.student))}),
+    ("account", "me", "get"): budget(0, "student"),
+    ("account", "update_profile", "put"): budget(3, "student", data=profile_data),
+    ("account", "update_profile", "patch"): budget(1, "student", data=lambda f: {"first_name": "Student"}),
+    ("account", "update_profile_picture", "put"): budget(1, "student", data=lambda f: {"picture": None}),
+    ("account", "update_profile_picture", "patch"): budget(1, "student", data=lambda f: {"picture": None}),
+    ("account", "change_password", "put"): budget(1, "student", data=password_data),
+    ("account", "change_password", "patch"): budget(1, "student", data=password_data),
+    ("account", "grade-list", "get"): budget(1, None),
+    ("account", "grade-list", "post"): budget(2, data=lambda f: {"name": "12"}),
+    ("account", "grade-detail", "get"): budget(1, kwargs=pk("grade")),
+    ("account", "grade-detail", "put"): budget(3, kwargs=pk("grade"), data=lambda f: {"name": "12"}),
+    ("account", "grade-detail", "patch"): budget(3, kwargs=pk("grade"), data=lambda f: {"name": "12"}),
+    ("account", "grade-detail", "delete"): budget(4, kwargs=pk("spare_grade")),
+    ("account", "profile-list", "get"): budget(4),
+    ("account", "profile-list", "post"): budget(4, data=lambda f: {"username": "newcomer", "password": "password", "first_name": "New", "last_name": "Comer"}),
+    ("account", "profile-detail", "get"): budget(3, kwargs=pk("student")),
+    ("account", "profile-detail", "put"): budget(8, kwargs=pk("student"), data=lambda f: {**profile_data(f), "password": "password"}),
+    ("account", "profile-detail", "patch"): budget(6, kwargs=pk("student"), data=lambda f: {"first_name": "Student"}),
+    ("account", "profile-detail", "delete"): budget(10, kwargs=pk("outsider")),
+}
+# fmt: on
+
+
+def api_endpoints() -> set:
+    # (urlconf key, url name, method) of every route of API_URLCONFS
+    endpoints = set()
+
+    def walk(key, patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(key, pattern.url_patterns)
+                continue
+            view = pattern.callback
+            if getattr(view, "actions", None):
+                # DRF adds "head" to the actions on the first GET request
+                methods = [method for method in view.actions if method != "head"]
+            else:
+                methods = [
+                    method
+                    for method in view.cls.http_method_names
+                    if method not in ("head", "options", "trace")
+                    and hasattr(view.cls, method)
+                ]
+            for method in methods:
+                endpoints.add((key, pattern.name, method))
+
+    for key, (urlconf, prefix) in API_URLCONFS.items():
+        walk(key, get_resolver(urlconf).url_patterns)
+    return endpoints
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    QUIZ_ADMISSION_QUEUE=False,
+    QUIZ_ATTEMPT_STORAGE="rows",
+)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.grade = Grade.objects.create(name="10")
+        cls.other_grade = Grade.objects.create(name="11")
+        cls.spare_grade = Grade.objects.create(name="9")
+        cls.admin = Profile.objects.create_user(
+            "admin", "password", is_staff=True, is_superuser=True
+        )
+        cls.students = [
+            Profile.objects.create_user(
+                f"student{index}",
+                "password",
+                first_name=f"Student {index}",
+                last_name="Test",
+                grade=cls.grade,
+            )
+            for index in range(12)
+        ]
+        cls.student = cls.students[0]
+        cls.outsiders = [
+            Profile.objects.create_user(
+                f"outsider{index}", "password", grade=cls.other_grade
+            )
+            for index in range(3)
+        ]
+        cls.outsider = cls.outsiders[0]
+
+        cls.category = QuestionCategory.objects.create(name="Chemistry")
+        cls.other_category = QuestionCategory.objects.create(name="Physics")
+        cls.spare_category = QuestionCategory.objects.create(name="Biology")
+        questions = create_questions(cls.category, 12)
+        other_questions = create_questions(cls.other_category, 12)
+        cls.question = questions[-1]
+        cls.spare_question = other_questions[-1]
+        cls.option = cls.question.options.first()
+
+        cls.quiz_category = QuizCategory.objects.create(name="Exams")
+        cls.spare_quiz_category = QuizCategory.objects.create(name="Olympiad")
+        cls.quiz = create_quiz(
+            questions[:10], category=cls.quiz_category, access="private", attempts=2
+        )
+        cls.quiz_question, cls.other_quiz_question = cls.quiz.quiz_questions.all()[:2]
+        for student in cls.students:
+            AllowedUser.objects.create(quiz=cls.quiz, user=student)
+        cls.allowed_user = AllowedUser.objects.filter(quiz=cls.quiz).first()
+
+        cls.group_quiz = Quiz.objects.create(
+            title="Grouped",
+            category=cls.quiz_category,
+            start_time=cls.quiz.start_time,
+            duration=60,
+            total_questions=1,
+            grouped_questions=True,
+        )
+        cls.group, cls.other_group = [
+            QuizQuestionGroup.objects.create(
+                quiz=cls.group_quiz,
+                title=category.name,
+                group=category,
+                random_questions=True,
+                total_questions=3,
+            )
+            for category in (cls.category, cls.other_category)
+        ]
+
+        # Finished attempts of the other students, half of them right
+        for student in cls.students[1:]:
+            create_user_attempt(student, cls.quiz)
+        finished = UserAttempt.objects.filter(quiz=cls.quiz)
+        for order_number, students in (
+            (1, cls.students[1::2]),
+            (2, cls.students[2::2]),
+        ):
+            QuizInstanceQuestion.objects.filter(user_attempt__user__in=students).update(
+                selected_option=Subquery(
+                    QuestionOption.objects.filter(
+                        question=OuterRef("question"), order_number=order_number
+                    ).values("id")[:1]
+                )
+            )
+        finished.update(is_completed=True, completed_at=timezone.now())
+        grade_attempts(finished)
+        update_leaderboard(finished)
+
+        cls.attempt = create_user_attempt(cls.student, cls.quiz)
+        cls.attempt_question = cls.attempt.instance_questions.first()
+        cls.attempt_option = QuizInstanceOption.objects.filter(
+            question_instance=cls.attempt_question
+        ).first()
+
+    def api_client(self, entry) -> APIClient:
+        client = APIClient()
+        if entry["user"]:
+            # A fresh instance, views may change the one they are given
+            client.force_authenticate(
+                Profile.objects.get(pk=getattr(self, entry["user"]).pk)
+            )
+        return client
+
+    def call(self, client, key, name, method, entry):
+        urlconf, prefix = API_URLCONFS[key]
+        path = prefix + reverse(name, urlconf=urlconf, kwargs=entry["kwargs"](self))
+        data = entry["data"](self)
+        if method == "get":
+            return client.get(path, data)
+        return getattr(client, method)(path, data, format=entry.get("format", "json"))
+
+    def check_budget(self, key, name, method, entry):
+        cache.clear()
+        if "setup" in entry:
+            entry["setup"](self)
+        client = self.api_client(entry)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.call(client, key, name, method, entry)
+            if response.streaming:
+                b"".join(response.streaming_content)
+
+        if entry["status"]:
+            self.assertEqual(response.status_code, entry["status"])
+        else:
+            self.assertLess(response.status_code, 400, getattr(response, "data", None))
+        if len(queries) > entry["queries"]:
+            self.fail(
+                f"{method.upper()} {response.request['PATH_INFO']} ran "
+                f"{len(queries)} queries, the budget is {entry['queries']}:\n"
+                + "\n".join(
+                    f"{number}. {query['sql']}"
+                    for number, query in enumerate(queries.captured_queries, 1)
+                )
+            )
+
+    def test_every_endpoint_has_a_budget(self):
+        endpoints = api_endpoints()
+        self.assertEqual(sorted(endpoints - set(QUERY_BUDGETS)), [])
+        self.assertEqual(sorted(set(QUERY_BUDGETS) - endpoints), [])
+
+    def test_query_budgets(self):
+        for (key, name, method), entry in QUERY_BUDGETS.items():
+            with self.subTest(f"{method.upper()} {key}:{name}"):
+                # Every call starts from the same fixtures
+                with transaction.atomic():
+                    self.check_budget(key, name, method, entry)
+                    transaction.set_rollback(True)
+
+
+@override_settings(SERVER_TIMING=True, SERVER_TIMING_SAMPLE_RATE=1)
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            Profile.objects.create_user("admin", "password", is_staff=True)
+        )
+        QuestionCategory.objects.create(name="Chemistry")
+
+    def test_timings_header_and_log_line(self):
+        with self.assertLogs("main.middleware") as logs:
+            response = self.client.get("/api/v1/quiz/question-category/")
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^db;dur=[\d.]+;desc="1 queries", serialize;dur=[\d.]+, '
+            r"render;dur=[\d.]+, view;dur=[\d.]+, total;dur=[\d.]+$",
+        )
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["view"], "questioncategory-list")
+        self.assertEqual(line["queries"], 1)
+        self.assertGreater(line["serialize_ms"], 0)
+
+    def test_nested_serializers_are_timed_once(self):
+        questions = create_questions(QuestionCategory.objects.get(), 2, options=1)
+        timings = RequestTimings()
+        _current.timings = timings
+        try:
+            # Every clock read moves the clock by one second
+            with mock.patch("main.middleware.time.perf_counter", side_effect=count()):
+                QuestionSerializer(questions, many=True).data
+        finally:
+            _current.timings = None
+        # One second per question, their categories are not counted again
+        self.assertEqual(timings.serialize, 2)
+
+    def test_students_only_get_the_log_line(self):
+        self.client.force_authenticate(Profile.objects.create_user("student", "pw"))
+        with self.assertLogs("main.middleware") as logs:
+            response = self.client.get("/api/v1/quiz/user-quiz/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(json.loads(logs.records[0].getMessage())["view"], "user-quiz")
+
+        with self.settings(INTERNAL_IPS=["127.0.0.1"]):
+            response = self.client.get("/api/v1/quiz/user-quiz/")
+        self.assertIn("Server-Timing", response)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request(self):
+        response = self.client.get("/api/v1/quiz/question-category/")
+        self.assertNotIn("Server-Timing", response)
+
+
+class CursorPaginationTests(TestCase):
+    def test_pages_split_inside_one_millisecond(self):
+        start_time = timezone.now().replace(microsecond=123000)
+        quizzes = [
+            Quiz.objects.create(
+                title=f"Quiz {index}",
+                start_time=start_time + timedelta(microseconds=100 * index),
+                duration=60,
+                total_questions=1,
+            )
+            for index in range(3)
+        ]
+        client = APIClient()
+        client.force_authenticate(
+            Profile.objects.create_user("admin", "password", is_staff=True)
+        )
+
+        listed = []
+        url = "/api/v1/quiz/quiz/?cursor=&per_page=1"
+        # Bounded, a cursor that repeats rows would never reach the end
+        while url and len(listed) <= len(quizzes):
+            page = client.get(url).json()
+            listed.extend(quiz["id"] for quiz in page["results"])
+            url = page["next"]
+        self.assertEqual(listed, [quiz.id for quiz in quizzes])
@@ -16,3 +16,6 @@ admin.site.register(QuizInstanceQuestion)
 
 admin.site.register(UserAttempt)
 
+admin.site.register(AttemptResult)
+
+admin.site.register(LeaderboardEntry)
@@ -0,0 +1,208 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.contrib.auth import get_user_model
+from quiz.models import Quiz
+from quiz.api.crud import start_user_attempt
+import threading
+import logging
+import time
+import os
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+# Tickets live in the cache so that any web worker can answer a poll, which
+# requires a cache shared between processes (see CACHES in settings).
+TICKET_TIMEOUT = 60 * 30
+# The pending marker of a start is refreshed while its process holds the
+# build, it expires soon after a restart drops the queue.
+PENDING_TIMEOUT = 60
+LATENCY_WINDOW = 1000
+COUNTERS = ("completed", "failed", "rejected")
+
+
+def ticket_cache_key(ticket) -> str:
+    return f"quiz-admission:{ticket}"
+
+
+def pending_cache_key(user_id, quiz_id) -> str:
+    return f"quiz-admission:{user_id}:{quiz_id}"
+
+
+def counter_cache_key(name) -> str:
+    return f"quiz-admission-metrics:{name}"
+
+
+def count(name):
+    key = counter_cache_key(name)
+    cache.add(key, 0, None)
+    cache.incr(key)
+
+
+def percentiles(values) -> dict:
+    values = sorted(values)
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+
+    def pick(fraction):
+        return round(values[min(len(values) - 1, int(len(values) * fraction))], 1)
+
+    return {
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(values[-1], 1),
+    }
+
+
+class AdmissionQueue:
+    def __init__(self, workers: int, max_depth: int):
+        self.workers = workers
+        self.max_depth = max_depth
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="quiz-admission"
+        )
+        self._lock = threading.Lock()
+        self.depth = 0
+        self.in_flight = 0
+        self._pending = {}
+        self._wait_ms = deque(maxlen=LATENCY_WINDOW)
+        self._build_ms = deque(maxlen=LATENCY_WINDOW)
+        threading.Thread(
+            target=self._heartbeat, name="quiz-admission-heartbeat", daemon=True
+        ).start()
+
+    def submit(self, user, quiz: Quiz) -> str | None:
+        # Returns the ticket of the attempt being built, or None when the queue
+        # is full. Repeated starts of the same user share one ticket.
+        ticket = uuid4().hex
+        cache.set(
+            ticket_cache_key(ticket),
+            {
+                "status": "queued",
+                "user_id": user.id,
+                "quiz_id": quiz.id,
+                "attempt_id": None,
+            },
+            TICKET_TIMEOUT,
+        )
+        pending = pending_cache_key(user.id, quiz.id)
+        # cache.add is atomic, of concurrent starts only the first one queues
+        # a build, on any worker
+        while not cache.add(pending, ticket, PENDING_TIMEOUT):
+            queued = cache.get(pending)
+            if queued:
+                cache.delete(ticket_cache_key(ticket))
+                return queued
+
+        with self._lock:
+            full = self.depth >= self.max_depth
+            if not full:
+                self.depth += 1
+                self._pending[ticket] = pending
+        if full:
+            count("rejected")
+            cache.delete_many([pending, ticket_cache_key(ticket)])
+            return None
+
+        self._executor.submit(self._build, ticket, user.id, quiz.id, time.monotonic())
+        return ticket
+
+    def _build(self, ticket, user_id, quiz_id, enqueued_at):
+        started_at = time.monotonic()
+        with self._lock:
+            self.depth -= 1
+            self.in_flight += 1
+            self._wait_ms.append((started_at - enqueued_at) * 1000)
+
+        attempt = None
+        try:
+            attempt = start_user_attempt(User.objects.get(pk=user_id), quiz_id)
+        except Exception as e:
+            logger.exception(e)
+        finally:
+            connections.close_all()
+
+        build_ms = (time.monotonic() - started_at) * 1000
+        with self._lock:
+            self.in_flight -= 1
+            self._build_ms.append(build_ms)
+        count("completed" if attempt else "failed")
+
+        cache.set(
+            ticket_cache_key(ticket),
+            {
+                "status": "ready" if attempt else "failed",
+                "user_id": user_id,
+                "quiz_id": quiz_id,
+                "attempt_id": attempt.id if attempt else None,
+            },
+            TICKET_TIMEOUT,
+        )
+        cache.delete(pending_cache_key(user_id, quiz_id))
+        with self._lock:
+            del self._pending[ticket]
+        logger.info(
+            "attempt built quiz=%s user=%s ticket=%s build_ms=%.1f",
+            quiz_id,
+            user_id,
+            ticket,
+            build_ms,
+        )
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(PENDING_TIMEOUT / 3)
+            with self._lock:
+                pending = list(self._pending.values())
+            for key in pending:
+                cache.touch(key, PENDING_TIMEOUT)
+
+    def metrics(self) -> dict:
+        # The counters add up every process, the queue and the latencies are
+        # those of the process answering
+        counters = cache.get_many([counter_cache_key(name) for name in COUNTERS])
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_depth": self.max_depth,
+                **{name: counters.get(counter_cache_key(name), 0) for name in COUNTERS},
+                "process": {
+                    "pid": os.getpid(),
+                    "queue_depth": self.depth,
+                    "in_flight": self.in_flight,
+                    "wait_ms": percentiles(self._wait_ms),
+                    "build_ms": percentiles(self._build_ms),
+                },
+            }
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_admission_queue() -> AdmissionQueue:
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = AdmissionQueue(
+                    settings.QUIZ_ADMISSION_WORKERS, settings.QUIZ_ADMISSION_MAX_DEPTH
+                )
+    return _queue
+
+
+def get_ticket(ticket) -> dict | None:
+    data = cache.get(ticket_cache_key(ticket))
+    if data and data["status"] == "queued":
+        # A queued ticket without its pending marker lost its build
+        if cache.get(pending_cache_key(data["user_id"], data["quiz_id"])) != ticket:
+            data = cache.get(ticket_cache_key(ticket))
+            if data and data["status"] == "queued":
+                data = {**data, "status": "failed"}
+    return data
@@ -0,0 +1,128 @@
+import numpy as np
+from django.db import transaction
+from quiz.models import QuizInstanceQuestion, QuestionOption, QuestionStatistics
+
+# Classical item analysis of every question over completed attempts. The
+# attempt x question answers are streamed as plain tuples into NumPy arrays
+# and every statistic is a bincount over them, no ORM object is built per
+# answer.
+
+ANALYSIS_CHUNK_SIZE = 50000
+
+
+def load_answers(chunk_size=ANALYSIS_CHUNK_SIZE) -> np.ndarray:
+    # Columns: attempt id, question id, selected option id (0 when omitted),
+    # correct (0/1), score of the question in the attempt
+    rows = (
+        QuizInstanceQuestion.objects.filter(
+            user_attempt__is_completed=True, user_attempt__started_at__isnull=False
+        )
+        .values_list(
+            "user_attempt_id",
+            "question_id",
+            "selected_option_id",
+            "selected_option__is_correct",
+            "score",
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+    chunks, chunk = [], []
+    for attempt_id, question_id, option_id, is_correct, score in rows:
+        chunk.append((attempt_id, question_id, option_id or 0, bool(is_correct), score))
+        if len(chunk) == chunk_size:
+            chunks.append(np.array(chunk, dtype=np.float64))
+            chunk = []
+    if chunk:
+        chunks.append(np.array(chunk, dtype=np.float64))
+    if not chunks:
+        return np.empty((0, 5))
+    return np.concatenate(chunks)
+
+
+def item_statistics(answers: np.ndarray) -> dict:
+    attempt_ids, attempt_index = np.unique(answers[:, 0], return_inverse=True)
+    question_ids, question_index = np.unique(answers[:, 1], return_inverse=True)
+    option_ids = answers[:, 2].astype(np.int64)
+    correct = answers[:, 3]
+    earned = correct * answers[:, 4]
+
+    # Point-biserial correlation of each item with the rest score, the total
+    # of the attempt without the item itself
+    rest = np.bincount(attempt_index, weights=earned)[attempt_index] - earned
+    count = np.bincount(question_index).astype(np.float64)
+    sums = {
+        name: np.bincount(question_index, weights=values)
+        for name, values in (
+            ("x", correct),
+            ("y", rest),
+            ("yy", rest * rest),
+            ("xy", correct * rest),
+        )
+    }
+    p_value = sums["x"] / count
+    mean_rest = sums["y"] / count
+    covariance = sums["xy"] / count - p_value * mean_rest
+    variance = p_value * (1 - p_value) * (sums["yy"] / count - mean_rest**2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        discrimination = np.where(
+            variance > 1e-12, covariance / np.sqrt(variance), np.nan
+        )
+
+    answered = option_ids > 0
+    omitted = count - np.bincount(question_index[answered], minlength=len(count))
+    selected, first, picks = np.unique(
+        option_ids[answered], return_index=True, return_counts=True
+    )
+    picked_by = question_index[answered][first]
+
+    statistics = {
+        int(question_id): {
+            "responses": int(count[index]),
+            "p_value": float(p_value[index]),
+            "discrimination": (
+                None
+                if np.isnan(discrimination[index])
+                else float(discrimination[index])
+            ),
+            "omitted_rate": float(omitted[index] / count[index]),
+            "option_rates": {},
+        }
+        for index, question_id in enumerate(question_ids)
+    }
+    for option_id, index, total in zip(selected, picked_by, picks):
+        statistics[int(question_ids[index])]["option_rates"][str(option_id)] = float(
+            total / count[index]
+        )
+    return statistics
+
+
+def analyze_questions(chunk_size=ANALYSIS_CHUNK_SIZE) -> int:
+    statistics = item_statistics(load_answers(chunk_size))
+
+    # Options nobody picked are reported with a zero rate
+    for question_id, option_id in QuestionOption.objects.filter(
+        question_id__in=list(statistics)
+    ).values_list("question_id", "id"):
+        statistics[question_id]["option_rates"].setdefault(str(option_id), 0.0)
+
+    with transaction.atomic():
+        QuestionStatistics.objects.exclude(question_id__in=list(statistics)).delete()
+        QuestionStatistics.objects.bulk_create(
+            [
+                QuestionStatistics(question_id=question_id, **values)
+                for question_id, values in statistics.items()
+            ],
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=["question"],
+            update_fields=[
+                "responses",
+                "p_value",
+                "discrimination",
+                "omitted_rate",
+                "option_rates",
+                "computed_at",
+            ],
+        )
+    return len(statistics)
@@ -0,0 +1,93 @@
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from quiz.models import Quiz, QuizQuestion
+
+# A blueprint is everything create_user_attempt needs to know about a quiz,
+# reduced to ids and plain values so it can be shared by every start:
+#
+#   {
+#       "grouped": bool,
+#       "random_questions": bool,
+#       "random_options": bool,
+#       "total_questions": int,
+#       "groups": [{"id", "category_id", "random_questions", "random_options",
+#                   "total_questions", "point"}],
+#       "question_ids": np.ndarray,
+#       "scores": np.ndarray,
+#   }
+#
+# Grouped quizzes draw their questions from the per-category pools in
+# quiz.api.sampling, so their blueprint only describes the groups.
+
+BLUEPRINT_TIMEOUT = 60 * 60 * 6
+
+
+def blueprint_cache_key(quiz_id) -> str:
+    return f"quiz-blueprint:{quiz_id}"
+
+
+def build_quiz_blueprint(quiz: Quiz) -> dict:
+    blueprint = {
+        "grouped": quiz.grouped_questions,
+        "random_questions": quiz.has_random_questions,
+        "random_options": quiz.has_random_options,
+        "total_questions": quiz.total_questions,
+        "groups": [],
+        "question_ids": np.empty(0, dtype=np.int64),
+        "scores": np.empty(0, dtype=np.float64),
+    }
+
+    if quiz.grouped_questions:
+        blueprint["groups"] = [
+            {
+                "id": group["id"],
+                "category_id": group["group_id"],
+                "random_questions": group["random_questions"],
+                "random_options": group["random_options"],
+                "total_questions": group["total_questions"],
+                "point": group["point"],
+            }
+            for group in quiz.question_groups.order_by("order_number", "id").values()
+        ]
+    else:
+        rows = list(
+            quiz.quiz_questions.values_list("question_id", "score", "question__score")
+        )
+        blueprint["question_ids"] = np.array(
+            [question_id for question_id, _, _ in rows], dtype=np.int64
+        )
+        blueprint["scores"] = np.array(
+            [
+                score if score is not None else default_score
+                for _, score, default_score in rows
+            ],
+            dtype=np.float64,
+        )
+
+    return blueprint
+
+
+def get_quiz_blueprint(quiz: Quiz) -> dict:
+    key = blueprint_cache_key(quiz.id)
+    blueprint = cache.get(key)
+    if blueprint is None:
+        blueprint = build_quiz_blueprint(quiz)
+        cache.set(key, blueprint, BLUEPRINT_TIMEOUT)
+    return blueprint
+
+
+def invalidate_quiz_blueprints(quiz_ids):
+    keys = [blueprint_cache_key(quiz_id) for quiz_id in set(quiz_ids)]
+    if keys:
+        # Wait for the commit, otherwise a concurrent start could rebuild the
+        # blueprint from the old rows and cache it again.
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def quiz_ids_for_questions(question_ids) -> set:
+    return set(
+        QuizQuestion.objects.filter(question_id__in=question_ids).values_list(
+            "quiz_id", flat=True
+        )
+    )
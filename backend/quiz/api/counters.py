@@ -0,0 +1,98 @@
+from collections import defaultdict
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from quiz.models import (
+    QuestionCategory,
+    Question,
+    QuizCategory,
+    Quiz,
+    QuizQuestion,
+    QuizQuestionGroup,
+    AllowedUser,
+)
+
+# Counts of related rows stored on the parent rows, so that listings don't
+# run an aggregate per row. They are moved with F() updates in the
+# transaction that creates or deletes the counted rows, from quiz.signals and
+# from the bulk paths that send no signals. The repair_counters command
+# recomputes them.
+
+
+def add_to_counter(model, field, deltas):
+    # ``deltas`` maps primary keys to the change of the counter, rows with
+    # the same change share one UPDATE
+    pks_by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if pk is not None and delta:
+            pks_by_delta[delta].append(pk)
+    for delta, pks in pks_by_delta.items():
+        model.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+
+def move_counter(model, field, old_pk, new_pk, amount=1):
+    if old_pk != new_pk:
+        add_to_counter(model, field, {old_pk: -amount, new_pk: amount})
+
+
+def related_total(queryset, field, aggregate=None):
+    # Count (or ``aggregate``) of the rows of ``queryset`` whose ``field``
+    # points to the outer row
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=aggregate or Count("id"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def counter_definitions() -> list:
+    # (model, counter field, expected value)
+    return [
+        (
+            QuestionCategory,
+            "total_questions",
+            related_total(Question.objects.all(), "category"),
+        ),
+        (QuizCategory, "total_quizes", related_total(Quiz.objects.all(), "category")),
+        (
+            Quiz,
+            "quiz_question_count",
+            related_total(QuizQuestion.objects.all(), "quiz"),
+        ),
+        (
+            Quiz,
+            "group_question_count",
+            related_total(
+                QuizQuestionGroup.objects.all(), "quiz", Sum("total_questions")
+            ),
+        ),
+        (
+            Quiz,
+            "total_participants",
+            related_total(AllowedUser.objects.all(), "quiz"),
+        ),
+    ]
+
+
+def stale_counters() -> dict:
+    # {(model name, field): ids of the rows whose counter is wrong}
+    stale = {}
+    for model, field, expected in counter_definitions():
+        ids = list(
+            model.objects.annotate(expected=expected)
+            .exclude(**{field: F("expected")})
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        if ids:
+            stale[(model.__name__, field)] = ids
+    return stale
+
+
+def repair_counters():
+    for model, field, expected in counter_definitions():
+        model.objects.update(**{field: expected})
@@ -1,101 +1,477 @@
-from random import sample, shuffle
+from random import shuffle
+from secrets import randbits
 from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
+from django.db.models.functions import Coalesce
+from django.http import Http404
 from django.utils import timezone
-from quiz.models import UserAttempt, QuizInstanceQuestion, QuizInstanceOption, Quiz
+from quiz.models import (
+    AllowedUser,
+    UserAttempt,
+    QuizInstanceQuestion,
+    QuizInstanceOption,
+    Quiz,
+    QuestionOption,
+)
+from quiz.api.blueprint import get_quiz_blueprint
+from quiz.api.sampling import get_category_pools, new_generator, draw
+from quiz.api.leaderboard import schedule_leaderboard_update
 from django.db import transaction
+from django.db.models import Count, Q, F, Exists, OuterRef, Subquery, Case, When, Value
 import logging
 
+User = get_user_model()
 
-def create_user_attempt(user, quiz: Quiz) -> UserAttempt | None:
-    with transaction.atomic():
-        try:
-            # Create the user attempt instance
-            user_attempt = UserAttempt.objects.create(
+
+def sample_questions(blueprint: dict, rng) -> list:
+    # Returns (question_id, group_id, question_order, score, random_options)
+    # tuples for a single attempt, using only ids from the blueprint and pools.
+    questions = []
+
+    if blueprint["grouped"]:
+        pools = get_category_pools({g["category_id"] for g in blueprint["groups"]})
+
+        for group in blueprint["groups"]:
+            question_ids = pools[group["category_id"]]
+            if group["random_questions"]:
+                question_ids = draw(question_ids, group["total_questions"], rng)
+
+            for order, question_id in enumerate(question_ids.tolist()):
+                questions.append(
+                    (
+                        question_id,
+                        group["id"],
+                        order,
+                        group["point"],
+                        group["random_options"],
+                    )
+                )
+    else:
+        indices = range(len(blueprint["question_ids"]))
+        if blueprint["random_questions"]:
+            indices = draw(
+                len(blueprint["question_ids"]), blueprint["total_questions"], rng
+            ).tolist()
+
+        for order, index in enumerate(indices):
+            questions.append(
+                (
+                    int(blueprint["question_ids"][index]),
+                    None,
+                    order,
+                    float(blueprint["scores"][index]),
+                    False,
+                )
+            )
+
+    return questions
+
+
+def prepare_attempts(quiz: Quiz, user_ids) -> list:
+    # Writes unstarted attempts (started_at unset) with all their questions and
+    # options for the given users. Must run inside a transaction.
+    blueprint = get_quiz_blueprint(quiz)
+    seeded = settings.QUIZ_ATTEMPT_STORAGE == "seed"
+
+    attempts = []
+    attempt_questions = []
+    for user_id in user_ids:
+        seed = randbits(63) if seeded else None
+        questions = sample_questions(blueprint, new_generator(seed))
+        attempts.append(
+            UserAttempt(
                 quiz=quiz,
-                user=user,
+                user_id=user_id,
+                seed=seed,
+                question_ids=[question[0] for question in questions],
             )
+        )
+        attempt_questions.append(questions)
+    UserAttempt.objects.bulk_create(attempts)
+    if attempts and attempts[0].pk is None:
+        # The database backend can't return ids from a bulk insert
+        attempts = list(
+            UserAttempt.objects.filter(
+                quiz=quiz, user_id__in=user_ids, started_at__isnull=True
+            ).order_by("-id")[: len(attempts)]
+        )[::-1]
 
-            bulk_question_list = []
-
-            if quiz.grouped_questions:
-                for group in quiz.question_groups.prefetch_related("group__questions"):
-                    # Get questions based on group settings
-                    questions = group.group.questions.all()
-
-                    if group.random_questions:
-                        questions = sample(list(questions), group.total_questions)
-                        question_orders = sample(
-                            list(range(group.total_questions)),
-                            group.total_questions,
-                        )
-                    else:
-                        question_orders = list(range(len(questions)))
-
-                    for index, question in enumerate(questions):
-                        bulk_question_list.append(
-                            QuizInstanceQuestion(
-                                user_attempt=user_attempt,
-                                group=group,
-                                question=question,
-                                question_order=question_orders[index],
-                                score=group.point,
-                            )
-                        )
-            else:
-                # Quiz does not have grouped questions
-                quiz_questions = quiz.quiz_questions.all()
-
-                if quiz.has_random_questions:
-                    quiz_questions = sample(list(quiz_questions), quiz.total_questions)
-                    question_orders = sample(list(range(quiz.total_questions)), quiz.total_questions)
-                else:
-                    quiz_questions = list(quiz_questions)
-                    question_orders = list(range(len(quiz_questions)))
-
-                for index, quiz_question in enumerate(quiz_questions):
-                    bulk_question_list.append(
-                        QuizInstanceQuestion(
-                            user_attempt=user_attempt,
-                            question=quiz_question.question,
-                            question_order=question_orders[index],
-                            score=quiz_question.score,
-                        )
-                    )
+    created_questions = QuizInstanceQuestion.objects.bulk_create(
+        [
+            QuizInstanceQuestion(
+                user_attempt=user_attempt,
+                group_id=group_id,
+                question_id=question_id,
+                question_order=order,
+                score=score,
+            )
+            for user_attempt, questions in zip(attempts, attempt_questions)
+            for question_id, group_id, order, score, _ in questions
+        ]
+    )
+    if not seeded:
+        create_instance_options(
+            blueprint,
+            [question for questions in attempt_questions for question in questions],
+            created_questions,
+        )
 
-            QuizInstanceQuestion.objects.bulk_create(bulk_question_list)
-
-            created_questions = user_attempt.instance_questions.select_related(
-                "group"
-            ).prefetch_related("question__options")
-            bulk_options_list = []
-
-            for new_question in created_questions:
-                options = list(new_question.question.options.all())
-
-                if (
-                    quiz.grouped_questions
-                    and new_question.group.random_options
-                    or quiz.has_random_options
-                ):
-                    shuffle(options)
-
-                for index, option in enumerate(options):
-                    bulk_options_list.append(
-                        QuizInstanceOption(
-                            question_instance=new_question,
-                            option=option,
-                            option_order=index,
-                        )
-                    )
-            QuizInstanceOption.objects.bulk_create(bulk_options_list)
+    return attempts
 
-            # Calculate the end time based on the quiz duration
+
+def claim_prepared_attempt(user, quiz: Quiz, start_time) -> UserAttempt | None:
+    # Stamps the oldest pre-generated attempt of the user, the conditional
+    # update makes sure two concurrent starts can't claim the same one.
+    for user_attempt in UserAttempt.objects.filter(
+        quiz=quiz, user=user, started_at__isnull=True, is_completed=False
+    ).order_by("id")[:2]:
+        user_attempt.started_at = start_time
+        user_attempt.end_time = min(
+            start_time + timedelta(minutes=quiz.duration), quiz.end_time
+        )
+        claimed = UserAttempt.objects.filter(
+            pk=user_attempt.pk, started_at__isnull=True
+        ).update(started_at=user_attempt.started_at, end_time=user_attempt.end_time)
+        if claimed:
+            return user_attempt
+    return None
+
+
+def create_user_attempt(user, quiz: Quiz) -> UserAttempt | None:
+    try:
+        # Rolled back as a whole when the build fails, so no half-built attempt
+        # is left for claim_prepared_attempt to hand out later
+        with transaction.atomic():
             start_time = timezone.localtime()
+            user_attempt = claim_prepared_attempt(user, quiz, start_time)
+            if user_attempt:
+                return user_attempt
+
+            # Create the user attempt instance
+            user_attempt = prepare_attempts(quiz, [user.id])[0]
+
+            # Calculate the end time based on the quiz duration
             user_attempt.started_at = start_time
             user_attempt.end_time = min(start_time + timedelta(minutes=quiz.duration), quiz.end_time)
             user_attempt.save()
 
             return user_attempt
-        except Exception as e:
-            logging.exception(e)
+    except Exception as e:
+        logging.exception(e)
+        return None
+
+
+def get_startable_quiz(user_id, quiz_id, now=None) -> Quiz:
+    # Every start check in one query. Raises Http404 for unknown quizzes and
+    # PermissionDenied when the user can't start the quiz now.
+    now = now or timezone.localtime()
+    attempts = UserAttempt.objects.filter(quiz=OuterRef("pk"), user_id=user_id)
+    quiz = (
+        Quiz.objects.filter(pk=quiz_id)
+        .annotate(
+            is_allowed=Exists(
+                AllowedUser.objects.filter(quiz=OuterRef("pk"), user_id=user_id)
+            ),
+            used_attempts=Coalesce(
+                Subquery(
+                    attempts.filter(started_at__isnull=False)
+                    .order_by()
+                    .values("quiz")
+                    .annotate(count=Count("id"))
+                    .values("count")
+                ),
+                0,
+            ),
+            has_open_attempt=Exists(attempts.filter(open_attempt_filter(user_id, now))),
+        )
+        .first()
+    )
+    if quiz is None:
+        raise Http404
+
+    if not (
+        quiz.start_time <= now <= quiz.end_time
+        and not quiz.has_open_attempt
+        and quiz.used_attempts < quiz.attempts
+        and (quiz.access == "public" or quiz.is_allowed)
+    ):
+        raise PermissionDenied
+    return quiz
+
+
+def start_user_attempt(user, quiz_id) -> UserAttempt | None:
+    # Checks and creation run in one transaction holding a lock on the user
+    # row, so double clicks and retries can't both pass the checks.
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(pk=user.id).values_list("id"))
+        quiz = get_startable_quiz(user.id, quiz_id)
+        return create_user_attempt(user, quiz)
+
+
+def create_instance_options(blueprint: dict, questions: list, created_questions):
+    if created_questions and any(q.pk is None for q in created_questions):
+        # The database backend can't return ids from a bulk insert
+        created_questions = QuizInstanceQuestion.objects.filter(
+            user_attempt_id__in={q.user_attempt_id for q in created_questions}
+        ).only("id", "question_id")
+
+    # Only the options of the sampled questions are read
+    options = {}
+    for question_id, option_id in (
+        QuestionOption.objects.filter(
+            question_id__in={question[0] for question in questions}
+        )
+        .order_by("question_id", "order_number", "id")
+        .values_list("question_id", "id")
+    ):
+        options.setdefault(question_id, []).append(option_id)
+
+    random_options = {question[0]: question[4] for question in questions}
+    bulk_options_list = []
+
+    for new_question in created_questions:
+        question_options = list(options.get(new_question.question_id, []))
+
+        if (
+            blueprint["grouped"]
+            and random_options[new_question.question_id]
+            or blueprint["random_options"]
+        ):
+            shuffle(question_options)
+
+        for index, option_id in enumerate(question_options):
+            bulk_options_list.append(
+                QuizInstanceOption(
+                    question_instance=new_question,
+                    option_id=option_id,
+                    option_order=index,
+                )
+            )
+    QuizInstanceOption.objects.bulk_create(bulk_options_list)
+
+
+def pregenerate_attempts(quiz: Quiz, chunk_size: int = 500) -> int:
+    # Builds one unstarted attempt for every allowed user who has attempts
+    # left and no pre-generated attempt waiting, one transaction per chunk.
+    started = (
+        UserAttempt.objects.filter(quiz=quiz, started_at__isnull=False)
+        .values("user_id")
+        .annotate(total=Count("id"))
+        .filter(total__gte=quiz.attempts)
+        .values("user_id")
+    )
+    waiting = UserAttempt.objects.filter(
+        quiz=quiz, started_at__isnull=True, is_completed=False
+    ).values("user_id")
+    user_ids = list(
+        AllowedUser.objects.filter(quiz=quiz)
+        .exclude(user_id__in=started)
+        .exclude(user_id__in=waiting)
+        .order_by("user_id")
+        .values_list("user_id", flat=True)
+    )
+
+    for index in range(0, len(user_ids), chunk_size):
+        with transaction.atomic():
+            prepare_attempts(quiz, user_ids[index : index + chunk_size])
+    return len(user_ids)
+
+
+def pregenerate_upcoming_attempts(within: timedelta, chunk_size: int = 500) -> dict:
+    # Scheduler hook: prepares attempts of private quizzes opening soon.
+    now = timezone.localtime()
+    return {
+        quiz.id: pregenerate_attempts(quiz, chunk_size)
+        for quiz in Quiz.objects.filter(
+            access="private", start_time__gt=now, start_time__lte=now + within
+        )
+    }
+
+
+def open_attempt_filter(user_id, now, prefix="") -> Q:
+    return Q(
+        **{
+            f"{prefix}user_id": user_id,
+            f"{prefix}is_completed": False,
+            f"{prefix}started_at__lte": now,
+            f"{prefix}end_time__gte": now,
+        }
+    )
+
+
+def select_question_option(
+    user_id, question_id, option_id, seeded: bool, version=None
+) -> bool:
+    # Records the answer with the ownership, active user, time window, option
+    # and optional version checks in the WHERE clause, the user id comes from
+    # a token that outlives deactivation. Returns False when nothing matched.
+    questions = QuizInstanceQuestion.objects.filter(
+        open_attempt_filter(user_id, timezone.localtime(), "user_attempt__"),
+        id=question_id,
+        user_attempt__user__is_active=True,
+        user_attempt__seed__isnull=not seeded,
+    )
+    if version is not None:
+        questions = questions.filter(version=version)
+
+    if seeded:
+        # Seeded attempts send QuestionOption ids
+        matched = questions.filter(
+            Exists(
+                QuestionOption.objects.filter(
+                    id=option_id, question_id=OuterRef("question_id")
+                )
+            )
+        ).update(selected_option_id=option_id, version=F("version") + 1)
+    else:
+        instance_option = QuizInstanceOption.objects.filter(
+            id=option_id, question_instance_id=OuterRef("pk")
+        )
+        # Without a savepoint a click is two statements in any transaction
+        with transaction.atomic(savepoint=False):
+            matched = questions.filter(Exists(instance_option)).update(
+                selected_option_id=Subquery(instance_option.values("option_id")[:1]),
+                version=F("version") + 1,
+            )
+            if matched:
+                QuizInstanceOption.objects.filter(
+                    question_instance_id=question_id
+                ).update(
+                    selected=Case(
+                        When(id=option_id, then=Value(True)), default=Value(False)
+                    )
+                )
+    if matched:
+        schedule_leaderboard_update(question_ids=[question_id])
+    return bool(matched)
+
+
+def select_question_options(user_id, attempt_id, answers) -> dict | None:
+    # Applies (question_id, option_id, version) answers of one attempt in a
+    # single transaction. An answer is applied only when its version is the
+    # current version of the question, so retried or reordered requests can't
+    # overwrite newer answers. Returns None when the attempt isn't open.
+    with transaction.atomic(savepoint=False):
+        attempt = (
+            UserAttempt.objects.select_for_update(of=("self",))
+            .filter(
+                open_attempt_filter(user_id, timezone.localtime()),
+                pk=attempt_id,
+                user__is_active=True,
+            )
+            .only("id", "seed")
+            .first()
+        )
+        if attempt is None:
             return None
+
+        questions = {
+            question["id"]: question
+            for question in QuizInstanceQuestion.objects.filter(
+                user_attempt=attempt
+            ).values("id", "question_id", "selected_option_id", "version")
+        }
+        if attempt.is_seeded:
+            # Seeded attempts send QuestionOption ids
+            options = {
+                (question_id, option_id): option_id
+                for question_id, option_id in QuestionOption.objects.filter(
+                    question_id__in=[q["question_id"] for q in questions.values()]
+                ).values_list("question_id", "id")
+            }
+            instance_options = None
+        else:
+            # (question, option id sent by the client) -> QuestionOption id
+            # and back, for row storage the client sends QuizInstanceOption ids
+            options = {}
+            instance_options = {}
+            for instance_option_id, question_instance_id, option_id in (
+                QuizInstanceOption.objects.filter(
+                    question_instance__user_attempt=attempt
+                ).values_list("id", "question_instance_id", "option_id")
+            ):
+                options[(question_instance_id, instance_option_id)] = option_id
+                instance_options[(question_instance_id, option_id)] = instance_option_id
+
+        changed = set()
+        rejected = []
+        for question_id, option_id, version in answers:
+            question = questions.get(question_id)
+            if question is None:
+                rejected.append(question_id)
+                continue
+            key = question["question_id"] if attempt.is_seeded else question_id
+            if (key, option_id) not in options or question["version"] != version:
+                rejected.append(question_id)
+                continue
+            question["selected_option_id"] = options[(key, option_id)]
+            question["version"] += 1
+            changed.add(question_id)
+
+        if changed:
+            QuizInstanceQuestion.objects.bulk_update(
+                [
+                    QuizInstanceQuestion(
+                        id=question_id,
+                        selected_option_id=questions[question_id]["selected_option_id"],
+                        version=questions[question_id]["version"],
+                    )
+                    for question_id in changed
+                ],
+                ["selected_option_id", "version"],
+            )
+            if not attempt.is_seeded:
+                selected_instance_options = [
+                    instance_options[(q, questions[q]["selected_option_id"])]
+                    for q in changed
+                ]
+                QuizInstanceOption.objects.filter(
+                    question_instance_id__in=changed
+                ).update(
+                    selected=Case(
+                        When(id__in=selected_instance_options, then=Value(True)),
+                        default=Value(False),
+                    )
+                )
+            schedule_leaderboard_update(attempt_ids=[attempt.id])
+
+    selections = {}
+    for question_id, question in questions.items():
+        selected = question["selected_option_id"]
+        if selected is not None and not attempt.is_seeded:
+            selected = instance_options.get((question_id, selected))
+        selections[question_id] = [selected, question["version"]]
+    return {"selections": selections, "rejected": rejected}
+
+
+def selection_error_status(user_id, question_id, version=None) -> int:
+    # Explains why select_question_option matched nothing: 409 when the
+    # attempt is no longer open or the version is stale, 403 otherwise.
+    question = (
+        QuizInstanceQuestion.objects.filter(
+            id=question_id, user_attempt__user_id=user_id
+        )
+        .values(
+            "version",
+            "user_attempt__is_completed",
+            "user_attempt__started_at",
+            "user_attempt__end_time",
+        )
+        .first()
+    )
+    if question is None:
+        return 403
+
+    now = timezone.localtime()
+    started_at = question["user_attempt__started_at"]
+    if (
+        question["user_attempt__is_completed"]
+        or started_at is None
+        or not started_at <= now <= question["user_attempt__end_time"]
+        or version is not None
+        and version != question["version"]
+    ):
+        return 409
+    return 403
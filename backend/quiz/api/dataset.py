@@ -0,0 +1,361 @@
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from account.models import Grade
+from quiz.models import (
+    QuestionCategory,
+    Question,
+    QuestionOption,
+    QuizCategory,
+    Quiz,
+    QuizQuestion,
+    QuizQuestionGroup,
+    AllowedUser,
+    UserAttempt,
+    QuizInstanceQuestion,
+    QuizInstanceOption,
+)
+from quiz.api.blueprint import get_quiz_blueprint
+from quiz.api.counters import add_to_counter
+from quiz.api.crud import sample_questions
+from quiz.api.grading import grade_attempts
+from quiz.api.importer import save_questions
+from quiz.api.leaderboard import rebuild_leaderboard
+from quiz.api.sampling import new_generator
+
+User = get_user_model()
+
+# Synthetic exam-scale data for performance work: users spread over grades,
+# question banks, grouped and ungrouped private quizzes with their rosters,
+# and finished, graded attempts. Every random choice comes from one seeded
+# generator, so the same arguments give the same data on an empty database.
+# Rows are written with bulk inserts, one transaction per chunk.
+
+DATASET_CHUNK_SIZE = 5000
+
+FIRST_NAMES = ["Aziz", "Dilnoza", "Jasur", "Kamola", "Laylo", "Otabek", "Sardor"]
+LAST_NAMES = ["Karimov", "Rahimova", "Tursunov", "Yusupova", "Nazarov", "Aliyeva"]
+WORDS = (
+    "atom bond cell charge energy force gas heat ion mass matter metal "
+    "molecule motion orbit pressure reaction salt solution speed wave"
+).split()
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def sentence(rng, words: int) -> str:
+    return " ".join(rng.choice(WORDS, size=words)).capitalize()
+
+
+def create_users(prefix, rng, grade_ids, total, password, chunk_size) -> list:
+    # (user id, grade id) of the new users. The password is hashed once,
+    # every user shares it.
+    password = make_password(password)
+    for numbers in chunked(range(total), chunk_size):
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f"{prefix}-{number:07d}",
+                    password=password,
+                    first_name=str(rng.choice(FIRST_NAMES)),
+                    last_name=str(rng.choice(LAST_NAMES)),
+                    grade_id=grade_ids[number % len(grade_ids)],
+                )
+                for number in numbers
+            ]
+        )
+    return list(
+        User.objects.filter(username__startswith=f"{prefix}-")
+        .order_by("id")
+        .values_list("id", "grade_id")
+    )
+
+
+def create_questions(prefix, rng, category_ids, total, options, chunk_size):
+    for category_id in category_ids:
+        for numbers in chunked(range(total), chunk_size):
+            questions, question_options = [], []
+            for number in numbers:
+                questions.append(
+                    Question(
+                        category_id=category_id,
+                        body_text=f"{prefix} {number}. {sentence(rng, 8)}?",
+                        score=float(rng.choice([1, 1, 2])),
+                    )
+                )
+                orders = rng.permutation(options) + 1
+                question_options.append(
+                    [
+                        QuestionOption(
+                            body_text=sentence(rng, 3),
+                            order_number=int(order),
+                            is_correct=index == 0,
+                        )
+                        for index, order in enumerate(orders)
+                    ]
+                )
+            save_questions(questions, question_options)
+
+
+def create_quiz(prefix, rng, number, category_ids, quiz_category_ids, size) -> Quiz:
+    # Odd quizzes draw from question groups, even ones have a fixed list.
+    # All of them are private and over, so their attempts are finished.
+    grouped = number % 2 == 1
+    start_time = timezone.now() - timedelta(days=number + 1)
+    quiz = Quiz.objects.create(
+        title=f"{prefix} quiz {number}",
+        category_id=quiz_category_ids[number % len(quiz_category_ids)],
+        start_time=start_time,
+        duration=60,
+        access="private",
+        grouped_questions=grouped,
+        has_random_options=bool(rng.random() < 0.5),
+        total_questions=size,
+    )
+
+    if grouped:
+        groups = rng.choice(category_ids, size=min(3, len(category_ids)), replace=False)
+        for order, category_id in enumerate(groups, start=1):
+            QuizQuestionGroup.objects.create(
+                quiz=quiz,
+                title=f"Part {order}",
+                group_id=int(category_id),
+                random_questions=True,
+                random_options=quiz.has_random_options,
+                total_questions=max(size // len(groups), 1),
+                point=float(order),
+            )
+    else:
+        question_ids = rng.choice(
+            Question.objects.filter(category_id=int(rng.choice(category_ids)))
+            .order_by("id")
+            .values_list("id", flat=True),
+            size=size,
+            replace=False,
+        )
+        QuizQuestion.objects.bulk_create(
+            [
+                QuizQuestion(
+                    quiz=quiz, question_id=int(question_id), order_number=order
+                )
+                for order, question_id in enumerate(question_ids, start=1)
+            ]
+        )
+        add_to_counter(Quiz, "quiz_question_count", {quiz.id: len(question_ids)})
+    return quiz
+
+
+def quiz_options(quiz: Quiz) -> dict:
+    # {question id: (option ids by order number, correct option id)}
+    if quiz.grouped_questions:
+        questions = Question.objects.filter(
+            category__in=quiz.question_groups.values("group")
+        )
+    else:
+        questions = Question.objects.filter(
+            id__in=quiz.quiz_questions.values("question")
+        )
+    options = {}
+    for question_id, option_id, is_correct in (
+        QuestionOption.objects.filter(question__in=questions)
+        .order_by("question_id", "order_number", "id")
+        .values_list("question_id", "id", "is_correct")
+    ):
+        option_ids, correct = options.get(question_id, ([], None))
+        option_ids.append(option_id)
+        options[question_id] = (option_ids, option_id if is_correct else correct)
+    return options
+
+
+def create_attempts(rng, quiz: Quiz, user_ids, ability: dict, chunk_size) -> int:
+    # Finished attempts of ``user_ids``. Each user answers 95% of the
+    # questions, and each answer is right with the probability of their
+    # ``ability``.
+    blueprint = get_quiz_blueprint(quiz)
+    options = quiz_options(quiz)
+    seeded = settings.QUIZ_ATTEMPT_STORAGE == "seed"
+
+    for users in chunked(user_ids, chunk_size):
+        attempts, attempt_questions = [], []
+        for user_id in users:
+            questions = sample_questions(blueprint, rng)
+            attempts.append(
+                UserAttempt(
+                    quiz=quiz,
+                    user_id=user_id,
+                    started_at=quiz.start_time,
+                    end_time=quiz.end_time,
+                    is_completed=True,
+                    completed_at=quiz.end_time,
+                    seed=int(rng.integers(2**63)) if seeded else None,
+                    question_ids=[question[0] for question in questions],
+                )
+            )
+            attempt_questions.append(questions)
+
+        with transaction.atomic():
+            UserAttempt.objects.bulk_create(attempts)
+            if attempts[0].pk is None:
+                # The database backend can't return ids from a bulk insert
+                attempts = list(
+                    UserAttempt.objects.filter(quiz=quiz, user_id__in=users).order_by(
+                        "id"
+                    )
+                )
+
+            instance_questions, random_options = [], []
+            for attempt, questions in zip(attempts, attempt_questions):
+                for question_id, group_id, order, score, group_random in questions:
+                    option_ids, correct = options[question_id]
+                    selected = None
+                    if rng.random() < 0.95:
+                        wrong = [o for o in option_ids if o != correct]
+                        if rng.random() < ability[attempt.user_id] or not wrong:
+                            selected = correct
+                        else:
+                            selected = int(rng.choice(wrong))
+                    instance_questions.append(
+                        QuizInstanceQuestion(
+                            user_attempt=attempt,
+                            group_id=group_id,
+                            question_id=question_id,
+                            question_order=order,
+                            score=score,
+                            selected_option_id=selected,
+                        )
+                    )
+                    random_options.append(
+                        blueprint["grouped"]
+                        and group_random
+                        or blueprint["random_options"]
+                    )
+            QuizInstanceQuestion.objects.bulk_create(instance_questions)
+            if not seeded:
+                if instance_questions[0].pk is None:
+                    instance_questions = list(
+                        QuizInstanceQuestion.objects.filter(
+                            user_attempt__in=attempts
+                        ).order_by("id")
+                    )
+                instance_options = []
+                for instance_question, shuffled in zip(
+                    instance_questions, random_options
+                ):
+                    question_options = options[instance_question.question_id][0]
+                    if shuffled:
+                        question_options = rng.permutation(question_options).tolist()
+                    instance_options.extend(
+                        QuizInstanceOption(
+                            question_instance=instance_question,
+                            option_id=option_id,
+                            option_order=index,
+                            selected=option_id == instance_question.selected_option_id,
+                        )
+                        for index, option_id in enumerate(question_options)
+                    )
+                QuizInstanceOption.objects.bulk_create(
+                    instance_options, batch_size=chunk_size
+                )
+            grade_attempts([attempt.id for attempt in attempts])
+
+    rebuild_leaderboard(quiz)
+    return len(user_ids)
+
+
+def generate_dataset(
+    prefix,
+    seed=0,
+    grades=10,
+    users=20000,
+    categories=20,
+    questions=500,
+    options=4,
+    quizzes=10,
+    quiz_questions=40,
+    completion=0.6,
+    password="password",
+    chunk_size=DATASET_CHUNK_SIZE,
+    log=lambda message: None,
+) -> dict:
+    rng = new_generator(seed)
+    created = {}
+
+    Grade.objects.bulk_create(
+        [Grade(name=f"{prefix} grade {number}") for number in range(grades)]
+    )
+    grade_ids = list(
+        Grade.objects.filter(name__startswith=f"{prefix} grade ")
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    user_grades = create_users(prefix, rng, grade_ids, users, password, chunk_size)
+    ability = dict(
+        zip(
+            [user_id for user_id, _ in user_grades],
+            rng.beta(5, 3, size=len(user_grades)).tolist(),
+        )
+    )
+    created["users"] = len(user_grades)
+    log(f"{created['users']} users in {len(grade_ids)} grades")
+
+    QuestionCategory.objects.bulk_create(
+        [
+            QuestionCategory(name=f"{prefix} category {number}")
+            for number in range(categories)
+        ]
+    )
+    category_ids = list(
+        QuestionCategory.objects.filter(name__startswith=f"{prefix} category ")
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    create_questions(prefix, rng, category_ids, questions, options, chunk_size)
+    created["questions"] = len(category_ids) * questions
+    log(f"{created['questions']} questions in {len(category_ids)} categories")
+
+    QuizCategory.objects.bulk_create(
+        [QuizCategory(name=f"{prefix} {name}") for name in ("midterm", "final")]
+    )
+    quiz_category_ids = list(
+        QuizCategory.objects.filter(name__startswith=f"{prefix} ")
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    users_by_grade = {}
+    for user_id, grade_id in user_grades:
+        users_by_grade.setdefault(grade_id, []).append(user_id)
+
+    created["allowed_users"] = created["attempts"] = 0
+    for number in range(quizzes):
+        quiz = create_quiz(
+            prefix, rng, number, category_ids, quiz_category_ids, quiz_questions
+        )
+        roster = [
+            user_id
+            for grade_id in rng.choice(
+                grade_ids, size=min(2, len(grade_ids)), replace=False
+            )
+            for user_id in users_by_grade.get(int(grade_id), [])
+        ]
+        for user_ids in chunked(roster, chunk_size):
+            with transaction.atomic():
+                AllowedUser.objects.bulk_create(
+                    [AllowedUser(quiz=quiz, user_id=user_id) for user_id in user_ids]
+                )
+                add_to_counter(Quiz, "total_participants", {quiz.id: len(user_ids)})
+        participants = [user_id for user_id in roster if rng.random() < completion]
+        created["allowed_users"] += len(roster)
+        created["attempts"] += create_attempts(
+            rng, quiz, participants, ability, chunk_size
+        )
+        log(
+            f"Quiz {quiz.id}: {len(roster)} allowed users, {len(participants)} attempts"
+        )
+
+    return created
@@ -0,0 +1,150 @@
+import csv
+from string import ascii_uppercase
+from tempfile import TemporaryFile
+from openpyxl import Workbook
+from quiz.models import Quiz, UserAttempt, QuizInstanceQuestion
+from quiz.api.blueprint import get_quiz_blueprint
+from quiz.api.sampling import get_category_pools
+
+# Results are read one chunk of attempts at a time (keyset on the attempt
+# id), so memory does not grow with the number of students.
+
+EXPORT_CHUNK_SIZE = 500
+
+
+def option_label(order_number) -> str:
+    if order_number is None:
+        return ""
+    if order_number <= len(ascii_uppercase):
+        return ascii_uppercase[order_number - 1]
+    return str(order_number)
+
+
+def answer_columns(blueprint: dict) -> tuple:
+    # ({group id: (first column, columns)}, total columns). Attempts number
+    # their questions from 0 within each group, the groups follow each other
+    # in their order. Questions of a fixed list quiz have no group.
+    if not blueprint["grouped"]:
+        if blueprint["random_questions"]:
+            total = blueprint["total_questions"]
+        else:
+            total = len(blueprint["question_ids"])
+        return {None: (0, total)}, total
+
+    pools = get_category_pools(
+        {
+            group["category_id"]
+            for group in blueprint["groups"]
+            if not group["random_questions"]
+        }
+    )
+    columns, total = {}, 0
+    for group in blueprint["groups"]:
+        if group["random_questions"]:
+            size = group["total_questions"]
+        else:
+            size = len(pools[group["category_id"]])
+        columns[group["id"]] = (total, size)
+        total += size
+    return columns, total
+
+
+def result_rows(quiz: Quiz, chunk_size=EXPORT_CHUNK_SIZE):
+    columns, total_questions = answer_columns(get_quiz_blueprint(quiz))
+    yield [
+        "Attempt",
+        "Username",
+        "First name",
+        "Last name",
+        "Started at",
+        "Completed at",
+        "Correct",
+        "Score",
+        *(f"Q{order}" for order in range(1, total_questions + 1)),
+    ]
+
+    last_id = 0
+    while True:
+        attempts = list(
+            UserAttempt.objects.filter(
+                quiz=quiz, started_at__isnull=False, id__gt=last_id
+            )
+            .order_by("id")
+            .values_list(
+                "id",
+                "user__username",
+                "user__first_name",
+                "user__last_name",
+                "started_at",
+                "completed_at",
+            )[:chunk_size]
+        )
+        if not attempts:
+            return
+        last_id = attempts[-1][0]
+
+        answers = {}
+        for attempt_id, group_id, order, selected, is_correct, score in (
+            QuizInstanceQuestion.objects.filter(
+                user_attempt_id__in=[attempt[0] for attempt in attempts]
+            )
+            .order_by()
+            .values_list(
+                "user_attempt_id",
+                "group_id",
+                "question_order",
+                "selected_option__order_number",
+                "selected_option__is_correct",
+                "score",
+            )
+        ):
+            first, size = columns.get(group_id, (0, 0))
+            column = first + order if 0 <= order < size else None
+            answers.setdefault(attempt_id, []).append(
+                (column, selected, is_correct, score)
+            )
+
+        for attempt_id, *user, started_at, completed_at in attempts:
+            selections = [""] * total_questions
+            correct, points = 0, 0.0
+            for column, selected, is_correct, score in answers.get(attempt_id, ()):
+                if column is not None:
+                    selections[column] = option_label(selected)
+                if is_correct:
+                    correct += 1
+                    points += score
+            yield [
+                attempt_id,
+                *user,
+                started_at.isoformat() if started_at else "",
+                completed_at.isoformat() if completed_at else "",
+                correct,
+                points,
+                *selections,
+            ]
+
+
+class Echo:
+    # File-like object whose write returns the line for StreamingHttpResponse
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def xlsx_file(rows):
+    # An xlsx is a zip archive, it can only be sent once it is complete. The
+    # write-only workbook keeps rows out of memory and the archive is written
+    # to a temporary file instead.
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Results")
+    for row in rows:
+        sheet.append(row)
+    output = TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
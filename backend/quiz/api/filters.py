@@ -1,23 +1,50 @@
 from rest_framework.filters import BaseFilterBackend
 from rest_framework import filters
-from quiz.models import Question
+from django.db.models import Q, Exists, OuterRef, Case, When, IntegerField
+from quiz.models import QuestionOption
+from quiz.api.search import search_question_ids
 
 
-class CustomIdFilter(BaseFilterBackend):
+class QuestionSearchFilter(BaseFilterBackend):
+    # Ranked full-text search, a number also matches the question id
     def filter_queryset(self, request, queryset, view):
-        search_key: str = request.query_params.get("search")
-        if not search_key or not search_key.isdigit():
-            return queryset
-        found = Question.objects.filter(id=int(search_key))
-        if found.count() > 0:
-            return found
-        else:
+        search_key: str = request.query_params.get("search", "").strip()
+        if not search_key:
             return queryset
 
+        category = request.query_params.get("category", "")
+        ids = search_question_ids(
+            search_key, int(category) if category.isdigit() else None
+        )
+        if ids is None:
+            return queryset.filter(
+                Q(body_text__icontains=search_key)
+                | Q(
+                    Exists(
+                        QuestionOption.objects.filter(
+                            question=OuterRef("pk"), body_text__icontains=search_key
+                        )
+                    )
+                )
+            )
+        if search_key.isdigit():
+            ids = [int(search_key), *ids]
+        if not ids:
+            return queryset.none()
+        return queryset.filter(id__in=ids).order_by(
+            Case(
+                *(
+                    When(id=question_id, then=rank)
+                    for rank, question_id in enumerate(ids)
+                ),
+                output_field=IntegerField(),
+            )
+        )
+
 
 class CustomQuestionFilter(filters.BaseFilterBackend):
     def filter_queryset(self, request, queryset, view):
         category = request.query_params.get("category")
         if category:
             queryset = queryset.filter(category=category)
-        return queryset
\ No newline at end of file
+        return queryset
@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models import Count, Sum, Q, FloatField, Value
+from django.db.models.functions import Coalesce
+from quiz.models import Quiz, UserAttempt, QuizInstanceQuestion, AttemptResult
+
+# Grading is two aggregate queries over QuizInstanceQuestion, one grouped by
+# (attempt, group) and one by attempt, whatever the number of attempts.
+
+RESULT_BATCH_SIZE = 1000
+
+CORRECT = Q(selected_option__is_correct=True)
+
+
+def aggregate_results(questions):
+    return questions.annotate(
+        points=Coalesce(
+            Sum("score", filter=CORRECT), Value(0.0), output_field=FloatField()
+        ),
+        correct=Count("id", filter=CORRECT),
+        answered=Count("selected_option_id"),
+        total=Count("id"),
+    ).order_by()
+
+
+def grade_attempts(attempts) -> int:
+    # ``attempts`` is a UserAttempt queryset or a list of attempt ids
+    questions = QuizInstanceQuestion.objects.filter(user_attempt__in=attempts)
+
+    results = [
+        AttemptResult(
+            user_attempt_id=row["user_attempt_id"],
+            group_id=row["group_id"],
+            score=row["points"],
+            correct=row["correct"],
+            answered=row["answered"],
+            total=row["total"],
+        )
+        for row in aggregate_results(
+            questions.filter(group__isnull=False).values("user_attempt_id", "group_id")
+        )
+    ]
+    results.extend(
+        AttemptResult(
+            user_attempt_id=row["user_attempt_id"],
+            score=row["points"],
+            correct=row["correct"],
+            answered=row["answered"],
+            total=row["total"],
+        )
+        for row in aggregate_results(questions.values("user_attempt_id"))
+    )
+
+    with transaction.atomic():
+        AttemptResult.objects.filter(user_attempt__in=attempts).delete()
+        AttemptResult.objects.bulk_create(results, batch_size=RESULT_BATCH_SIZE)
+    return sum(1 for result in results if result.group_id is None)
+
+
+def attempt_scores(attempts) -> dict:
+    return {
+        row["user_attempt_id"]: row["points"]
+        for row in aggregate_results(
+            QuizInstanceQuestion.objects.filter(user_attempt__in=attempts).values(
+                "user_attempt_id"
+            )
+        )
+    }
+
+
+def grade_quiz(quiz: Quiz) -> int:
+    return grade_attempts(
+        UserAttempt.objects.filter(quiz=quiz, started_at__isnull=False).values("id")
+    )
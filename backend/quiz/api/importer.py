@@ -0,0 +1,202 @@
+import io
+import csv
+import json
+import random
+from collections import Counter
+from itertools import islice
+from openpyxl import load_workbook
+from django.db import connection, transaction
+from quiz.models import QuestionCategory, Question, QuestionOption
+from quiz.api.sampling import invalidate_category_pools
+from quiz.api.search import index_questions
+from quiz.api.counters import add_to_counter
+
+# Question rows are read lazily from xlsx, csv or jsonl files and written in
+# chunks, every chunk is one transaction with one INSERT of questions and one
+# of options.
+
+IMPORT_CHUNK_SIZE = 1000
+
+
+def excel_rows(excel_file):
+    # (row number, cells) of every row below the header
+    workbook = load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        for number, cells in enumerate(
+            workbook.active.iter_rows(min_row=2, values_only=True), start=2
+        ):
+            yield number, cells
+    finally:
+        workbook.close()
+
+
+def csv_rows(csv_file):
+    # Same columns as the Excel sheet, the first line is a header
+    reader = csv.reader(io.TextIOWrapper(csv_file, encoding="utf-8-sig", newline=""))
+    next(reader, None)
+    for number, cells in enumerate(reader, start=2):
+        yield number, cells
+
+
+def jsonl_rows(jsonl_file):
+    # One object per line: {"question", "correct", "options", "score",
+    # "category"}, "options" being the other options
+    for number, line in enumerate(io.TextIOWrapper(jsonl_file, encoding="utf-8"), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError
+        except ValueError:
+            yield number, ValueError("Line is not a JSON object")
+            continue
+        others = record.get("options") or []
+        if not isinstance(others, list):
+            yield number, ValueError("Options must be a list")
+            continue
+        yield number, {
+            "question": record.get("question"),
+            "options": [record.get("correct"), *others],
+            "score": record.get("score"),
+            "category": record.get("category"),
+        }
+
+
+READERS = {"xlsx": excel_rows, "csv": csv_rows, "jsonl": jsonl_rows}
+
+
+def cell_text(value) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def cell_fields(cells, options: int) -> dict:
+    # Spreadsheet columns: question, correct option, the other options, then
+    # optional score and category
+    cells = list(cells) + [None] * (options + 3 - len(cells))
+    return {
+        "question": cells[0],
+        "options": cells[1 : options + 1],
+        "score": cells[options + 1],
+        "category": cells[options + 2],
+    }
+
+
+def parse_fields(fields: dict, default_category) -> tuple:
+    # Returns (question text, [correct option, other options...], score,
+    # category id), raises ValueError with the reason when the row can't be
+    # imported
+    body_text = cell_text(fields["question"])
+    if not body_text:
+        raise ValueError("Question text is empty")
+    option_texts = [cell_text(option) for option in fields["options"]]
+    if not option_texts:
+        raise ValueError("Options are missing")
+    for index, text in enumerate(option_texts, start=1):
+        if not text:
+            raise ValueError(f"Option {index} is empty")
+
+    score = cell_text(fields["score"])
+    try:
+        score = float(score) if score else None
+    except ValueError:
+        raise ValueError(f"Score {score} is not a number")
+    category = cell_text(fields["category"])
+    try:
+        category_id = int(float(category)) if category else default_category
+    except ValueError:
+        raise ValueError(f"Category {category} is not an id")
+    if not category_id:
+        raise ValueError("Category is missing")
+    return body_text, option_texts, score, category_id
+
+
+def save_questions(questions: list, options: list):
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            Question.objects.bulk_create(questions)
+            # bulk_create sends no post_save, the categories are counted here
+            add_to_counter(
+                QuestionCategory,
+                "total_questions",
+                Counter(question.category_id for question in questions),
+            )
+        else:
+            # post_save counts every saved question in its category
+            for question in questions:
+                question.save()
+        for question, question_options in zip(questions, options):
+            for option in question_options:
+                option.question = question
+        QuestionOption.objects.bulk_create(
+            [option for question_options in options for option in question_options]
+        )
+        index_questions([question.id for question in questions])
+
+
+def import_questions(
+    rows, category_id, options=None, dry_run=False, chunk_size=IMPORT_CHUNK_SIZE
+) -> dict:
+    # ``rows`` yields (row number, cells or fields dict or ValueError). Valid
+    # rows are imported, the others are reported with their row number.
+    # Raises ValueError when the default category doesn't exist.
+    if category_id and not QuestionCategory.objects.filter(id=category_id).exists():
+        raise ValueError(f"Category {category_id} does not exist")
+
+    created = 0
+    errors = []
+    categories = set()
+    rows = iter(rows)
+
+    while chunk := list(islice(rows, chunk_size)):
+        parsed = []
+        for number, row in chunk:
+            try:
+                if isinstance(row, ValueError):
+                    raise row
+                if not isinstance(row, dict):
+                    if all(cell_text(cell) == "" for cell in row):
+                        continue
+                    row = cell_fields(row, options)
+                parsed.append((number, *parse_fields(row, category_id)))
+            except ValueError as error:
+                errors.append({"row": number, "detail": str(error)})
+
+        known_categories = set(
+            QuestionCategory.objects.filter(
+                id__in={row[-1] for row in parsed}
+            ).values_list("id", flat=True)
+        )
+        questions, question_options = [], []
+        for number, body_text, option_texts, score, row_category in parsed:
+            if row_category not in known_categories:
+                errors.append(
+                    {"row": number, "detail": f"Category {row_category} does not exist"}
+                )
+                continue
+
+            orders = list(range(1, len(option_texts) + 1))
+            random.shuffle(orders)
+            question = Question(category_id=row_category, body_text=body_text)
+            if score is not None:
+                question.score = score
+            questions.append(question)
+            question_options.append(
+                [
+                    QuestionOption(
+                        body_text=text, order_number=order, is_correct=index == 0
+                    )
+                    for index, (text, order) in enumerate(zip(option_texts, orders))
+                ]
+            )
+            categories.add(row_category)
+
+        if questions and not dry_run:
+            save_questions(questions, question_options)
+        created += len(questions)
+
+    if created and not dry_run:
+        # bulk_create sends no signals
+        invalidate_category_pools(categories)
+    errors.sort(key=lambda error: error["row"])
+    return {"created": created, "errors": errors}
@@ -0,0 +1,218 @@
+from collections import Counter
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Sum, Q
+from django.db.models.functions import Coalesce
+from quiz.models import (
+    Quiz,
+    UserAttempt,
+    QuizInstanceQuestion,
+    LeaderboardEntry,
+    LeaderboardBucket,
+)
+from quiz.api.grading import attempt_scores
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A started attempt has one LeaderboardEntry with its current score once it
+# was answered or finalized, and counts towards one LeaderboardBucket
+# (quiz, score). Answers reach it after their transaction commits, batched per
+# process for QUIZ_LEADERBOARD_DELAY seconds, and the sweeper writes the final
+# score when it finalizes attempts. Top-N reads the (quiz, -score) index, the
+# rank of a score sums the buckets above it, so neither scans the attempts of
+# the quiz.
+
+SCORE_PRECISION = 6
+
+_changed_attempts = set()
+_changed_questions = set()
+_changed_lock = threading.Lock()
+_flush_timer = None
+
+
+def round_score(score) -> float:
+    # Buckets are keyed by score, keep float sums like 0.1 + 0.2 in one bucket
+    return round(score or 0.0, SCORE_PRECISION)
+
+
+def apply_bucket_changes(quiz_id, changes: Counter):
+    changes = {score: delta for score, delta in changes.items() if delta}
+    if not changes:
+        return
+    LeaderboardBucket.objects.bulk_create(
+        [LeaderboardBucket(quiz_id=quiz_id, score=score) for score in changes],
+        ignore_conflicts=True,
+    )
+    # In score order, so concurrent updates lock the buckets in the same order
+    for score, delta in sorted(changes.items()):
+        LeaderboardBucket.objects.filter(quiz_id=quiz_id, score=score).update(
+            count=F("count") + delta
+        )
+
+
+def update_leaderboard(attempts):
+    # ``attempts`` is a UserAttempt queryset, subquery or list of ids. The
+    # attempt rows are locked so concurrent updates of one attempt are applied
+    # one after the other.
+    with transaction.atomic():
+        locked = {
+            attempt_id: (quiz_id, user_id)
+            for attempt_id, quiz_id, user_id in UserAttempt.objects.select_for_update()
+            .filter(id__in=attempts, started_at__isnull=False)
+            .order_by("id")
+            .values_list("id", "quiz_id", "user_id")
+        }
+        if not locked:
+            return
+
+        scores = attempt_scores(list(locked))
+        entries = {
+            entry.user_attempt_id: entry
+            for entry in LeaderboardEntry.objects.filter(
+                user_attempt_id__in=list(locked)
+            ).only("id", "user_attempt_id", "score")
+        }
+
+        changes = {}
+        created, updated = [], []
+        for attempt_id, (quiz_id, user_id) in locked.items():
+            score = round_score(scores.get(attempt_id))
+            entry = entries.get(attempt_id)
+            quiz_changes = changes.setdefault(quiz_id, Counter())
+            if entry is None:
+                created.append(
+                    LeaderboardEntry(
+                        quiz_id=quiz_id,
+                        user_attempt_id=attempt_id,
+                        user_id=user_id,
+                        score=score,
+                    )
+                )
+            elif entry.score != score:
+                quiz_changes[entry.score] -= 1
+                entry.score = score
+                updated.append(entry)
+            else:
+                continue
+            quiz_changes[score] += 1
+
+        if created:
+            LeaderboardEntry.objects.bulk_create(created)
+        if updated:
+            LeaderboardEntry.objects.bulk_update(updated, ["score"])
+        for quiz_id, quiz_changes in sorted(changes.items()):
+            apply_bucket_changes(quiz_id, quiz_changes)
+
+
+def schedule_leaderboard_update(attempt_ids=(), question_ids=()):
+    # Called on the answer paths with the attempts or attempt questions that
+    # were answered, the leaderboard is updated once the answers are committed
+    def mark():
+        global _flush_timer
+        with _changed_lock:
+            _changed_attempts.update(attempt_ids)
+            _changed_questions.update(question_ids)
+            if settings.QUIZ_LEADERBOARD_DELAY:
+                if _flush_timer is None:
+                    _flush_timer = threading.Timer(
+                        settings.QUIZ_LEADERBOARD_DELAY, flush_in_thread
+                    )
+                    _flush_timer.daemon = True
+                    _flush_timer.start()
+                return
+        flush_leaderboard_updates()
+
+    transaction.on_commit(mark)
+
+
+def flush_leaderboard_updates():
+    global _flush_timer
+    with _changed_lock:
+        attempt_ids = set(_changed_attempts)
+        question_ids = list(_changed_questions)
+        _changed_attempts.clear()
+        _changed_questions.clear()
+        _flush_timer = None
+
+    if question_ids:
+        attempt_ids.update(
+            QuizInstanceQuestion.objects.filter(id__in=question_ids).values_list(
+                "user_attempt_id", flat=True
+            )
+        )
+    if attempt_ids:
+        update_leaderboard(sorted(attempt_ids))
+
+
+def flush_in_thread():
+    try:
+        flush_leaderboard_updates()
+    except Exception as e:
+        logger.exception(e)
+    finally:
+        connections.close_all()
+
+
+def rebuild_leaderboard(quiz: Quiz) -> int:
+    with transaction.atomic():
+        attempts = dict(
+            UserAttempt.objects.select_for_update()
+            .filter(quiz=quiz, started_at__isnull=False)
+            .values_list("id", "user_id")
+        )
+        scores = attempt_scores(list(attempts))
+        entries = [
+            LeaderboardEntry(
+                quiz=quiz,
+                user_attempt_id=attempt_id,
+                user_id=user_id,
+                score=round_score(scores.get(attempt_id)),
+            )
+            for attempt_id, user_id in attempts.items()
+        ]
+        buckets = Counter(entry.score for entry in entries)
+
+        LeaderboardEntry.objects.filter(quiz=quiz).delete()
+        LeaderboardBucket.objects.filter(quiz=quiz).delete()
+        LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+        LeaderboardBucket.objects.bulk_create(
+            [
+                LeaderboardBucket(quiz=quiz, score=score, count=count)
+                for score, count in buckets.items()
+            ],
+            batch_size=1000,
+        )
+    return len(entries)
+
+
+def top_entries(quiz_id, limit) -> list:
+    entries = list(
+        LeaderboardEntry.objects.filter(quiz_id=quiz_id)
+        .order_by("-score", "id")
+        .values(
+            "user_attempt_id",
+            "score",
+            username=F("user__username"),
+            first_name=F("user__first_name"),
+            last_name=F("user__last_name"),
+        )[:limit]
+    )
+    # Competition ranking, equal scores share the rank of the first of them
+    for position, entry in enumerate(entries):
+        if position and entry["score"] == entries[position - 1]["score"]:
+            entry["rank"] = entries[position - 1]["rank"]
+        else:
+            entry["rank"] = position + 1
+    return entries
+
+
+def score_rank(quiz_id, score=None) -> tuple:
+    # (rank, participants) of a score, the rank is None without a score
+    aggregates = {"participants": Coalesce(Sum("count"), 0)}
+    if score is not None:
+        aggregates["above"] = Coalesce(Sum("count", filter=Q(score__gt=score)), 0)
+    counts = LeaderboardBucket.objects.filter(quiz_id=quiz_id).aggregate(**aggregates)
+    rank = counts["above"] + 1 if score is not None else None
+    return rank, counts["participants"]
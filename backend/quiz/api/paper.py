@@ -0,0 +1,96 @@
+from hashlib import sha1
+from django.core.cache import cache
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+from quiz.models import (
+    Quiz,
+    Question,
+    QuestionOption,
+    QuizQuestion,
+    QuizQuestionGroup,
+    UserAttempt,
+)
+from quiz.api.counters import add_to_counter
+
+# The paper of an attempt is the text and photos of the questions it was
+# dealt, never the rest of the question bank. Attempts of a quiz with a fixed
+# list of questions are dealt the same questions, so they share one rendered
+# paper. Rendered papers are cached per Quiz.paper_version, a column moved
+# on every edit of the content, so all workers agree on the version.
+
+PAPER_TIMEOUT = 60 * 60 * 24
+
+
+def paper_cache_key(quiz_id, version, digest) -> str:
+    return f"quiz-paper:{quiz_id}:{version}:{digest}"
+
+
+def invalidate_quiz_papers(quiz_ids):
+    add_to_counter(Quiz, "paper_version", {quiz_id: 1 for quiz_id in quiz_ids})
+
+
+def quiz_ids_for_content(question_ids=(), category_ids=()) -> set:
+    return set(
+        QuizQuestion.objects.filter(question_id__in=question_ids).values_list(
+            "quiz_id", flat=True
+        )
+    ) | set(
+        QuizQuestionGroup.objects.filter(group_id__in=category_ids).values_list(
+            "quiz_id", flat=True
+        )
+    )
+
+
+def attempt_question_ids(attempt: UserAttempt) -> list:
+    if attempt.question_ids is not None:
+        return sorted(attempt.question_ids)
+    return sorted(attempt.instance_questions.values_list("question_id", flat=True))
+
+
+def paper_digest(question_ids) -> str:
+    return sha1(",".join(map(str, question_ids)).encode()).hexdigest()[:16]
+
+
+def build_paper(quiz: Quiz, question_ids) -> dict:
+    questions = (
+        Question.objects.filter(id__in=question_ids)
+        .order_by("id")
+        .prefetch_related(
+            Prefetch(
+                "options",
+                queryset=QuestionOption.objects.only(
+                    "id", "question_id", "body_text", "body_photo", "order_number"
+                ),
+            )
+        )
+    )
+
+    return {
+        "quiz": quiz.id,
+        "version": quiz.paper_version,
+        "questions": [
+            {
+                "id": question.id,
+                "body_text": question.body_text,
+                "body_photo": question.body_photo_url,
+                "options": [
+                    {
+                        "id": option.id,
+                        "body_text": option.body_text,
+                        "body_photo": option.body_photo_url,
+                    }
+                    for option in question.options.all()
+                ],
+            }
+            for question in questions
+        ],
+    }
+
+
+def get_rendered_paper(quiz: Quiz, question_ids) -> bytes:
+    key = paper_cache_key(quiz.id, quiz.paper_version, paper_digest(question_ids))
+    content = cache.get(key)
+    if content is None:
+        content = JSONRenderer().render(build_paper(quiz, question_ids))
+        cache.set(key, content, PAPER_TIMEOUT)
+    return content
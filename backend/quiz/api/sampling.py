@@ -0,0 +1,74 @@
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from quiz.models import Question
+
+# Question pools are the ids of every question in a category, kept as a
+# sorted int64 array. They are stored in the cache as raw bytes so that a
+# start only pays for a memcpy, never for loading Question rows.
+
+POOL_TIMEOUT = 60 * 60 * 6
+
+
+def pool_cache_key(category_id) -> str:
+    return f"question-pool:{category_id}"
+
+
+def build_category_pools(category_ids) -> dict:
+    # The pools of all the categories in one query
+    question_ids = {category_id: [] for category_id in category_ids}
+    for category_id, question_id in (
+        Question.objects.filter(category_id__in=question_ids)
+        .order_by("category_id", "id")
+        .values_list("category_id", "id")
+    ):
+        question_ids[category_id].append(question_id)
+    return {
+        category_id: np.array(ids, dtype=np.int64)
+        for category_id, ids in question_ids.items()
+    }
+
+
+def get_category_pools(category_ids) -> dict:
+    keys = {pool_cache_key(category_id): category_id for category_id in category_ids}
+    cached = cache.get_many(keys)
+    pools = {
+        keys[key]: np.frombuffer(value, dtype=np.int64) for key, value in cached.items()
+    }
+    missing = [category_id for key, category_id in keys.items() if key not in cached]
+    if missing:
+        built = build_category_pools(missing)
+        cache.set_many(
+            {
+                pool_cache_key(category_id): pool.tobytes()
+                for category_id, pool in built.items()
+            },
+            POOL_TIMEOUT,
+        )
+        pools.update(built)
+    return pools
+
+
+def invalidate_category_pools(category_ids):
+    keys = [
+        pool_cache_key(category_id)
+        for category_id in set(category_ids)
+        if category_id is not None
+    ]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def new_generator(seed=None) -> np.random.Generator:
+    return np.random.default_rng(seed)
+
+
+# Draws ``size`` distinct items in random order, raising ValueError when the
+# pool is too small.
+def draw(pool: np.ndarray | int, size: int, rng: np.random.Generator) -> np.ndarray:
+    return rng.choice(pool, size=size, replace=False, shuffle=True)
+
+
+# Deterministic option order of one question in a seeded attempt
+def option_permutation(seed: int, question_id: int, size: int) -> list:
+    return new_generator([seed, question_id]).permutation(size).tolist()
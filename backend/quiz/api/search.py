@@ -0,0 +1,118 @@
+import re
+from django.db import connection
+from quiz.models import Question, QuestionOption
+
+# Full-text index of the question bank, one document per question made of its
+# text and the text of its options. It is an FTS5 table on SQLite and a
+# tsvector column with a GIN index on PostgreSQL, both created by migration
+# 0028_question_search_index. Other databases fall back to icontains.
+
+SEARCH_LIMIT = 500
+
+FTS_TABLE = "quiz_question_fts"
+TSVECTOR_TABLE = "quiz_question_search"
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def search_enabled() -> bool:
+    return connection.vendor in ("sqlite", "postgresql")
+
+
+def question_documents(question_ids) -> list:
+    # (question id, category id, document) of the given questions
+    documents = {
+        question_id: [category_id, [body_text or ""]]
+        for question_id, category_id, body_text in Question.objects.filter(
+            id__in=question_ids
+        ).values_list("id", "category_id", "body_text")
+    }
+    for question_id, body_text in (
+        QuestionOption.objects.filter(question_id__in=list(documents))
+        .order_by("question_id", "order_number")
+        .values_list("question_id", "body_text")
+    ):
+        documents[question_id][1].append(body_text or "")
+    return [
+        (question_id, category_id, " ".join(texts))
+        for question_id, (category_id, texts) in documents.items()
+    ]
+
+
+def remove_questions(question_ids):
+    question_ids = list(question_ids)
+    if not question_ids or not search_enabled():
+        return
+    placeholders = ", ".join(["%s"] * len(question_ids))
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})",
+                question_ids,
+            )
+        else:
+            cursor.execute(
+                f"DELETE FROM {TSVECTOR_TABLE} WHERE question_id IN ({placeholders})",
+                question_ids,
+            )
+
+
+def index_questions(question_ids):
+    if not search_enabled():
+        return
+    documents = question_documents(question_ids)
+    if not documents:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            # FTS5 tables have no upsert
+            remove_questions([document[0] for document in documents])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, category_id, document) "
+                "VALUES (%s, %s, %s)",
+                documents,
+            )
+        else:
+            cursor.executemany(
+                f"INSERT INTO {TSVECTOR_TABLE} (question_id, category_id, document) "
+                "VALUES (%s, %s, to_tsvector('simple', %s)) "
+                "ON CONFLICT (question_id) DO UPDATE SET "
+                "category_id = EXCLUDED.category_id, document = EXCLUDED.document",
+                documents,
+            )
+
+
+def search_question_ids(text, category_id=None, limit=SEARCH_LIMIT) -> list | None:
+    # Ids of the questions matching every word of ``text`` as a prefix, best
+    # match first. None when the database has no full-text index.
+    if not search_enabled():
+        return None
+    words = WORD.findall(text.lower())
+    if not words:
+        return []
+
+    params = []
+    if connection.vendor == "sqlite":
+        query = " ".join(f'"{word}"*' for word in words)
+        sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+        params.append(query)
+        if category_id:
+            sql += " AND category_id = %s"
+            params.append(category_id)
+        sql += " ORDER BY rank LIMIT %s"
+    else:
+        query = " & ".join(f"{word}:*" for word in words)
+        sql = (
+            f"SELECT question_id FROM {TSVECTOR_TABLE}, "
+            "to_tsquery('simple', %s) query WHERE document @@ query"
+        )
+        params.append(query)
+        if category_id:
+            sql += " AND category_id = %s"
+            params.append(category_id)
+        sql += " ORDER BY ts_rank(document, query) DESC LIMIT %s"
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
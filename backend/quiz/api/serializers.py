@@ -1,8 +1,10 @@
 from rest_framework import serializers
+from main.middleware import TimedModelSerializer
 from quiz.models import (
     QuestionCategory,
     Question,
     QuestionOption,
+    QuestionStatistics,
     QuizCategory,
     Quiz,
     QuizQuestion,
@@ -13,6 +15,7 @@ from quiz.models import (
     QuizInstanceOption,
 )
 from account.api.serializers import GradeSerializer
+from quiz.api.sampling import option_permutation
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
@@ -21,14 +24,21 @@ User = get_user_model()
 # Question serializers
 
 
-class QuestionCategorySerializer(serializers.ModelSerializer):
+class QuestionCategorySerializer(TimedModelSerializer):
     class Meta:
         model = QuestionCategory
         fields = ["id", "name", "total_questions"]
 
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionStatisticsSerializer(TimedModelSerializer):
+    class Meta:
+        model = QuestionStatistics
+        exclude = ["id", "question"]
+
+
+class QuestionSerializer(TimedModelSerializer):
     category = QuestionCategorySerializer(read_only=True)
+    statistics = QuestionStatisticsSerializer(read_only=True)
     category_id = serializers.IntegerField(write_only=True)
 
     def update(self, instance, validated_data):
@@ -49,10 +59,11 @@ class QuestionSerializer(serializers.ModelSerializer):
             "body_photo",
             "score",
             "updated",
+            "statistics",
         ]
 
 
-class QuestionOptionSerializer(serializers.ModelSerializer):
+class QuestionOptionSerializer(TimedModelSerializer):
     class Meta:
         model = QuestionOption
         fields = "__all__"
@@ -60,20 +71,45 @@ class QuestionOptionSerializer(serializers.ModelSerializer):
 
 class ExcelUploadSerializer(serializers.Serializer):
     excel_file = serializers.FileField()
-    options = serializers.IntegerField()
+    options = serializers.IntegerField(min_value=1)
     category = serializers.IntegerField()
+    dry_run = serializers.BooleanField(default=False)
+
+
+class QuestionImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    # Taken from the file extension when missing
+    file_format = serializers.ChoiceField(
+        choices=["xlsx", "csv", "jsonl"], required=False
+    )
+    # Number of option columns of xlsx and csv files
+    options = serializers.IntegerField(min_value=1, required=False)
+    category = serializers.IntegerField(default=0)
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if "file_format" not in data:
+            extension = data["file"].name.rsplit(".", 1)[-1].lower()
+            data["file_format"] = "jsonl" if extension == "ndjson" else extension
+            if data["file_format"] not in ("xlsx", "csv", "jsonl"):
+                raise serializers.ValidationError(
+                    {"file_format": "Unknown file format"}
+                )
+        if data["file_format"] != "jsonl" and "options" not in data:
+            raise serializers.ValidationError({"options": "This field is required."})
+        return data
 
 
 # Quiz serializers
 
 
-class QuizCategorySerializer(serializers.ModelSerializer):
+class QuizCategorySerializer(TimedModelSerializer):
     class Meta:
         model = QuizCategory
         fields = ["id", "name", "total_quizes"]
 
 
-class QuizSerializer(serializers.ModelSerializer):
+class QuizSerializer(TimedModelSerializer):
     class Meta:
         model = Quiz
         fields = [
@@ -95,7 +131,7 @@ class QuizSerializer(serializers.ModelSerializer):
         ]
 
 
-class QuizQuestionSerializer(serializers.ModelSerializer):
+class QuizQuestionSerializer(TimedModelSerializer):
     question = QuestionSerializer()
 
     class Meta:
@@ -103,19 +139,19 @@ class QuizQuestionSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class BulkQuizQuestionSerializer(serializers.ModelSerializer):
+class BulkQuizQuestionSerializer(TimedModelSerializer):
     class Meta:
         model = QuizQuestion
         fields = "__all__"
 
 
-class QuizQuestionGroupSerializer(serializers.ModelSerializer):
+class QuizQuestionGroupSerializer(TimedModelSerializer):
     class Meta:
         model = QuizQuestionGroup
         fields = "__all__"
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedModelSerializer):
     grade = GradeSerializer()
 
     class Meta:
@@ -123,7 +159,7 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ["id", "username", "first_name", "last_name", "grade"]
 
 
-class AllowedUserSerializer(serializers.ModelSerializer):
+class AllowedUserSerializer(TimedModelSerializer):
     user = UserSerializer()
 
     class Meta:
@@ -131,48 +167,32 @@ class AllowedUserSerializer(serializers.ModelSerializer):
         fields = ["id", "user"]
 
 
-class QuestionGroupSerializer(serializers.ModelSerializer):
+class QuestionGroupSerializer(TimedModelSerializer):
     class Meta:
         model = QuizQuestionGroup
         fields = ["id", "title", "total_questions", "point"]
 
 
-class UserQuizSerializer(serializers.ModelSerializer):
+class UserQuizSerializer(TimedModelSerializer):
+    # Reads the annotations of UserQuizView.get_queryset, so a listing costs
+    # the same number of queries whatever the number of quizzes
     category = QuizCategorySerializer()
-    past_attempts = serializers.SerializerMethodField()
+    questions = serializers.IntegerField()
+    past_attempts = serializers.IntegerField(source="past_attempt_count")
     left_attempts = serializers.SerializerMethodField()
     active = serializers.SerializerMethodField()
     question_groups = QuestionGroupSerializer(many=True)
 
-    def get_past_attempts(self, obj: Quiz):
-        request = self.context.get("request")
-        user: User = request.user if request else None
-        past_attempts = user.attempts.filter(quiz=obj).count()
-        return past_attempts
-
     def get_left_attempts(self, obj: Quiz):
-        return obj.attempts - self.get_past_attempts(obj)
+        return obj.attempts - obj.past_attempt_count
 
     def get_active(self, obj: Quiz):
-        if obj.status != 0:
-            return None
-        request = self.context.get("request")
-        user: User = request.user if request else None
-        local_time = timezone.localtime()
-        active_attempts = user.attempts.filter(
-            quiz=obj,
-            is_completed=False,
-            started_at__lte=local_time,
-            end_time__gte=local_time,
-        )
-        if len(active_attempts):
-            active = active_attempts.first()
-            return {
-                "id": active.id,
-                "end_time": timezone.localtime(active.end_time),
-            }
-        else:
+        if obj.status != 0 or obj.active_attempt_id is None:
             return None
+        return {
+            "id": obj.active_attempt_id,
+            "end_time": timezone.localtime(obj.active_attempt_end_time),
+        }
 
     class Meta:
         model = Quiz
@@ -192,7 +212,7 @@ class UserQuizSerializer(serializers.ModelSerializer):
         ]
 
 
-class OptionInstanceSerializer(serializers.ModelSerializer):
+class OptionInstanceSerializer(TimedModelSerializer):
     body_text = serializers.CharField(source="option.body_text")
     body_photo = serializers.CharField(source="option.body_photo_url")
 
@@ -201,17 +221,99 @@ class OptionInstanceSerializer(serializers.ModelSerializer):
         fields = ["id", "body_text", "body_photo", "option_order", "selected"]
 
 
-class QuestionInstanceSerializer(serializers.ModelSerializer):
+def seeded_question_options(obj: QuizInstanceQuestion) -> list:
+    # Rebuilds the option order of a question in a seeded attempt
+    attempt: UserAttempt = obj.user_attempt
+    options = list(obj.question.options.all())
+    quiz: Quiz = attempt.quiz
+    if (
+        quiz.grouped_questions
+        and obj.group
+        and obj.group.random_options
+        or quiz.has_random_options
+    ):
+        options = [
+            options[index]
+            for index in option_permutation(attempt.seed, obj.question_id, len(options))
+        ]
+    return options
+
+
+class QuestionInstanceSerializer(TimedModelSerializer):
     body_text = serializers.CharField(source="question.body_text")
     body_photo = serializers.CharField(source="question.body_photo_url")
-    options = OptionInstanceSerializer(many=True)
+    options = serializers.SerializerMethodField()
+
+    def get_options(self, obj: QuizInstanceQuestion):
+        if not obj.user_attempt.is_seeded:
+            return OptionInstanceSerializer(obj.options.all(), many=True).data
+
+        # Seeded attempts expose QuestionOption ids, SelectQuestionOption
+        # accepts them in place of QuizInstanceOption ids.
+        return [
+            {
+                "id": option.id,
+                "body_text": option.body_text,
+                "body_photo": option.body_photo_url,
+                "option_order": index,
+                "selected": option.id == obj.selected_option_id,
+            }
+            for index, option in enumerate(seeded_question_options(obj))
+        ]
 
     class Meta:
         model = QuizInstanceQuestion
-        fields = ["id", "group", "body_text", "body_photo", "question_order", "options"]
+        fields = [
+            "id",
+            "group",
+            "body_text",
+            "body_photo",
+            "question_order",
+            "options",
+            "version",
+        ]
+
+
+class CompactQuestionInstanceSerializer(TimedModelSerializer):
+    # ``options`` are the ids to send to SelectQuestionOption and
+    # ``paper_options`` the matching option ids of the attempt paper.
+    options = serializers.SerializerMethodField()
+    paper_options = serializers.SerializerMethodField()
+    selected = serializers.SerializerMethodField()
 
+    def get_options(self, obj: QuizInstanceQuestion):
+        if obj.user_attempt.is_seeded:
+            return [option.id for option in seeded_question_options(obj)]
+        return [option.id for option in obj.options.all()]
 
-class AttemptQuizSerializer(serializers.ModelSerializer):
+    def get_paper_options(self, obj: QuizInstanceQuestion):
+        if obj.user_attempt.is_seeded:
+            return self.get_options(obj)
+        return [option.option_id for option in obj.options.all()]
+
+    def get_selected(self, obj: QuizInstanceQuestion):
+        if obj.user_attempt.is_seeded:
+            return obj.selected_option_id
+        for option in obj.options.all():
+            if option.selected:
+                return option.id
+        return None
+
+    class Meta:
+        model = QuizInstanceQuestion
+        fields = [
+            "id",
+            "group",
+            "question",
+            "question_order",
+            "options",
+            "paper_options",
+            "selected",
+            "version",
+        ]
+
+
+class AttemptQuizSerializer(TimedModelSerializer):
     category = QuizCategorySerializer()
     question_groups = QuestionGroupSerializer(many=True)
 
@@ -227,7 +329,7 @@ class AttemptQuizSerializer(serializers.ModelSerializer):
         ]
 
 
-class UserAttemptSerializer(serializers.ModelSerializer):
+class UserAttemptSerializer(TimedModelSerializer):
     quiz = AttemptQuizSerializer()
     questions = QuestionInstanceSerializer(source="instance_questions", many=True)
 
@@ -242,3 +344,38 @@ class UserAttemptSerializer(serializers.ModelSerializer):
             "completed_at",
             "questions",
         ]
+
+
+class CompactUserAttemptSerializer(TimedModelSerializer):
+    quiz = AttemptQuizSerializer()
+    paper_version = serializers.SerializerMethodField()
+    questions = CompactQuestionInstanceSerializer(
+        source="instance_questions", many=True
+    )
+
+    def get_paper_version(self, obj: UserAttempt):
+        return obj.quiz.paper_version
+
+    class Meta:
+        model = UserAttempt
+        fields = [
+            "id",
+            "quiz",
+            "paper_version",
+            "started_at",
+            "end_time",
+            "is_completed",
+            "completed_at",
+            "questions",
+        ]
+
+
+class AnswerSerializer(serializers.Serializer):
+    questionId = serializers.IntegerField()
+    optionId = serializers.IntegerField()
+    version = serializers.IntegerField(min_value=0)
+
+
+class BatchAnswerSerializer(serializers.Serializer):
+    attemptId = serializers.IntegerField()
+    answers = AnswerSerializer(many=True, allow_empty=True)
@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from quiz.models import UserAttempt
+from quiz.api.grading import grade_attempts
+from quiz.api.leaderboard import update_leaderboard
+
+# Attempts are only closed by time, nothing marks them completed when their
+# end_time passes. The sweeper does it in chunks through the partial
+# open_attempt_end_time_idx index, so the set of open attempts stays small.
+
+SWEEP_CHUNK_SIZE = 1000
+
+
+def finalize_expired_attempts(now=None, chunk_size=SWEEP_CHUNK_SIZE) -> int:
+    now = now or timezone.now()
+    finalized = 0
+
+    while True:
+        attempt_ids = list(
+            UserAttempt.objects.filter(is_completed=False, end_time__lt=now)
+            .order_by("end_time")
+            .values_list("id", flat=True)[:chunk_size]
+        )
+        if not attempt_ids:
+            break
+
+        with transaction.atomic():
+            finalized += UserAttempt.objects.filter(
+                id__in=attempt_ids, is_completed=False
+            ).update(is_completed=True, completed_at=F("end_time"))
+            grade_attempts(attempt_ids)
+            update_leaderboard(attempt_ids)
+
+    return finalized
+
+
+def delete_unclaimed_attempts(now=None) -> int:
+    # Pre-generated attempts nobody started before the quiz closed
+    now = now or timezone.now()
+    _, deleted = UserAttempt.objects.filter(
+        started_at__isnull=True, quiz__end_time__lt=now
+    ).delete()
+    # The total also counts the questions and options of the attempts
+    return deleted.get(UserAttempt._meta.label, 0)
@@ -5,6 +5,7 @@ from .views import (
     QuestionViewSet,
     QuestionOptionViewSet,
     ExcelUploadView,
+    QuestionImportView,
     QuizCategoryViewset,
     QuizViewSet,
     QuizQuestionViewset,
@@ -16,10 +17,17 @@ from .views import (
     AllowedGradeApiView,
     AllowedUserViewSet,
     AllowedUserBulkView,
+    GradeQuizView,
+    ExportResultsView,
+    LeaderboardView,
     UserQuizView,
     StartQuizView,
+    StartQuizTicketView,
+    AdmissionMetricsView,
     GetUserAttempt,
+    AttemptPaperView,
     SelectQuestionOption,
+    SelectQuestionOptions,
 )
 
 router = DefaultRouter()
@@ -51,9 +59,31 @@ urlpatterns = [
         name="allowed-user-bulk",
     ),
     path("excel-upload/", ExcelUploadView.as_view(), name="excel-upload"),
+    path("question-import/", QuestionImportView.as_view(), name="question-import"),
+    path("grade-quiz/<int:pk>/", GradeQuizView.as_view(), name="grade-quiz"),
+    path(
+        "export-results/<int:pk>/",
+        ExportResultsView.as_view(),
+        name="export-results",
+    ),
+    path("leaderboard/<int:pk>/", LeaderboardView.as_view(), name="leaderboard"),
     path("user-quiz/", UserQuizView.as_view(), name="user-quiz"),
     path("user-quiz/<int:pk>/", UserQuizView.as_view(), name="user-quiz-retrieve"),
     path("start-quiz/<int:pk>/", StartQuizView.as_view(), name="start-quiz"),
+    path(
+        "start-quiz/ticket/<str:ticket>/",
+        StartQuizTicketView.as_view(),
+        name="start-quiz-ticket",
+    ),
+    path(
+        "start-quiz/metrics/", AdmissionMetricsView.as_view(), name="start-quiz-metrics"
+    ),
     path("user-attempt/<int:pk>/", GetUserAttempt.as_view(), name="get-user-attempt"),
+    path(
+        "user-attempt/<int:pk>/paper/",
+        AttemptPaperView.as_view(),
+        name="user-attempt-paper",
+    ),
     path("select-option/", SelectQuestionOption.as_view(), name="select-option"),
+    path("select-options/", SelectQuestionOptions.as_view(), name="select-options"),
 ]
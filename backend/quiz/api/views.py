@@ -1,13 +1,15 @@
-from rest_framework import viewsets, permissions, pagination, generics, status
+from rest_framework import viewsets, permissions, generics, status
 from rest_framework.decorators import api_view
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from openpyxl import load_workbook
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from main.pagination import HybridPagination
 from .serializers import (
     QuestionCategorySerializer,
     QuestionSerializer,
     QuestionOptionSerializer,
     ExcelUploadSerializer,
+    QuestionImportSerializer,
     QuizCategorySerializer,
     QuizSerializer,
     QuizQuestionSerializer,
@@ -17,15 +19,49 @@ from .serializers import (
     AllowedUserSerializer,
     UserQuizSerializer,
     UserAttemptSerializer,
+    CompactUserAttemptSerializer,
+    BatchAnswerSerializer,
 )
 import base64
 from django.core.files.base import ContentFile
 from django.shortcuts import get_object_or_404
-from django.http import Http404
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+    FileResponse,
+)
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Max, Q
+from django.db.models import (
+    Max,
+    Count,
+    OuterRef,
+    Subquery,
+    Prefetch,
+    prefetch_related_objects,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.db import transaction
-from quiz.api.crud import create_user_attempt
+from django.conf import settings
+from quiz.api.crud import (
+    get_startable_quiz,
+    start_user_attempt,
+    select_question_option,
+    select_question_options,
+    selection_error_status,
+    open_attempt_filter,
+)
+from quiz.api.blueprint import invalidate_quiz_blueprints
+from quiz.api.admission import get_admission_queue, get_ticket
+from quiz.api.paper import attempt_question_ids, paper_digest, get_rendered_paper
+from quiz.api.grading import grade_quiz
+from quiz.api.importer import READERS, import_questions, excel_rows
+from quiz.api.visibility import get_visible_quiz_ids, invalidate_user_visibility
+from quiz.api.export import result_rows, csv_lines, xlsx_file
+from quiz.api.leaderboard import top_entries, score_rank
+from quiz.api.counters import add_to_counter
 from quiz.models import (
     QuestionCategory,
     Question,
@@ -39,12 +75,12 @@ from quiz.models import (
     UserAttempt,
     QuizInstanceQuestion,
     QuizInstanceOption,
+    LeaderboardEntry,
 )
 
 from rest_framework.filters import SearchFilter
-from .filters import CustomIdFilter, CustomQuestionFilter
-from .permissions import StartQuizPermission, UserAttemptPermission
-import random
+from .filters import CustomQuestionFilter, QuestionSearchFilter
+from .permissions import UserAttemptPermission
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -75,10 +111,8 @@ class Base64PhotoMixin:
         return super().update(request, *args, **kwargs)
 
 
-class QuestionsPagination(pagination.PageNumberPagination):
-    page_size = 20
-    page_size_query_param = "per_page"
-    max_page_size = 10000
+class QuestionsPagination(HybridPagination):
+    pass
 
 
 class QuestionCategoryViewSet(viewsets.ModelViewSet):
@@ -88,16 +122,16 @@ class QuestionCategoryViewSet(viewsets.ModelViewSet):
 
 
 class QuestionViewSet(Base64PhotoMixin, viewsets.ModelViewSet):
-    queryset = Question.objects.order_by("-updated")
+    queryset = Question.objects.select_related("category", "statistics").order_by(
+        "-updated"
+    )
     serializer_class = QuestionSerializer
     pagination_class = QuestionsPagination
 
     filter_backends = (
         CustomQuestionFilter,
-        CustomIdFilter,
-        SearchFilter,
+        QuestionSearchFilter,
     )
-    search_fields = ["id", "body_text", "options__body_text"]
 
 
 class QuestionOptionViewSet(Base64PhotoMixin, viewsets.ModelViewSet):
@@ -113,37 +147,46 @@ class ExcelUploadView(APIView):
         serializer = ExcelUploadSerializer(data=request.data)
         if serializer.is_valid():
             try:
-                excel_file = serializer.validated_data["excel_file"]
-                category_id = serializer.validated_data["category"]
-                options = serializer.validated_data["options"]
-
-                wb = load_workbook(excel_file)
-                ws = wb.active
-                orders = [i for i in range(1, options + 1)]
-
-                for row in ws.iter_rows(min_row=2, values_only=True):
-                    random.shuffle(orders)
-                    if category_id != 0:
-                        new_question = Question.objects.create(
-                            category_id=category_id, body_text=row[0]
-                        )
-                    else:
-                        new_question = Question.objects.create(body_text=row[0])
-                    QuestionOption.objects.create(
-                        question=new_question,
-                        body_text=row[1],
-                        order_number=orders[0],
-                        is_correct=True,
-                    )
-                    for i in range(2, options + 1):
-                        QuestionOption.objects.create(
-                            question=new_question,
-                            body_text=row[i],
-                            order_number=orders[i - 1],
-                        )
-                return Response({"status": "success"}, status=201)
+                result = import_questions(
+                    excel_rows(serializer.validated_data["excel_file"]),
+                    serializer.validated_data["category"],
+                    serializer.validated_data["options"],
+                    dry_run=serializer.validated_data["dry_run"],
+                )
+            except ValueError as er:
+                return Response({"detail": str(er)}, status=400)
             except Exception as er:
                 return Response({"detail": str(er)}, status=500)
+
+            if serializer.validated_data["dry_run"]:
+                return Response({"status": "checked", **result}, status=200)
+            return Response({"status": "success", **result}, status=201)
+        else:
+            return Response({"status": serializer.errors}, status=400)
+
+
+class QuestionImportView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        serializer = QuestionImportSerializer(data=request.data)
+        if serializer.is_valid():
+            data = serializer.validated_data
+            try:
+                result = import_questions(
+                    READERS[data["file_format"]](data["file"]),
+                    data["category"],
+                    data.get("options"),
+                    dry_run=data["dry_run"],
+                )
+            except ValueError as er:
+                return Response({"detail": str(er)}, status=400)
+            except Exception as er:
+                return Response({"detail": str(er)}, status=500)
+
+            if data["dry_run"]:
+                return Response({"status": "checked", **result}, status=200)
+            return Response({"status": "success", **result}, status=201)
         else:
             return Response({"status": serializer.errors}, status=400)
 
@@ -157,10 +200,8 @@ class QuizCategoryViewset(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAdminUser]
 
 
-class QuizPagination(pagination.PageNumberPagination):
-    page_size = 20
-    page_size_query_param = "per_page"
-    max_page_size = 10000
+class QuizPagination(HybridPagination):
+    pass
 
 
 class QuizViewSet(viewsets.ModelViewSet):
@@ -173,17 +214,17 @@ class QuizViewSet(viewsets.ModelViewSet):
     pagination_class = QuizPagination
 
 
-class QuizQuestionPagination(pagination.PageNumberPagination):
-    page_size = 20
-    page_size_query_param = "per_page"
-    max_page_size = 10000
+class QuizQuestionPagination(HybridPagination):
+    pass
 
 
 class QuizQuestionViewset(viewsets.ModelViewSet):
-    queryset = QuizQuestion.objects.order_by("order_number")
+    queryset = QuizQuestion.objects.select_related(
+        "question__category", "question__statistics"
+    ).order_by("order_number")
     serializer_class = QuizQuestionSerializer
     permission_classes = [permissions.IsAdminUser]
-    pagination_class = QuizPagination
+    pagination_class = QuizQuestionPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["quiz"]
 
@@ -255,7 +296,9 @@ class QuizQuestionBulkView(
     def update(self, request, *args, **kwargs):
         object_ids = request.data.pop("objects")
         queryset = self.get_queryset().filter(id__in=object_ids)
+        quiz_ids = list(queryset.values_list("quiz_id", flat=True).distinct())
         queryset.update(**request.data)
+        invalidate_quiz_blueprints(quiz_ids)
 
         return Response(status=200)
 
@@ -288,7 +331,15 @@ class AllowedGradeApiView(APIView):
             allowed_user_list.extend(
                 AllowedUser(quiz=quiz, user=user) for user in users
             )
-        AllowedUser.objects.bulk_create(allowed_user_list)
+        with transaction.atomic():
+            AllowedUser.objects.bulk_create(allowed_user_list)
+            # bulk_create sends no signals
+            add_to_counter(
+                Quiz, "total_participants", {quiz.id: len(allowed_user_list)}
+            )
+        invalidate_user_visibility(
+            allowed_user.user_id for allowed_user in allowed_user_list
+        )
         return Response({"status": "created"})
 
     def delete(self, request, pk):
@@ -303,7 +354,7 @@ class AllowedGradeApiView(APIView):
 
 
 class AllowedUserViewSet(viewsets.ModelViewSet):
-    queryset = AllowedUser.objects.all()
+    queryset = AllowedUser.objects.select_related("user__grade").order_by("id")
     serializer_class = AllowedUserSerializer
     permission_classes = [permissions.IsAdminUser]
     pagination_class = QuizPagination
@@ -326,7 +377,14 @@ class AllowedUserBulkView(APIView):
             AllowedUser(quiz=quiz, user=user)
             for user in User.objects.filter(id__in=ids)
         ]
-        AllowedUser.objects.bulk_create(allowed_user_list)
+        with transaction.atomic():
+            AllowedUser.objects.bulk_create(allowed_user_list)
+            add_to_counter(
+                Quiz, "total_participants", {quiz.id: len(allowed_user_list)}
+            )
+        invalidate_user_visibility(
+            allowed_user.user_id for allowed_user in allowed_user_list
+        )
         return Response({"status": "created"})
 
     def delete(self, request, pk):
@@ -337,15 +395,71 @@ class AllowedUserBulkView(APIView):
         return Response({"status": "deleted"})
 
 
+class GradeQuizView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, pk):
+        quiz = get_object_or_404(Quiz, pk=pk)
+        return Response({"graded": grade_quiz(quiz)})
+
+
+class ExportResultsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, pk):
+        quiz = get_object_or_404(Quiz, pk=pk)
+        file_type = request.query_params.get("type", "csv")
+
+        if file_type == "csv":
+            response = StreamingHttpResponse(
+                csv_lines(result_rows(quiz)), content_type="text/csv"
+            )
+        elif file_type == "xlsx":
+            response = FileResponse(
+                xlsx_file(result_rows(quiz)),
+                content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
+        else:
+            return Response({"detail": "error"}, status=status.HTTP_400_BAD_REQUEST)
+
+        response["Content-Disposition"] = (
+            f'attachment; filename="quiz-{quiz.id}-results.{file_type}"'
+        )
+        return response
+
+
 class UserQuizView(generics.ListAPIView):
     serializer_class = UserQuizSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
-        queryset = Quiz.objects.filter(
-            Q(allowed_users__user_id=user.id, access="private") | Q(access="public")
-        ).distinct()
+        attempts = UserAttempt.objects.filter(quiz=OuterRef("pk"), user=user)
+        active_attempts = attempts.filter(
+            open_attempt_filter(user.id, timezone.localtime())
+        ).order_by("-started_at")
+
+        queryset = (
+            Quiz.objects.filter(pk__in=get_visible_quiz_ids(user.id))
+            .select_related("category")
+            .prefetch_related("question_groups")
+            .annotate(
+                past_attempt_count=Coalesce(
+                    Subquery(
+                        attempts.filter(started_at__isnull=False)
+                        .order_by()
+                        .values("quiz")
+                        .annotate(count=Count("id"))
+                        .values("count")
+                    ),
+                    0,
+                ),
+                active_attempt_id=Subquery(active_attempts.values("id")[:1]),
+                active_attempt_end_time=Subquery(
+                    active_attempts.values("end_time")[:1]
+                ),
+            )
+        )
         return queryset
 
     def get_serializer_context(self):
@@ -365,60 +479,204 @@ class UserQuizView(generics.ListAPIView):
 
 
 class StartQuizView(APIView):
-    permission_classes = [permissions.IsAuthenticated, StartQuizPermission]
-
-    def get_object(self, pk):
-        try:
-            return Quiz.objects.get(pk=pk)
-        except Quiz.DoesNotExist:
-            return Http404
+    permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
-        quiz = self.get_object(pk)
-        self.check_object_permissions(self.request, quiz)
-
-        attempt = create_user_attempt(request.user, quiz)
+        if settings.QUIZ_ADMISSION_QUEUE:
+            # Refuse early, the worker checks again under the lock
+            quiz = get_startable_quiz(request.user.id, pk)
+            ticket = get_admission_queue().submit(request.user, quiz)
+            if ticket:
+                return Response(
+                    {"status": "queued", "ticket": ticket},
+                    status=status.HTTP_202_ACCEPTED,
+                )
+            else:
+                return Response(
+                    {"status": "busy"},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={"Retry-After": "5"},
+                )
+
+        attempt = start_user_attempt(request.user, pk)
         if attempt:
             return Response({"attempt_id": attempt.id})
         else:
             return Response({"status": "error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class StartQuizTicketView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, ticket):
+        data = get_ticket(ticket)
+        if not data or data["user_id"] != request.user.id:
+            raise Http404
+
+        if data["status"] == "ready":
+            return Response({"status": "ready", "attempt_id": data["attempt_id"]})
+        elif data["status"] == "queued":
+            return Response({"status": "queued"}, status=status.HTTP_202_ACCEPTED)
+        else:
+            return Response({"status": "error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AdmissionMetricsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(get_admission_queue().metrics())
+
+
 class GetUserAttempt(APIView):
     serializer_class = UserAttemptSerializer
     permission_classes = [permissions.IsAuthenticated, UserAttemptPermission]
 
     def get_object(self, pk):
-        obj = get_object_or_404(UserAttempt, pk=pk)
+        obj = get_object_or_404(UserAttempt.objects.select_related("quiz__category"), pk=pk)
         self.check_object_permissions(self.request, obj)
+
+        # Load the whole payload in a fixed number of queries
+        if obj.is_seeded:
+            options = Prefetch("question__options")
+        else:
+            options = Prefetch(
+                "options", queryset=QuizInstanceOption.objects.select_related("option")
+            )
+        prefetch_related_objects(
+            [obj],
+            "quiz__question_groups",
+            Prefetch(
+                "instance_questions",
+                queryset=QuizInstanceQuestion.objects.select_related(
+                    "question", "group"
+                ).prefetch_related(options),
+            ),
+        )
         return obj
 
     def get(self, request, pk):
         obj = self.get_object(pk)
-        serializer = UserAttemptSerializer(obj)
+        if request.query_params.get("compact"):
+            # Ordering and selection only, the content comes from AttemptPaperView
+            serializer = CompactUserAttemptSerializer(obj)
+        else:
+            serializer = UserAttemptSerializer(obj)
         return Response(serializer.data)
 
 
+class AttemptPaperView(APIView):
+    permission_classes = [permissions.IsAuthenticated, UserAttemptPermission]
+
+    def get(self, request, pk):
+        attempt = get_object_or_404(UserAttempt.objects.select_related("quiz"), pk=pk)
+        self.check_object_permissions(request, attempt)
+        quiz = attempt.quiz
+
+        question_ids = attempt_question_ids(attempt)
+        etag = f'"{quiz.id}-{quiz.paper_version}-{paper_digest(question_ids)}"'
+        if request.query_params.get("v") == str(quiz.paper_version):
+            # Versioned urls never change, the version moves on every edit
+            cache_control = "private, max-age=31536000, immutable"
+        else:
+            cache_control = "private, no-cache"
+
+        if etag in request.headers.get("If-None-Match", ""):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                get_rendered_paper(quiz, question_ids), content_type="application/json"
+            )
+        response["ETag"] = etag
+        response["Cache-Control"] = cache_control
+        return response
+
+
+class LeaderboardView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        quiz = get_object_or_404(Quiz, pk=pk)
+        if not request.user.is_staff:
+            # Students see the results once the quiz is over or their own
+            # attempt is completed, never while they can still answer
+            attempts = UserAttempt.objects.filter(
+                quiz=quiz, user=request.user, started_at__isnull=False
+            )
+            if quiz.end_time >= timezone.now():
+                attempts = attempts.filter(is_completed=True)
+            if not attempts.exists():
+                return Response({"detail": "error"}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            limit = min(int(request.query_params.get("limit", 10)), 100)
+        except ValueError:
+            return Response({"detail": "error"}, status=status.HTTP_400_BAD_REQUEST)
+
+        own = (
+            LeaderboardEntry.objects.filter(quiz=quiz, user=request.user)
+            .order_by("-score")
+            .values("user_attempt_id", "score")
+            .first()
+        )
+        rank, participants = score_rank(quiz.id, own["score"] if own else None)
+        return Response(
+            {
+                "participants": participants,
+                "results": top_entries(quiz.id, max(limit, 0)),
+                "me": own and {**own, "rank": rank},
+            }
+        )
+
+
 class SelectQuestionOption(APIView):
+    # The user id is taken from the token, so a click never loads the user.
+    # The write itself checks that the user is still active.
+    authentication_classes = [JWTStatelessUserAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        question_id = request.data.get("questionId")
-        option_id = request.data.get("optionId")
+        try:
+            question_id = int(request.data.get("questionId"))
+            option_id = int(request.data.get("optionId"))
+            version = request.data.get("version")
+            version = int(version) if version is not None else None
+        except (TypeError, ValueError):
+            return Response({"detail": "error"}, status=status.HTTP_400_BAD_REQUEST)
+
+        seeded = settings.QUIZ_ATTEMPT_STORAGE == "seed"
+        # Try the configured storage mode first, attempts created before a
+        # mode switch fall through to the other one
+        if select_question_option(
+            request.user.id, question_id, option_id, seeded, version
+        ) or select_question_option(
+            request.user.id, question_id, option_id, not seeded, version
+        ):
+            return Response({"status": "ok"}, status=status.HTTP_200_OK)
 
-        question = get_object_or_404(
-            QuizInstanceQuestion.objects.select_related("user_attempt", "user_attempt__user").prefetch_related("options"),
-            id=question_id
+        return Response(
+            {"detail": "error"},
+            status=selection_error_status(request.user.id, question_id, version),
         )
 
-        if (
-            question.user_attempt.user != request.user
-            or not question.options.filter(id=option_id).exists()
-            or question.user_attempt.status != 0
-        ):
-            return Response({"detail": "error"}, status=status.HTTP_403_FORBIDDEN)
-        else:
-            with transaction.atomic():
-                question.options.update(selected=False)
-                QuizInstanceOption.objects.filter(id=option_id).update(selected=True)
-                return Response({"status": "ok"}, status=status.HTTP_200_OK)
+
+class SelectQuestionOptions(APIView):
+    authentication_classes = [JWTStatelessUserAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = BatchAnswerSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        result = select_question_options(
+            request.user.id,
+            serializer.validated_data["attemptId"],
+            [
+                (answer["questionId"], answer["optionId"], answer["version"])
+                for answer in serializer.validated_data["answers"]
+            ],
+        )
+        if result is None:
+            return Response({"detail": "error"}, status=status.HTTP_409_CONFLICT)
+        return Response(result, status=status.HTTP_200_OK)
@@ -0,0 +1,56 @@
+from django.core.cache import cache
+from django.db import transaction
+from quiz.models import Quiz, AllowedUser
+
+# The quizzes a user can see are the public quizzes plus the quizzes they
+# are allowed on. Both sets are cached, the public one once for everybody,
+# so a listing is a primary key IN lookup instead of a join with distinct().
+
+VISIBILITY_TIMEOUT = 60 * 60
+
+PUBLIC_QUIZZES_KEY = "quiz-visibility:public"
+
+
+def user_visibility_key(user_id) -> str:
+    return f"quiz-visibility:user:{user_id}"
+
+
+def build_public_quiz_ids() -> list:
+    return list(
+        Quiz.objects.filter(access="public").order_by().values_list("id", flat=True)
+    )
+
+
+def build_allowed_quiz_ids(user_id) -> list:
+    # Allowed quizzes that are public are visible anyway, so the access of
+    # the quiz doesn't matter here
+    return list(
+        AllowedUser.objects.filter(user_id=user_id)
+        .order_by()
+        .values_list("quiz_id", flat=True)
+    )
+
+
+def get_visible_quiz_ids(user_id) -> set:
+    user_key = user_visibility_key(user_id)
+    cached = cache.get_many([PUBLIC_QUIZZES_KEY, user_key])
+
+    public = cached.get(PUBLIC_QUIZZES_KEY)
+    if public is None:
+        public = build_public_quiz_ids()
+        cache.set(PUBLIC_QUIZZES_KEY, public, VISIBILITY_TIMEOUT)
+    allowed = cached.get(user_key)
+    if allowed is None:
+        allowed = build_allowed_quiz_ids(user_id)
+        cache.set(user_key, allowed, VISIBILITY_TIMEOUT)
+    return set(public) | set(allowed)
+
+
+def invalidate_public_quizzes():
+    transaction.on_commit(lambda: cache.delete(PUBLIC_QUIZZES_KEY))
+
+
+def invalidate_user_visibility(user_ids):
+    keys = [user_visibility_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    # Quiz visibility, blueprints, question pools and admission tickets are
+    # invalidated by deleting their keys. With a cache per process the other
+    # workers keep serving the stale entries until they expire.
+    if settings.CACHES["default"]["BACKEND"].endswith(".LocMemCache"):
+        return [
+            Warning(
+                "The default cache is local to each process.",
+                hint="Set REDIS_URL so that all workers share one cache.",
+                id="quiz.W001",
+            )
+        ]
+    return []
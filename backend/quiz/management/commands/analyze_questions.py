@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from quiz.api.analysis import ANALYSIS_CHUNK_SIZE, analyze_questions
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute difficulty, discrimination and option selection rates of "
+        "every question from completed attempts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=ANALYSIS_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        total = analyze_questions(options["chunk_size"])
+        self.stdout.write(f"{total} questions analyzed")
@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from quiz.models import AllowedUser
+from quiz.api.visibility import (
+    PUBLIC_QUIZZES_KEY,
+    VISIBILITY_TIMEOUT,
+    build_public_quiz_ids,
+    user_visibility_key,
+)
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the cached quiz visibility of every user with the database, "
+        "and rebuild it with --rebuild."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Write fresh entries for every user, stale or not.",
+        )
+
+    def handle(self, *args, **options):
+        rebuild = options["rebuild"]
+        stale = 0
+
+        public = build_public_quiz_ids()
+        cached = cache.get(PUBLIC_QUIZZES_KEY)
+        if cached is not None and set(cached) != set(public):
+            stale += 1
+            self.stdout.write("Public quizzes are stale")
+        if rebuild:
+            cache.set(PUBLIC_QUIZZES_KEY, public, VISIBILITY_TIMEOUT)
+
+        allowed_quizzes = {}
+        for user_id, quiz_id in AllowedUser.objects.values_list("user_id", "quiz_id"):
+            allowed_quizzes.setdefault(user_id, []).append(quiz_id)
+
+        for user_id in User.objects.values_list("id", flat=True).iterator():
+            key = user_visibility_key(user_id)
+            allowed = allowed_quizzes.get(user_id, [])
+            cached = cache.get(key)
+            if cached is not None and set(cached) != set(allowed):
+                stale += 1
+                self.stdout.write(f"User {user_id} is stale")
+            if rebuild:
+                cache.set(key, allowed, VISIBILITY_TIMEOUT)
+
+        self.stdout.write(f"{stale} stale entries")
@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand, CommandError
+from account.models import Grade
+from quiz.api.dataset import DATASET_CHUNK_SIZE, generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic exam-scale dataset for performance testing: "
+        "users in grades, question banks, grouped and ungrouped private "
+        "quizzes with their allowed users, and graded attempts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prefix",
+            default="perf",
+            help="Prefix of the generated usernames and names, must be unused.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--grades", type=int, default=10)
+        parser.add_argument("--users", type=int, default=20000)
+        parser.add_argument(
+            "--categories",
+            type=int,
+            default=20,
+            help="Number of question categories.",
+        )
+        parser.add_argument(
+            "--questions",
+            type=int,
+            default=500,
+            help="Questions per category.",
+        )
+        parser.add_argument(
+            "--options", type=int, default=4, help="Options per question."
+        )
+        parser.add_argument("--quizzes", type=int, default=10)
+        parser.add_argument(
+            "--quiz-questions",
+            type=int,
+            default=40,
+            help="Questions per quiz.",
+        )
+        parser.add_argument(
+            "--completion",
+            type=float,
+            default=0.6,
+            help="Share of the allowed users who took each quiz.",
+        )
+        parser.add_argument("--password", default="password")
+        parser.add_argument("--chunk-size", type=int, default=DATASET_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if min(options["grades"], options["categories"], options["options"]) < 1:
+            raise CommandError("Grades, categories and options must be positive")
+        if options["questions"] < options["quiz_questions"]:
+            raise CommandError("--questions must be at least --quiz-questions")
+        if Grade.objects.filter(name__startswith=f"{options['prefix']} ").exists():
+            raise CommandError(f"Prefix {options['prefix']} is already used")
+
+        created = generate_dataset(
+            options["prefix"],
+            seed=options["seed"],
+            grades=options["grades"],
+            users=options["users"],
+            categories=options["categories"],
+            questions=options["questions"],
+            options=options["options"],
+            quizzes=options["quizzes"],
+            quiz_questions=options["quiz_questions"],
+            completion=options["completion"],
+            password=options["password"],
+            chunk_size=options["chunk_size"],
+            log=self.stdout.write,
+        )
+        self.stdout.write(
+            ", ".join(
+                f"{total} {name.replace('_', ' ')}" for name, total in created.items()
+            )
+        )
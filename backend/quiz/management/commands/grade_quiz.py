@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from quiz.models import Quiz
+from quiz.api.grading import grade_quiz
+
+
+class Command(BaseCommand):
+    help = "Score every started attempt of the given quizzes into AttemptResult."
+
+    def add_arguments(self, parser):
+        parser.add_argument("quiz_ids", nargs="+", type=int)
+
+    def handle(self, *args, **options):
+        for quiz_id in options["quiz_ids"]:
+            try:
+                quiz = Quiz.objects.get(pk=quiz_id)
+            except Quiz.DoesNotExist:
+                raise CommandError(f"Quiz {quiz_id} does not exist")
+            graded = grade_quiz(quiz)
+            self.stdout.write(f"Quiz {quiz_id}: {graded} attempts graded")
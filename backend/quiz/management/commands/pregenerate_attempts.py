@@ -0,0 +1,42 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from quiz.models import Quiz
+from quiz.api.crud import pregenerate_attempts, pregenerate_upcoming_attempts
+
+
+class Command(BaseCommand):
+    help = (
+        "Build unstarted attempts for the allowed users of private quizzes, "
+        "so that starting a quiz only has to claim one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("quiz_ids", nargs="*", type=int)
+        parser.add_argument(
+            "--upcoming",
+            type=float,
+            metavar="HOURS",
+            help="Prepare every private quiz starting within the next HOURS.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+
+        if options["upcoming"] is not None:
+            created = pregenerate_upcoming_attempts(
+                timedelta(hours=options["upcoming"]), chunk_size
+            )
+        elif options["quiz_ids"]:
+            created = {}
+            for quiz_id in options["quiz_ids"]:
+                try:
+                    quiz = Quiz.objects.get(pk=quiz_id)
+                except Quiz.DoesNotExist:
+                    raise CommandError(f"Quiz {quiz_id} does not exist")
+                created[quiz.id] = pregenerate_attempts(quiz, chunk_size)
+        else:
+            raise CommandError("Pass quiz ids or --upcoming HOURS")
+
+        for quiz_id, total in created.items():
+            self.stdout.write(f"Quiz {quiz_id}: {total} attempts prepared")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from quiz.models import Quiz
+from quiz.api.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = "Recompute the leaderboard of the given quizzes from their attempts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("quiz_ids", nargs="*", type=int)
+        parser.add_argument("--all", action="store_true", help="Rebuild every quiz.")
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            quizzes = Quiz.objects.all()
+        elif options["quiz_ids"]:
+            quizzes = Quiz.objects.filter(pk__in=options["quiz_ids"])
+            missing = set(options["quiz_ids"]) - {quiz.id for quiz in quizzes}
+            if missing:
+                raise CommandError(f"Quiz {min(missing)} does not exist")
+        else:
+            raise CommandError("Pass quiz ids or --all")
+
+        for quiz in quizzes:
+            total = rebuild_leaderboard(quiz)
+            self.stdout.write(f"Quiz {quiz.id}: {total} entries")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from quiz.api.counters import stale_counters, repair_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the counter columns of categories and quizzes with the rows "
+        "they count, and recompute them unless --check is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report the stale counters.",
+        )
+
+    def handle(self, *args, **options):
+        stale = stale_counters()
+        for (model, field), ids in stale.items():
+            self.stdout.write(
+                f"{model}.{field} is stale on {len(ids)} rows: {ids[:20]}"
+            )
+
+        if not options["check"]:
+            with transaction.atomic():
+                repair_counters()
+        self.stdout.write(f"{sum(len(ids) for ids in stale.values())} stale counters")
@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand
+from quiz.api.sweeper import (
+    SWEEP_CHUNK_SIZE,
+    finalize_expired_attempts,
+    delete_unclaimed_attempts,
+)
+
+
+class Command(BaseCommand):
+    help = "Mark attempts whose time has run out as completed and grade them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=SWEEP_CHUNK_SIZE)
+        parser.add_argument(
+            "--loop",
+            type=float,
+            metavar="SECONDS",
+            help="Keep sweeping every SECONDS instead of running once.",
+        )
+        parser.add_argument(
+            "--delete-unclaimed",
+            action="store_true",
+            help="Also delete unstarted attempts of quizzes that have ended.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            finalized = finalize_expired_attempts(chunk_size=options["chunk_size"])
+            self.stdout.write(f"{finalized} attempts finalized")
+            if options["delete_unclaimed"]:
+                deleted = delete_unclaimed_attempts()
+                self.stdout.write(f"{deleted} unclaimed attempts deleted")
+
+            if options["loop"] is None:
+                break
+            time.sleep(options["loop"])
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.3 on 2026-10-18 20:20
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def copy_selected_options(apps, schema_editor):
+    QuizInstanceQuestion = apps.get_model("quiz", "QuizInstanceQuestion")
+    QuizInstanceOption = apps.get_model("quiz", "QuizInstanceOption")
+    QuizInstanceQuestion.objects.update(
+        selected_option_id=Subquery(
+            QuizInstanceOption.objects.filter(
+                question_instance=OuterRef("pk"), selected=True
+            ).values("option_id")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0021_alter_quizinstanceoption_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizinstancequestion',
+            name='selected_option',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='quiz.questionoption'),
+        ),
+        migrations.AddField(
+            model_name='userattempt',
+            name='question_ids',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userattempt',
+            name='seed',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(copy_selected_options, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-18 20:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0022_userattempt_seed_and_selected_option'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizinstancequestion',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.3 on 2026-10-18 20:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0023_quizinstancequestion_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='quizinstancequestion',
+            name='score',
+            field=models.FloatField(default=1),
+        ),
+        migrations.CreateModel(
+            name='AttemptResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('answered', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('graded_at', models.DateTimeField(auto_now=True)),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='quiz.quizquestiongroup')),
+                ('user_attempt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='quiz.userattempt')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='attemptresult',
+            constraint=models.UniqueConstraint(fields=('user_attempt', 'group'), name='unique_attempt_group_result'),
+        ),
+        migrations.AddConstraint(
+            model_name='attemptresult',
+            constraint=models.UniqueConstraint(condition=models.Q(('group__isnull', True)), fields=('user_attempt',), name='unique_attempt_total_result'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-18 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0024_attemptresult'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userattempt',
+            index=models.Index(condition=models.Q(('is_completed', False)), fields=['end_time'], name='open_attempt_end_time_idx'),
+        ),
+    ]
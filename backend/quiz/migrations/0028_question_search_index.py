@@ -0,0 +1,98 @@
+from django.db import migrations
+
+# The full-text index depends on the database: an FTS5 table on SQLite, a
+# tsvector column with a GIN index on PostgreSQL. Other databases get no
+# index and search falls back to icontains.
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE quiz_question_fts USING fts5("
+    "category_id UNINDEXED, document, tokenize = 'unicode61 remove_diacritics 2')"
+)
+SQLITE_INSERT = (
+    "INSERT INTO quiz_question_fts (rowid, category_id, document) VALUES (%s, %s, %s)"
+)
+SQLITE_DROP = "DROP TABLE IF EXISTS quiz_question_fts"
+
+POSTGRESQL_CREATE = [
+    "CREATE TABLE quiz_question_search ("
+    "question_id bigint PRIMARY KEY "
+    "REFERENCES quiz_question (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "category_id bigint NOT NULL, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX quiz_question_search_document ON quiz_question_search "
+    "USING GIN (document)",
+    "CREATE INDEX quiz_question_search_category ON quiz_question_search "
+    "(category_id)",
+]
+POSTGRESQL_INSERT = (
+    "INSERT INTO quiz_question_search (question_id, category_id, document) "
+    "VALUES (%s, %s, to_tsvector('simple', %s))"
+)
+POSTGRESQL_DROP = "DROP TABLE IF EXISTS quiz_question_search"
+
+CHUNK_SIZE = 2000
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite":
+        create, insert = [SQLITE_CREATE], SQLITE_INSERT
+    elif connection.vendor == "postgresql":
+        create, insert = POSTGRESQL_CREATE, POSTGRESQL_INSERT
+    else:
+        return
+
+    Question = apps.get_model("quiz", "Question")
+    QuestionOption = apps.get_model("quiz", "QuestionOption")
+
+    with connection.cursor() as cursor:
+        for statement in create:
+            cursor.execute(statement)
+
+        last_id = 0
+        while True:
+            questions = list(
+                Question.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", "category_id", "body_text")[:CHUNK_SIZE]
+            )
+            if not questions:
+                break
+            last_id = questions[-1][0]
+
+            options = {}
+            for question_id, body_text in (
+                QuestionOption.objects.filter(question_id__in=[q[0] for q in questions])
+                .order_by("question_id", "order_number")
+                .values_list("question_id", "body_text")
+            ):
+                options.setdefault(question_id, []).append(body_text or "")
+            cursor.executemany(
+                insert,
+                [
+                    (
+                        question_id,
+                        category_id,
+                        " ".join([body_text or "", *options.get(question_id, [])]),
+                    )
+                    for question_id, category_id, body_text in questions
+                ],
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite":
+        schema_editor.execute(SQLITE_DROP)
+    elif connection.vendor == "postgresql":
+        schema_editor.execute(POSTGRESQL_DROP)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("quiz", "0027_questionstatistics"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
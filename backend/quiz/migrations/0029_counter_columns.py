@@ -0,0 +1,78 @@
+# Generated by Django 4.2.3 on 2026-10-18 20:50
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def related_total(queryset, field, aggregate=None):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=aggregate or Count("id"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    QuestionCategory = apps.get_model("quiz", "QuestionCategory")
+    Question = apps.get_model("quiz", "Question")
+    QuizCategory = apps.get_model("quiz", "QuizCategory")
+    Quiz = apps.get_model("quiz", "Quiz")
+    QuizQuestion = apps.get_model("quiz", "QuizQuestion")
+    QuizQuestionGroup = apps.get_model("quiz", "QuizQuestionGroup")
+    AllowedUser = apps.get_model("quiz", "AllowedUser")
+
+    QuestionCategory.objects.update(
+        total_questions=related_total(Question.objects.all(), "category")
+    )
+    QuizCategory.objects.update(
+        total_quizes=related_total(Quiz.objects.all(), "category")
+    )
+    Quiz.objects.update(
+        quiz_question_count=related_total(QuizQuestion.objects.all(), "quiz"),
+        group_question_count=related_total(
+            QuizQuestionGroup.objects.all(), "quiz", Sum("total_questions")
+        ),
+        total_participants=related_total(AllowedUser.objects.all(), "quiz"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0028_question_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="questioncategory",
+            name="total_questions",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="quiz",
+            name="group_question_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="quiz",
+            name="quiz_question_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="quiz",
+            name="total_participants",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="quizcategory",
+            name="total_quizes",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-18 21:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0029_counter_columns"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="quiz",
+            name="paper_version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
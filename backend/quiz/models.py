@@ -1,23 +1,45 @@
 from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator
-from django.db.models import Sum
 from django.utils import timezone
 from datetime import timedelta
 from account.models import Grade
 
 User = settings.AUTH_USER_MODEL
 
+class CounterModel(models.Model):
+    # Counter columns are only moved by F() updates (quiz.api.counters), a
+    # save() of a loaded row must not write back the values it has read
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and not args
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+    class Meta:
+        abstract = True
+
+
 # Quiz questions base
 
 
-class QuestionCategory(models.Model):
+class QuestionCategory(CounterModel):
     name = models.TextField(max_length=200)
     updated = models.DateTimeField(auto_now=True)
+    # Counter kept by quiz.api.counters
+    total_questions = models.PositiveIntegerField(default=0, editable=False)
 
-    @property
-    def total_questions(self):
-        return self.questions.count()
+    counter_fields = ("total_questions",)
 
     def __str__(self):
         return self.name
@@ -46,6 +68,21 @@ class Question(models.Model):
         return self.body_text[:50]
 
 
+class QuestionStatistics(models.Model):
+    # Item analysis over completed attempts, refreshed by the
+    # analyze_questions command
+    question = models.OneToOneField(
+        Question, on_delete=models.CASCADE, related_name="statistics"
+    )
+    responses = models.PositiveIntegerField(default=0)
+    p_value = models.FloatField(null=True, blank=True)
+    discrimination = models.FloatField(null=True, blank=True)
+    omitted_rate = models.FloatField(null=True, blank=True)
+    # {option id: share of responses that selected it}
+    option_rates = models.JSONField(default=dict)
+    computed_at = models.DateTimeField(auto_now=True)
+
+
 class QuestionOption(models.Model):
     question = models.ForeignKey(
         Question, on_delete=models.CASCADE, related_name="options"
@@ -68,19 +105,19 @@ class QuestionOption(models.Model):
 # quizzes base
 
 
-class QuizCategory(models.Model):
+class QuizCategory(CounterModel):
     name = models.CharField(max_length=200)
     updated = models.DateTimeField(auto_now=True)
+    # Counter kept by quiz.api.counters
+    total_quizes = models.PositiveIntegerField(default=0, editable=False)
+
+    counter_fields = ("total_quizes",)
 
     def __str__(self):
         return self.name
 
-    @property
-    def total_quizes(self):
-        return self.quizes.count()
-
 
-class Quiz(models.Model):
+class Quiz(CounterModel):
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     category = models.ForeignKey(
@@ -103,6 +140,20 @@ class Quiz(models.Model):
     has_random_options = models.BooleanField(default=False)
     attempts = models.PositiveBigIntegerField(default=1)
     total_questions = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    # Counters kept by quiz.api.counters: quiz questions, sum of the
+    # total_questions of the question groups, allowed users
+    quiz_question_count = models.PositiveIntegerField(default=0, editable=False)
+    group_question_count = models.PositiveIntegerField(default=0, editable=False)
+    total_participants = models.PositiveIntegerField(default=0, editable=False)
+    # Moved on every edit of the questions of the quiz (quiz.api.paper)
+    paper_version = models.PositiveIntegerField(default=0, editable=False)
+
+    counter_fields = (
+        "quiz_question_count",
+        "group_question_count",
+        "total_participants",
+        "paper_version",
+    )
 
     def save(self, *args, **kwargs):
         if not self.end_time:
@@ -123,21 +174,14 @@ class Quiz(models.Model):
     @property
     def questions(self):
         if self.grouped_questions:
-            value = self.question_groups.aggregate(value=Sum("total_questions"))[
-                "value"
-            ]
-            return value if value else 0
+            return self.group_question_count
         else:
             return (
                 self.total_questions
                 if self.has_random_questions
-                else self.quiz_questions.count()
+                else self.quiz_question_count
             )
 
-    @property
-    def total_participants(self):
-        return self.allowed_users.count()
-
     def __str__(self):
         return self.title
 
@@ -224,12 +268,33 @@ class UserAttempt(models.Model):
     end_time = models.DateTimeField(null=True)
     is_completed = models.BooleanField(default=False)
     completed_at = models.DateTimeField(null=True)
-    
+    # Seeded attempts keep no QuizInstanceOption rows, the option order of
+    # every question is derived from the seed when the attempt is read.
+    seed = models.PositiveBigIntegerField(null=True, blank=True)
+    # Ids of the questions dealt to the attempt, so its paper is found without
+    # reading the attempt questions. Unset on attempts older than the column.
+    question_ids = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Only attempts that are still open are indexed, the sweeper walks
+            # it to find the ones whose time has run out.
+            models.Index(
+                fields=["end_time"],
+                condition=models.Q(is_completed=False),
+                name="open_attempt_end_time_idx",
+            ),
+        ]
+
+    @property
+    def is_seeded(self):
+        return self.seed is not None
+
     @property
     def status(self):
         current_time = timezone.localtime()
 
-        if current_time < self.started_at:
+        if self.started_at is None or current_time < self.started_at:
             return -1
         elif current_time >= self.started_at and current_time <= self.end_time:
             return 0
@@ -244,7 +309,16 @@ class QuizInstanceQuestion(models.Model):
     group = models.ForeignKey(QuizQuestionGroup, on_delete=models.CASCADE, null=True)
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     question_order = models.PositiveIntegerField(validators=[MinValueValidator(1)])
-    score = models.PositiveIntegerField(default=1)
+    score = models.FloatField(default=1)
+    selected_option = models.ForeignKey(
+        QuestionOption,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    # Bumped on every answer change, clients send it back to detect stale writes
+    version = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ["question_order"]
@@ -262,3 +336,63 @@ class QuizInstanceOption(models.Model):
     class Meta:
         ordering = ["option_order"]
         unique_together = ("question_instance", "option")
+
+
+class AttemptResult(models.Model):
+    # Rows with a group are per-group subtotals, the row without a group is
+    # the total of the attempt.
+    user_attempt = models.ForeignKey(
+        UserAttempt, on_delete=models.CASCADE, related_name="results"
+    )
+    group = models.ForeignKey(
+        QuizQuestionGroup, on_delete=models.CASCADE, null=True, blank=True
+    )
+    score = models.FloatField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    answered = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    graded_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user_attempt", "group"], name="unique_attempt_group_result"
+            ),
+            models.UniqueConstraint(
+                fields=["user_attempt"],
+                condition=models.Q(group__isnull=True),
+                name="unique_attempt_total_result",
+            ),
+        ]
+
+
+class LeaderboardEntry(models.Model):
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name="+")
+    user_attempt = models.OneToOneField(
+        UserAttempt, on_delete=models.CASCADE, related_name="leaderboard_entry"
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                "quiz", models.F("score").desc(), name="leaderboard_quiz_score_idx"
+            ),
+        ]
+
+
+class LeaderboardBucket(models.Model):
+    # Number of attempts of a quiz per score, the rank of a score is one plus
+    # the attempts in the buckets above it.
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["quiz", "score"], name="unique_leaderboard_bucket"
+            ),
+        ]
@@ -0,0 +1,174 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from quiz.models import (
+    QuestionCategory,
+    QuizCategory,
+    Quiz,
+    QuizQuestionGroup,
+    QuizQuestion,
+    Question,
+    QuestionOption,
+    AllowedUser,
+)
+from quiz.api.counters import add_to_counter, move_counter
+from quiz.api.blueprint import invalidate_quiz_blueprints, quiz_ids_for_questions
+from quiz.api.paper import invalidate_quiz_papers, quiz_ids_for_content
+from quiz.api.sampling import invalidate_category_pools
+from quiz.api.search import index_questions, remove_questions
+from quiz.api.visibility import invalidate_public_quizzes, invalidate_user_visibility
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def quiz_changed(sender, instance, **kwargs):
+    invalidate_quiz_blueprints([instance.id])
+    invalidate_public_quizzes()
+
+
+@receiver(pre_save, sender=Quiz)
+def quiz_pre_save(sender, instance, **kwargs):
+    instance._previous_category_id = (
+        Quiz.objects.filter(pk=instance.pk)
+        .values_list("category_id", flat=True)
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Quiz)
+def quiz_saved(sender, instance, created, **kwargs):
+    previous_category_id = getattr(instance, "_previous_category_id", None)
+    move_counter(
+        QuizCategory, "total_quizes", previous_category_id, instance.category_id
+    )
+
+
+@receiver(post_delete, sender=Quiz)
+def quiz_deleted(sender, instance, **kwargs):
+    add_to_counter(QuizCategory, "total_quizes", {instance.category_id: -1})
+
+
+@receiver(post_save, sender=QuizQuestionGroup)
+@receiver(post_delete, sender=QuizQuestionGroup)
+@receiver(post_save, sender=QuizQuestion)
+@receiver(post_delete, sender=QuizQuestion)
+def quiz_content_changed(sender, instance, **kwargs):
+    invalidate_quiz_blueprints([instance.quiz_id])
+
+
+@receiver(post_save, sender=QuizQuestion)
+def quiz_question_saved(sender, instance, created, **kwargs):
+    if created:
+        add_to_counter(Quiz, "quiz_question_count", {instance.quiz_id: 1})
+
+
+@receiver(post_delete, sender=QuizQuestion)
+def quiz_question_deleted(sender, instance, origin=None, **kwargs):
+    # The counters of a quiz being deleted don't matter
+    if not isinstance(origin, Quiz):
+        add_to_counter(Quiz, "quiz_question_count", {instance.quiz_id: -1})
+
+
+@receiver(pre_save, sender=QuizQuestionGroup)
+def question_group_pre_save(sender, instance, **kwargs):
+    instance._previous_counted = (
+        QuizQuestionGroup.objects.filter(pk=instance.pk)
+        .values_list("quiz_id", "total_questions")
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=QuizQuestionGroup)
+def question_group_saved(sender, instance, created, **kwargs):
+    deltas = {instance.quiz_id: instance.total_questions}
+    previous = getattr(instance, "_previous_counted", None)
+    if previous is not None:
+        quiz_id, total_questions = previous
+        deltas[quiz_id] = deltas.get(quiz_id, 0) - total_questions
+    add_to_counter(Quiz, "group_question_count", deltas)
+
+
+@receiver(post_delete, sender=QuizQuestionGroup)
+def question_group_deleted(sender, instance, origin=None, **kwargs):
+    if not isinstance(origin, Quiz):
+        add_to_counter(
+            Quiz, "group_question_count", {instance.quiz_id: -instance.total_questions}
+        )
+
+
+@receiver(pre_save, sender=Question)
+def question_pre_save(sender, instance, **kwargs):
+    # Remember the old category so that its question pool is refreshed when a
+    # question is moved to another category.
+    instance._previous_category_id = (
+        Question.objects.filter(pk=instance.pk)
+        .values_list("category_id", flat=True)
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, created, **kwargs):
+    previous_category_id = getattr(instance, "_previous_category_id", None)
+    move_counter(
+        QuestionCategory, "total_questions", previous_category_id, instance.category_id
+    )
+    if created or previous_category_id != instance.category_id:
+        invalidate_category_pools([instance.category_id, previous_category_id])
+    if not created:
+        # Quiz questions without their own score fall back to Question.score
+        invalidate_quiz_blueprints(quiz_ids_for_questions([instance.id]))
+        invalidate_quiz_papers(
+            quiz_ids_for_content(
+                [instance.id], [instance.category_id, previous_category_id]
+            )
+        )
+    transaction.on_commit(lambda: index_questions([instance.id]))
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, origin=None, **kwargs):
+    if not isinstance(origin, QuestionCategory):
+        add_to_counter(QuestionCategory, "total_questions", {instance.category_id: -1})
+    invalidate_category_pools([instance.category_id])
+    remove_questions([instance.id])
+
+
+@receiver(post_save, sender=QuestionOption)
+@receiver(post_delete, sender=QuestionOption)
+def question_option_changed(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, (Question, QuestionCategory)):
+        # Cascade of a question or category delete, question_deleted covers
+        # the papers and the search index
+        return
+    transaction.on_commit(lambda: index_questions([instance.question_id]))
+    invalidate_quiz_papers(
+        quiz_ids_for_content(
+            [instance.question_id],
+            Question.objects.filter(id=instance.question_id).values("category_id"),
+        )
+    )
+
+
+@receiver(post_save, sender=AllowedUser)
+@receiver(post_delete, sender=AllowedUser)
+def allowed_user_changed(sender, instance, **kwargs):
+    invalidate_user_visibility([instance.user_id])
+
+
+@receiver(post_save, sender=AllowedUser)
+def allowed_user_saved(sender, instance, created, **kwargs):
+    if created:
+        add_to_counter(Quiz, "total_participants", {instance.quiz_id: 1})
+
+
+@receiver(post_delete, sender=AllowedUser)
+def allowed_user_deleted(sender, instance, origin=None, **kwargs):
+    if not isinstance(origin, Quiz):
+        add_to_counter(Quiz, "total_participants", {instance.quiz_id: -1})
@@ -1,3 +1,1392 @@
-from django.test import TestCase
+import csv
+import json
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.core.exceptions import PermissionDenied
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from django.http import Http404
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from account.models import Grade, Profile
+from quiz.models import (
+    QuestionCategory,
+    Question,
+    QuestionOption,
+    QuizCategory,
+    Quiz,
+    QuizQuestion,
+    QuizQuestionGroup,
+    QuizInstanceQuestion,
+    QuizInstanceOption,
+    AllowedUser,
+    UserAttempt,
+    AttemptResult,
+    LeaderboardEntry,
+    QuestionStatistics,
+)
+from quiz.api.analysis import analyze_questions
+from quiz.api.admission import AdmissionQueue, get_ticket, pending_cache_key
+from quiz.api.blueprint import blueprint_cache_key, get_quiz_blueprint
+from quiz.api.counters import stale_counters, repair_counters
+from quiz.api.crud import (
+    create_user_attempt,
+    start_user_attempt,
+    pregenerate_attempts,
+    pregenerate_upcoming_attempts,
+)
+from quiz.api.dataset import generate_dataset
+from quiz.api.grading import grade_attempts, grade_quiz
+from quiz.api.leaderboard import top_entries, score_rank, flush_leaderboard_updates
+from quiz.api.paper import attempt_question_ids
+from quiz.api.sampling import get_category_pools, pool_cache_key
+from quiz.api.search import search_question_ids
+from quiz.api.sweeper import finalize_expired_attempts, delete_unclaimed_attempts
+from quiz.api.serializers import seeded_question_options
 
-# Create your tests here.
+
+def create_questions(category, total, options=4):
+    questions = []
+    for index in range(total):
+        question = Question.objects.create(category=category, body_text=f"Q{index}")
+        for order in range(1, options + 1):
+            QuestionOption.objects.create(
+                question=question,
+                body_text=f"Q{index} option {order}",
+                order_number=order,
+                is_correct=order == 1,
+            )
+        questions.append(question)
+    return questions
+
+
+def create_quiz(questions, **kwargs):
+    quiz = Quiz.objects.create(
+        title="Quiz",
+        start_time=timezone.now() - timedelta(minutes=1),
+        duration=60,
+        total_questions=len(questions),
+        **kwargs,
+    )
+    for order, question in enumerate(questions, start=1):
+        QuizQuestion.objects.create(quiz=quiz, question=question, order_number=order)
+    return quiz
+
+
+def create_grouped_quiz(categories, per_group, **kwargs):
+    # One group of ``per_group`` random questions per category
+    quiz = Quiz.objects.create(
+        title="Grouped quiz",
+        start_time=timezone.now() - timedelta(minutes=1),
+        duration=60,
+        total_questions=per_group * len(categories),
+        grouped_questions=True,
+        **kwargs,
+    )
+    for category in categories:
+        QuizQuestionGroup.objects.create(
+            quiz=quiz,
+            title=category.name,
+            group=category,
+            random_questions=True,
+            total_questions=per_group,
+        )
+    return quiz
+
+
+def answer_questions(attempt, right=0, wrong=0):
+    # Answers the first ``right`` questions of the attempt correctly and the
+    # ``wrong`` ones after them wrongly, the others stay unanswered
+    questions = attempt.instance_questions.order_by("group_id", "question_order", "id")
+    for index, question in enumerate(questions[: right + wrong]):
+        question.selected_option = QuestionOption.objects.filter(
+            question_id=question.question_id, is_correct=index < right
+        ).first()
+        question.save(update_fields=["selected_option"])
+
+
+class GetUserAttemptTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = Profile.objects.create_user("student", "password")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.category = QuestionCategory.objects.create(name="Chemistry")
+
+    def assertAttemptQueries(self, quiz, expected):
+        attempt = create_user_attempt(self.user, quiz)
+        with self.assertNumQueries(expected):
+            response = self.client.get(f"/api/v1/quiz/user-attempt/{attempt.id}/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_query_count_does_not_depend_on_attempt_size(self):
+        for total in (3, 30):
+            quiz = create_quiz(create_questions(self.category, total))
+            data = self.assertAttemptQueries(quiz, 4)
+            self.assertEqual(len(data["questions"]), total)
+            self.assertEqual(len(data["questions"][0]["options"]), 4)
+
+    def test_grouped_quiz_query_count(self):
+        physics = QuestionCategory.objects.create(name="Physics")
+        create_questions(self.category, 20)
+        create_questions(physics, 10)
+        quiz = Quiz.objects.create(
+            title="Grouped",
+            start_time=timezone.now() - timedelta(minutes=1),
+            duration=60,
+            total_questions=1,
+            grouped_questions=True,
+        )
+        for title, category in (("A", self.category), ("B", physics)):
+            QuizQuestionGroup.objects.create(
+                quiz=quiz,
+                title=title,
+                group=category,
+                random_questions=True,
+                random_options=True,
+                total_questions=5,
+            )
+
+        data = self.assertAttemptQueries(quiz, 4)
+        self.assertEqual(len(data["questions"]), 10)
+        self.assertEqual(len(data["quiz"]["question_groups"]), 2)
+
+    @override_settings(QUIZ_ATTEMPT_STORAGE="seed")
+    def test_seeded_attempt_query_count(self):
+        quiz = create_quiz(
+            create_questions(self.category, 30), has_random_options=True
+        )
+        data = self.assertAttemptQueries(quiz, 4)
+        self.assertEqual(len(data["questions"]), 30)
+        self.assertEqual(len(data["questions"][0]["options"]), 4)
+
+
+class UserQuizViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = Profile.objects.create_user("student", "password")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.category = QuestionCategory.objects.create(name="Chemistry")
+        self.quiz_category = QuizCategory.objects.create(name="Exams")
+
+    def create_quizzes(self, total):
+        questions = create_questions(self.category, 3)
+        # Visibility caches are dropped on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(total):
+                quiz = create_quiz(questions, category=self.quiz_category, attempts=2)
+                if index % 2:
+                    quiz.access = "private"
+                    quiz.save()
+                    AllowedUser.objects.create(quiz=quiz, user=self.user)
+                create_user_attempt(self.user, quiz)
+
+    def listed_quiz_ids(self):
+        return {
+            quiz["id"] for quiz in self.client.get("/api/v1/quiz/user-quiz/").json()
+        }
+
+    def test_query_count_does_not_depend_on_quiz_count(self):
+        for total in (2, 10):
+            self.create_quizzes(total - Quiz.objects.count())
+            self.client.get("/api/v1/quiz/user-quiz/")
+            with self.assertNumQueries(2):
+                response = self.client.get("/api/v1/quiz/user-quiz/")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()), total)
+
+    def test_visibility_follows_access_changes(self):
+        quiz = create_quiz(create_questions(self.category, 1), access="private")
+        self.assertNotIn(quiz.id, self.listed_quiz_ids())
+
+        admin = Profile.objects.create_user("admin", "password", is_staff=True)
+        self.client.force_authenticate(admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                f"/api/v1/quiz/allowed-user-bulk/{quiz.id}/",
+                {"values": [self.user.id]},
+                format="json",
+            )
+        self.client.force_authenticate(self.user)
+        self.assertIn(quiz.id, self.listed_quiz_ids())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AllowedUser.objects.filter(quiz=quiz).delete()
+        self.assertNotIn(quiz.id, self.listed_quiz_ids())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            quiz.access = "public"
+            quiz.save()
+        self.assertIn(quiz.id, self.listed_quiz_ids())
+
+    def test_deploy_check_wants_a_shared_cache(self):
+        redis = {"BACKEND": "django.core.cache.backends.redis.RedisCache"}
+        local = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        for caches, warnings in (
+            ({"default": local}, ["quiz.W001"]),
+            ({"default": redis}, []),
+        ):
+            with self.settings(CACHES=caches):
+                messages = run_checks(include_deployment_checks=True, tags=["caches"])
+            self.assertEqual([message.id for message in messages], warnings)
+
+    def test_listing_values(self):
+        self.create_quizzes(2)
+        hidden = create_quiz(create_questions(self.category, 1), access="private")
+
+        data = {
+            quiz["id"]: quiz
+            for quiz in self.client.get("/api/v1/quiz/user-quiz/").json()
+        }
+        self.assertNotIn(hidden.id, data)
+        for quiz in data.values():
+            self.assertEqual(quiz["questions"], 3)
+            self.assertEqual(quiz["past_attempts"], 1)
+            self.assertEqual(quiz["left_attempts"], 1)
+            self.assertIsNotNone(quiz["active"])
+            self.assertEqual(quiz["category"]["total_quizes"], 2)
+
+
+class StartQuizTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = Profile.objects.create_user("student", "password")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.quiz = create_quiz(
+            create_questions(QuestionCategory.objects.create(name="Chemistry"), 3)
+        )
+
+    def start(self, quiz_id):
+        return self.client.post(f"/api/v1/quiz/start-quiz/{quiz_id}/")
+
+    def test_second_start_is_refused_while_attempt_is_open(self):
+        response = self.start(self.quiz.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.start(self.quiz.id).status_code, 403)
+        self.assertEqual(UserAttempt.objects.filter(user=self.user).count(), 1)
+
+    def test_used_attempts_are_refused(self):
+        attempt = create_user_attempt(self.user, self.quiz)
+        UserAttempt.objects.filter(pk=attempt.pk).update(is_completed=True)
+        self.assertEqual(self.start(self.quiz.id).status_code, 403)
+
+    def test_private_quiz_requires_allowed_user(self):
+        self.quiz.access = "private"
+        self.quiz.save()
+        self.assertEqual(self.start(self.quiz.id).status_code, 403)
+        AllowedUser.objects.create(quiz=self.quiz, user=self.user)
+        self.assertEqual(self.start(self.quiz.id).status_code, 200)
+
+    def test_unknown_quiz(self):
+        self.assertEqual(self.start(self.quiz.id + 1).status_code, 404)
+
+    def test_quiz_window(self):
+        now = timezone.now()
+        for start_time, end_time in (
+            (now + timedelta(minutes=5), now + timedelta(minutes=65)),
+            (now - timedelta(minutes=65), now - timedelta(minutes=5)),
+        ):
+            Quiz.objects.filter(pk=self.quiz.pk).update(
+                start_time=start_time, end_time=end_time
+            )
+            self.assertEqual(self.start(self.quiz.id).status_code, 403)
+        self.assertFalse(UserAttempt.objects.exists())
+
+    def test_attempts_left_after_a_completed_one(self):
+        Quiz.objects.filter(pk=self.quiz.pk).update(attempts=2)
+        self.assertEqual(self.start(self.quiz.id).status_code, 200)
+        UserAttempt.objects.update(is_completed=True)
+        self.assertEqual(self.start(self.quiz.id).status_code, 200)
+        UserAttempt.objects.update(is_completed=True)
+        self.assertEqual(self.start(self.quiz.id).status_code, 403)
+
+    def test_start_user_attempt_checks_under_the_lock(self):
+        attempt = start_user_attempt(self.user, self.quiz.id)
+        self.assertEqual(attempt.instance_questions.count(), 3)
+        with self.assertRaises(PermissionDenied):
+            start_user_attempt(self.user, self.quiz.id)
+        with self.assertRaises(Http404):
+            start_user_attempt(self.user, self.quiz.id + 1)
+
+    def test_failed_build_leaves_no_attempt(self):
+        with mock.patch(
+            "quiz.api.crud.create_instance_options", side_effect=RuntimeError
+        ):
+            with self.assertLogs(level="ERROR"):
+                self.assertEqual(self.start(self.quiz.id).status_code, 500)
+        self.assertFalse(UserAttempt.objects.exists())
+
+        self.assertEqual(self.start(self.quiz.id).status_code, 200)
+        question = UserAttempt.objects.get().instance_questions.first()
+        self.assertEqual(question.options.count(), 4)
+
+
+class PregenerateAttemptsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.quiz = create_quiz(
+            create_questions(QuestionCategory.objects.create(name="Algebra"), 3),
+            access="private",
+        )
+        self.students = [
+            Profile.objects.create_user(f"student{index}", "password")
+            for index in range(3)
+        ]
+        for student in self.students:
+            AllowedUser.objects.create(quiz=self.quiz, user=student)
+
+    def test_one_waiting_attempt_per_allowed_user(self):
+        # The last student has used their only attempt
+        create_user_attempt(self.students[-1], self.quiz)
+        self.assertEqual(pregenerate_attempts(self.quiz, chunk_size=1), 2)
+        self.assertEqual(pregenerate_attempts(self.quiz), 0)
+
+        waiting = UserAttempt.objects.filter(started_at__isnull=True)
+        self.assertEqual(
+            set(waiting.values_list("user_id", flat=True)),
+            {student.id for student in self.students[:2]},
+        )
+        for attempt in waiting:
+            self.assertEqual(attempt.instance_questions.count(), 3)
+
+    def test_start_claims_the_waiting_attempt(self):
+        pregenerate_attempts(self.quiz)
+        waiting = UserAttempt.objects.get(user=self.students[0])
+        client = APIClient()
+        client.force_authenticate(self.students[0])
+
+        response = client.post(f"/api/v1/quiz/start-quiz/{self.quiz.id}/")
+        self.assertEqual(response.status_code, 200)
+        attempt = UserAttempt.objects.get(user=self.students[0])
+        self.assertEqual(attempt.pk, waiting.pk)
+        self.assertIsNotNone(attempt.started_at)
+
+    def test_upcoming_private_quizzes(self):
+        start_time = timezone.now() + timedelta(hours=2)
+        Quiz.objects.filter(pk=self.quiz.pk).update(start_time=start_time)
+        public = create_quiz(
+            create_questions(QuestionCategory.objects.create(name="Geometry"), 1)
+        )
+        Quiz.objects.filter(pk=public.pk).update(start_time=start_time)
+
+        self.assertEqual(pregenerate_upcoming_attempts(timedelta(hours=1)), {})
+        self.assertEqual(
+            pregenerate_upcoming_attempts(timedelta(hours=3)), {self.quiz.id: 3}
+        )
+
+
+class GenerateDatasetTests(TestCase):
+    def setUp(self):
+        # Question pools of earlier tests may be cached under the same ids
+        cache.clear()
+
+    def generate(self, prefix):
+        return generate_dataset(
+            prefix,
+            seed=3,
+            grades=2,
+            users=20,
+            categories=2,
+            questions=8,
+            quizzes=2,
+            quiz_questions=4,
+            completion=0.5,
+            chunk_size=7,
+        )
+
+    def test_dataset_is_complete_and_counted(self):
+        created = self.generate("perf")
+        self.assertEqual(created["users"], 20)
+        self.assertEqual(
+            UserAttempt.objects.filter(is_completed=True).count(), created["attempts"]
+        )
+        self.assertFalse(
+            UserAttempt.objects.filter(results__isnull=True, is_completed=True).exists()
+        )
+        self.assertEqual(stale_counters(), {})
+
+    def test_seed_repeats_the_dataset(self):
+        self.assertEqual(self.generate("perf"), self.generate("perf2"))
+
+    def test_attempts_are_allowed_and_ranked(self):
+        self.generate("perf")
+        self.assertFalse(
+            UserAttempt.objects.exclude(
+                Exists(
+                    AllowedUser.objects.filter(
+                        quiz=OuterRef("quiz"), user=OuterRef("user")
+                    )
+                )
+            ).exists()
+        )
+        self.assertEqual(LeaderboardEntry.objects.count(), UserAttempt.objects.count())
+        for quiz in Quiz.objects.all():
+            entries = top_entries(quiz.id, 100)
+            self.assertEqual(score_rank(quiz.id)[1], len(entries))
+            for entry in entries:
+                self.assertEqual(
+                    entry["score"],
+                    AttemptResult.objects.get(
+                        user_attempt=entry["user_attempt_id"], group=None
+                    ).score,
+                )
+
+    def test_command_checks_its_arguments(self):
+        with self.assertRaisesMessage(CommandError, "--questions"):
+            call_command("generate_dataset", questions=2, quiz_questions=4)
+        self.generate("perf")
+        with self.assertRaisesMessage(CommandError, "Prefix perf is already used"):
+            call_command("generate_dataset", prefix="perf", users=1)
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, *args):
+        self.calls.append(args)
+
+
+class AdmissionQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = Profile.objects.create_user("student", "password")
+        self.quiz = create_quiz(
+            create_questions(QuestionCategory.objects.create(name="Chemistry"), 2)
+        )
+
+    def queue(self, max_depth):
+        queue = AdmissionQueue(workers=1, max_depth=max_depth)
+        queue._executor = RecordingExecutor()
+        return queue
+
+    def test_repeated_starts_share_one_build(self):
+        queue = self.queue(10)
+        ticket = queue.submit(self.user, self.quiz)
+        # A second worker sees the pending start through the cache
+        self.assertEqual(self.queue(10).submit(self.user, self.quiz), ticket)
+        self.assertEqual(len(queue._executor.calls), 1)
+        self.assertEqual(get_ticket(ticket)["status"], "queued")
+
+    def test_full_queue_releases_the_start(self):
+        self.assertIsNone(self.queue(0).submit(self.user, self.quiz))
+        self.assertIsNone(cache.get(pending_cache_key(self.user.id, self.quiz.id)))
+        queue = self.queue(10)
+        self.assertIsNotNone(queue.submit(self.user, self.quiz))
+        self.assertEqual(len(queue._executor.calls), 1)
+
+    def test_lost_build_is_queued_again(self):
+        ticket = self.queue(10).submit(self.user, self.quiz)
+        # A restart drops the queue, the pending marker is no longer refreshed
+        cache.delete(pending_cache_key(self.user.id, self.quiz.id))
+        self.assertEqual(get_ticket(ticket)["status"], "failed")
+
+        queue = self.queue(10)
+        retry = queue.submit(self.user, self.quiz)
+        self.assertNotEqual(retry, ticket)
+        self.assertEqual(len(queue._executor.calls), 1)
+        self.assertEqual(get_ticket(retry)["status"], "queued")
+
+    def test_counters_add_up_every_process(self):
+        self.queue(0).submit(self.user, self.quiz)
+        self.queue(0).submit(self.user, self.quiz)
+        self.assertEqual(self.queue(10).metrics()["rejected"], 2)
+
+
+class AttemptPaperTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = QuestionCategory.objects.create(name="Chemistry")
+        self.questions = create_questions(self.category, 12)
+        self.students = [
+            Profile.objects.create_user(f"student{index}", "password")
+            for index in range(2)
+        ]
+
+    def get_paper(self, attempt, user=None, **headers):
+        client = APIClient()
+        client.force_authenticate(user or attempt.user)
+        return client.get(f"/api/v1/quiz/user-attempt/{attempt.id}/paper/", **headers)
+
+    def test_paper_only_holds_the_questions_of_the_attempt(self):
+        quiz = create_grouped_quiz([self.category], 3)
+        attempt = create_user_attempt(self.students[0], quiz)
+
+        paper = self.get_paper(attempt).json()
+        self.assertEqual(
+            sorted(question["id"] for question in paper["questions"]),
+            sorted(attempt.instance_questions.values_list("question_id", flat=True)),
+        )
+        self.assertEqual(len(paper["questions"]), 3)
+        self.assertEqual(self.get_paper(attempt, self.students[1]).status_code, 403)
+
+    def test_version_moves_with_the_content(self):
+        quiz = create_quiz(self.questions[:4])
+        attempts = [create_user_attempt(student, quiz) for student in self.students]
+        first = self.get_paper(attempts[0])
+        # A fixed list of questions gives every attempt the same paper
+        self.assertEqual(first["ETag"], self.get_paper(attempts[1])["ETag"])
+        self.assertEqual(
+            self.get_paper(attempts[0], HTTP_IF_NONE_MATCH=first["ETag"]).status_code,
+            304,
+        )
+
+        option = self.questions[0].options.first()
+        option.body_text = "Edited"
+        option.save()
+        quiz.refresh_from_db()
+        self.assertEqual(quiz.paper_version, 1)
+
+        response = self.get_paper(attempts[0], HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            "Edited",
+            [
+                option["body_text"]
+                for question in response.json()["questions"]
+                for option in question["options"]
+            ],
+        )
+
+        # Deletes through a queryset move it too
+        QuestionOption.objects.filter(pk=option.pk).delete()
+        quiz.refresh_from_db()
+        self.assertEqual(quiz.paper_version, 2)
+
+
+class SelectOptionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = Profile.objects.create_user("student", "password")
+        self.quiz = create_quiz(
+            create_questions(QuestionCategory.objects.create(name="Chemistry"), 2)
+        )
+        self.attempt = create_user_attempt(self.user, self.quiz)
+        self.question = self.attempt.instance_questions.order_by("id").first()
+        self.option = self.question.options.first()
+        # A real token, the answer views don't load the user
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+
+    def select(self):
+        return self.client.post(
+            "/api/v1/quiz/select-option/",
+            {"questionId": self.question.id, "optionId": self.option.id},
+            format="json",
+        )
+
+    def test_answer_is_recorded(self):
+        self.assertEqual(self.select().status_code, 200)
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.selected_option_id, self.option.option_id)
+        self.assertEqual(self.question.version, 1)
+
+    def test_deactivated_user_cannot_answer(self):
+        Profile.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.select().status_code, 403)
+        response = self.client.post(
+            "/api/v1/quiz/select-options/",
+            {
+                "attemptId": self.attempt.id,
+                "answers": [
+                    {
+                        "questionId": self.question.id,
+                        "optionId": self.option.id,
+                        "version": 0,
+                    }
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 409)
+        self.question.refresh_from_db()
+        self.assertIsNone(self.question.selected_option_id)
+
+    def select_batch(self, version):
+        return self.client.post(
+            "/api/v1/quiz/select-options/",
+            {
+                "attemptId": self.attempt.id,
+                "answers": [
+                    {
+                        "questionId": self.question.id,
+                        "optionId": self.option.id,
+                        "version": version,
+                    }
+                ],
+            },
+            format="json",
+        )
+
+    def test_batch_returns_the_selections(self):
+        response = self.select_batch(0)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["rejected"], [])
+        self.assertEqual(
+            data["selections"],
+            {
+                str(question.id): (
+                    [self.option.id, 1] if question == self.question else [None, 0]
+                )
+                for question in self.attempt.instance_questions.all()
+            },
+        )
+
+    def test_stale_version_is_rejected(self):
+        self.assertEqual(self.select_batch(0).status_code, 200)
+        first = self.option
+        other = self.option = self.question.options.exclude(pk=first.pk).first()
+        # A retry made on version 0 can't overwrite the answer of version 1
+        data = self.select_batch(0).json()
+        self.assertEqual(data["rejected"], [self.question.id])
+        self.assertEqual(data["selections"][str(self.question.id)], [first.id, 1])
+        response = self.client.post(
+            "/api/v1/quiz/select-option/",
+            {"questionId": self.question.id, "optionId": other.id, "version": 0},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 409)
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.selected_option_id, first.option_id)
+
+    def test_foreign_option_is_forbidden(self):
+        other = create_user_attempt(
+            Profile.objects.create_user("other", "password"), self.quiz
+        )
+        self.option = other.instance_questions.first().options.first()
+        self.assertEqual(self.select().status_code, 403)
+        self.assertEqual(self.select_batch(0).json()["rejected"], [self.question.id])
+        self.question.refresh_from_db()
+        self.assertIsNone(self.question.selected_option_id)
+
+
+@override_settings(QUIZ_ATTEMPT_STORAGE="seed")
+class SeededAttemptTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = Profile.objects.create_user("student", "password")
+        self.questions = create_questions(
+            QuestionCategory.objects.create(name="Chemistry"), 3, options=6
+        )
+        self.quiz = create_quiz(self.questions, has_random_options=True)
+        self.attempt = create_user_attempt(self.user, self.quiz)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+
+    def get_attempt(self):
+        return self.client.get(f"/api/v1/quiz/user-attempt/{self.attempt.id}/").json()
+
+    def test_option_order_is_stable_across_reads(self):
+        self.assertTrue(self.attempt.is_seeded)
+        self.assertFalse(
+            QuizInstanceOption.objects.filter(
+                question_instance__user_attempt=self.attempt
+            ).exists()
+        )
+        first = self.get_attempt()
+        self.assertEqual(first, self.get_attempt())
+        for question in first["questions"]:
+            instance = QuizInstanceQuestion.objects.get(pk=question["id"])
+            self.assertEqual(
+                [option["id"] for option in question["options"]],
+                [option.id for option in seeded_question_options(instance)],
+            )
+
+    def test_question_options_are_accepted(self):
+        question = self.attempt.instance_questions.order_by("id").first()
+        option = question.question.options.last()
+        response = self.client.post(
+            "/api/v1/quiz/select-option/",
+            {"questionId": question.id, "optionId": option.id},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        question.refresh_from_db()
+        self.assertEqual(question.selected_option_id, option.id)
+
+        # An option of another question is not an answer to this one
+        other = QuestionOption.objects.exclude(question=question.question).first()
+        response = self.client.post(
+            "/api/v1/quiz/select-option/",
+            {"questionId": question.id, "optionId": other.id},
+            format="json",
+        )
+        self.assertNotEqual(response.status_code, 200)
+        question.refresh_from_db()
+        self.assertEqual(question.selected_option_id, option.id)
+
+    def test_paper_reads_the_stored_question_ids(self):
+        self.assertEqual(
+            sorted(self.attempt.question_ids),
+            sorted(question.id for question in self.questions),
+        )
+        # The attempt questions are not read to find the paper
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                attempt_question_ids(self.attempt),
+                sorted(question.id for question in self.questions),
+            )
+
+
+class GradingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = QuestionCategory.objects.create(name="Chemistry")
+        self.students = [
+            Profile.objects.create_user(f"student{index}", "password")
+            for index in range(2)
+        ]
+
+    def results(self, attempt):
+        return {
+            result.group_id: (
+                result.score,
+                result.correct,
+                result.answered,
+                result.total,
+            )
+            for result in attempt.results.all()
+        }
+
+    def test_attempt_totals(self):
+        questions = create_questions(self.category, 4)
+        Question.objects.filter(pk=questions[0].pk).update(score=2)
+        quiz = create_quiz(questions)
+        attempts = [create_user_attempt(student, quiz) for student in self.students]
+        answer_questions(attempts[0], right=2, wrong=1)
+
+        self.assertEqual(grade_attempts(UserAttempt.objects.filter(quiz=quiz)), 2)
+        self.assertEqual(self.results(attempts[0]), {None: (3.0, 2, 3, 4)})
+        self.assertEqual(self.results(attempts[1]), {None: (0.0, 0, 0, 4)})
+
+        # Grading again replaces the results
+        answer_questions(attempts[1], right=1)
+        self.assertEqual(grade_quiz(quiz), 2)
+        self.assertEqual(self.results(attempts[1]), {None: (2.0, 1, 1, 4)})
+        self.assertEqual(AttemptResult.objects.count(), 2)
+
+    def test_group_subtotals(self):
+        other_category = QuestionCategory.objects.create(name="Physics")
+        for category in (self.category, other_category):
+            create_questions(category, 5)
+        quiz = create_grouped_quiz([self.category, other_category], 2)
+        first, second = quiz.question_groups.order_by("order_number")
+        QuizQuestionGroup.objects.filter(pk=second.pk).update(point=2)
+        attempt = create_user_attempt(self.students[0], quiz)
+        answer_questions(attempt, right=3)
+
+        grade_attempts([attempt.id])
+        self.assertEqual(
+            self.results(attempt),
+            {
+                first.id: (2.0, 2, 2, 2),
+                second.id: (2.0, 1, 1, 2),
+                None: (4.0, 3, 3, 4),
+            },
+        )
+
+    def test_grade_quiz_endpoint(self):
+        quiz = create_quiz(create_questions(self.category, 2))
+        create_user_attempt(self.students[0], quiz)
+        client = APIClient()
+        client.force_authenticate(
+            Profile.objects.create_user("admin", "password", is_staff=True)
+        )
+        response = client.post(f"/api/v1/quiz/grade-quiz/{quiz.id}/")
+        self.assertEqual(response.json(), {"graded": 1})
+        client.force_authenticate(self.students[0])
+        self.assertEqual(
+            client.post(f"/api/v1/quiz/grade-quiz/{quiz.id}/").status_code, 403
+        )
+
+
+class SweeperTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.quiz = create_quiz(
+            create_questions(QuestionCategory.objects.create(name="History"), 3)
+        )
+        self.attempts = [
+            create_user_attempt(
+                Profile.objects.create_user(f"student{index}", "password"), self.quiz
+            )
+            for index in range(3)
+        ]
+
+    def test_expired_attempts_are_finalized(self):
+        expired, other_expired, running = self.attempts
+        end_time = timezone.now() - timedelta(minutes=1)
+        UserAttempt.objects.filter(pk__in=[expired.pk, other_expired.pk]).update(
+            end_time=end_time
+        )
+        answer_questions(expired, right=2)
+
+        self.assertEqual(finalize_expired_attempts(chunk_size=1), 2)
+        expired.refresh_from_db()
+        self.assertTrue(expired.is_completed)
+        self.assertEqual(expired.completed_at, end_time)
+        self.assertEqual(expired.results.get(group=None).score, 2.0)
+        self.assertEqual(LeaderboardEntry.objects.get(user_attempt=expired).score, 2.0)
+        running.refresh_from_db()
+        self.assertFalse(running.is_completed)
+        self.assertFalse(running.results.exists())
+
+        # Finalized attempts are not swept again
+        self.assertEqual(finalize_expired_attempts(), 0)
+
+    def test_unclaimed_attempts_are_deleted_after_the_quiz(self):
+        unclaimed = self.attempts[0]
+        UserAttempt.objects.filter(pk=unclaimed.pk).update(started_at=None)
+        self.assertEqual(delete_unclaimed_attempts(), 0)
+
+        Quiz.objects.filter(pk=self.quiz.pk).update(
+            end_time=timezone.now() - timedelta(minutes=1)
+        )
+        self.assertEqual(delete_unclaimed_attempts(), 1)
+        self.assertFalse(UserAttempt.objects.filter(pk=unclaimed.pk).exists())
+        self.assertEqual(UserAttempt.objects.filter(quiz=self.quiz).count(), 2)
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.quiz = create_quiz(
+            create_questions(QuestionCategory.objects.create(name="Biology"), 3)
+        )
+        self.students = [
+            Profile.objects.create_user(f"student{index}", "password")
+            for index in range(4)
+        ]
+        self.attempts = [
+            create_user_attempt(student, self.quiz) for student in self.students
+        ]
+        self.client = APIClient()
+
+    def finish(self, attempts):
+        UserAttempt.objects.filter(pk__in=[attempt.pk for attempt in attempts]).update(
+            end_time=timezone.now() - timedelta(seconds=1)
+        )
+        return finalize_expired_attempts()
+
+    def leaderboard(self, user):
+        self.client.force_authenticate(user)
+        return self.client.get(f"/api/v1/quiz/leaderboard/{self.quiz.id}/")
+
+    def select_correct_option(self, attempt):
+        self.client.force_authenticate(attempt.user)
+        question = attempt.instance_questions.filter(selected_option=None).first()
+        response = self.client.post(
+            "/api/v1/quiz/select-option/",
+            {
+                "questionId": question.id,
+                "optionId": question.options.get(option__is_correct=True).id,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(QUIZ_LEADERBOARD_DELAY=0)
+    def test_answers_reach_the_leaderboard_after_commit(self):
+        for attempt, right in zip(self.attempts, (2, 2, 1, 0)):
+            answer_questions(attempt, right=right, wrong=1)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.select_correct_option(self.attempts[3])
+        # Nothing is written on the click path
+        self.assertFalse(LeaderboardEntry.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            list(LeaderboardEntry.objects.values_list("user_attempt", "score")),
+            [(self.attempts[3].id, 1.0)],
+        )
+        staff = Profile.objects.create_user("admin", "password", is_staff=True)
+        self.assertEqual(self.leaderboard(staff).json()["participants"], 1)
+
+        self.assertEqual(self.finish(self.attempts), 4)
+        self.assertEqual(
+            [
+                (entry["username"], entry["score"], entry["rank"])
+                for entry in top_entries(self.quiz.id, 10)
+            ],
+            [
+                ("student0", 2.0, 1),
+                ("student1", 2.0, 1),
+                # Ties keep the order the entries were written in
+                ("student3", 1.0, 3),
+                ("student2", 1.0, 3),
+            ],
+        )
+        self.assertEqual(score_rank(self.quiz.id, 1.0), (3, 4))
+        self.assertEqual(score_rank(self.quiz.id), (None, 4))
+
+    def test_students_see_results_when_they_are_final(self):
+        first, second = self.students[:2]
+        answer_questions(self.attempts[0], right=1)
+        self.assertEqual(self.leaderboard(first).status_code, 403)
+        staff = Profile.objects.create_user("admin", "password", is_staff=True)
+        self.assertEqual(self.leaderboard(staff).status_code, 200)
+
+        # The own attempt is completed, the quiz is still running
+        self.finish(self.attempts[:1])
+        response = self.leaderboard(first)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["me"]["rank"], 1)
+        self.assertEqual(response.json()["participants"], 1)
+        self.assertEqual(self.leaderboard(second).status_code, 403)
+
+        Quiz.objects.filter(pk=self.quiz.pk).update(
+            end_time=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(self.leaderboard(second).status_code, 200)
+
+    @override_settings(QUIZ_LEADERBOARD_DELAY=5)
+    def test_answers_are_batched(self):
+        with mock.patch("quiz.api.leaderboard.threading.Timer") as timer:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.select_correct_option(self.attempts[0])
+            with self.captureOnCommitCallbacks(execute=True):
+                self.select_correct_option(self.attempts[0])
+                self.select_correct_option(self.attempts[1])
+        # One flush is scheduled for every answer of the window
+        timer.assert_called_once()
+        self.assertFalse(LeaderboardEntry.objects.exists())
+
+        flush_leaderboard_updates()
+        self.assertEqual(
+            [
+                (entry["username"], entry["score"], entry["rank"])
+                for entry in top_entries(self.quiz.id, 10)
+            ],
+            [("student0", 2.0, 1), ("student1", 1.0, 2)],
+        )
+
+
+class QuestionAnalysisTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.questions = create_questions(
+            QuestionCategory.objects.create(name="Geography"), 2
+        )
+        self.quiz = create_quiz(self.questions)
+        self.attempts = [
+            create_user_attempt(
+                Profile.objects.create_user(f"student{index}", "password"), self.quiz
+            )
+            for index in range(5)
+        ]
+        for attempt, (right, wrong) in zip(self.attempts, [(2, 0), (1, 1), (0, 1)]):
+            answer_questions(attempt, right=right, wrong=wrong)
+        # The last attempt is still running and not analyzed
+        answer_questions(self.attempts[-1], right=2)
+        UserAttempt.objects.filter(
+            pk__in=[attempt.pk for attempt in self.attempts[:-1]]
+        ).update(is_completed=True)
+
+    def test_item_statistics(self):
+        self.assertEqual(analyze_questions(chunk_size=3), 2)
+        first, second = (
+            QuestionStatistics.objects.get(question=question)
+            for question in self.questions
+        )
+        self.assertEqual(first.responses, 4)
+        self.assertEqual(first.p_value, 0.5)
+        self.assertEqual(first.omitted_rate, 0.25)
+        # Correlation of the first item with the score on the second one
+        self.assertAlmostEqual(first.discrimination, 3**-0.5)
+        self.assertEqual(second.p_value, 0.25)
+        self.assertEqual(second.omitted_rate, 0.5)
+
+        correct = self.questions[0].options.get(is_correct=True).id
+        wrong = (
+            self.attempts[2]
+            .instance_questions.get(question=self.questions[0])
+            .selected_option_id
+        )
+        rates = {
+            str(option_id): 0.0
+            for option_id in self.questions[0].options.values_list("id", flat=True)
+        }
+        rates.update({str(correct): 0.5, str(wrong): 0.25})
+        self.assertEqual(first.option_rates, rates)
+
+    def test_unanswered_questions_have_no_statistics(self):
+        UserAttempt.objects.update(is_completed=False)
+        QuestionStatistics.objects.create(question=self.questions[0], responses=1)
+        self.assertEqual(analyze_questions(), 0)
+        self.assertFalse(QuestionStatistics.objects.exists())
+
+
+class ExportResultsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = QuestionCategory.objects.create(name="Literature")
+        self.student = Profile.objects.create_user(
+            "student", "password", first_name="Ali", last_name="Valiyev"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(
+            Profile.objects.create_user("admin", "password", is_staff=True)
+        )
+
+    def export(self, quiz):
+        response = self.client.get(f"/api/v1/quiz/export-results/{quiz.id}/")
+        self.assertEqual(response.status_code, 200)
+        content = b"".join(response.streaming_content).decode()
+        return list(csv.reader(content.splitlines()))
+
+    def test_fixed_questions(self):
+        quiz = create_quiz(create_questions(self.category, 3))
+        attempt = create_user_attempt(self.student, quiz)
+        answer_questions(attempt, right=1, wrong=1)
+        wrong = attempt.instance_questions.get(question_order=1).selected_option
+        # The export writes the times as they are stored
+        attempt.refresh_from_db()
+
+        header, row = self.export(quiz)
+        self.assertEqual(header[-4:], ["Score", "Q1", "Q2", "Q3"])
+        self.assertEqual(
+            row,
+            [
+                str(attempt.id),
+                "student",
+                "Ali",
+                "Valiyev",
+                attempt.started_at.isoformat(),
+                "",
+                "1",
+                "1.0",
+                "A",
+                "ABCD"[wrong.order_number - 1],
+                "",
+            ],
+        )
+
+    def test_grouped_questions(self):
+        # A group of 2 random questions and a group with all 3 questions of
+        # its category, numbered from 0 in each group
+        other_category = QuestionCategory.objects.create(name="Poetry")
+        for category in (self.category, other_category):
+            create_questions(category, 3)
+        quiz = create_grouped_quiz([self.category, other_category], 2)
+        QuizQuestionGroup.objects.filter(quiz=quiz, group=other_category).update(
+            random_questions=False
+        )
+        attempt = create_user_attempt(self.student, quiz)
+        answer_questions(attempt, right=3)
+
+        header, row = self.export(quiz)
+        self.assertEqual(header[8:], ["Q1", "Q2", "Q3", "Q4", "Q5"])
+        self.assertEqual(row[6:], ["3", "3.0", "A", "A", "A", "", ""])
+
+
+class QuestionImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = QuestionCategory.objects.create(name="Grammar")
+        self.client = APIClient()
+        self.client.force_authenticate(
+            Profile.objects.create_user("admin", "password", is_staff=True)
+        )
+
+    def upload(self, lines, **data):
+        content = "\n".join(json.dumps(line) for line in lines).encode()
+        return self.client.post(
+            "/api/v1/quiz/question-import/",
+            {"file": SimpleUploadedFile("questions.jsonl", content), **data},
+        )
+
+    def test_valid_rows_are_imported(self):
+        response = self.upload(
+            [
+                {"question": "2 + 2", "correct": "4", "options": ["3", "5"]},
+                {"question": "", "correct": "1", "options": ["2"]},
+                {"question": "3 + 3", "correct": "6", "options": ["7"], "score": 2},
+                {"question": "1 + 1", "correct": "2", "category": 999},
+            ],
+            category=self.category.id,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.json()["errors"],
+            [
+                {"row": 2, "detail": "Question text is empty"},
+                {"row": 4, "detail": "Category 999 does not exist"},
+            ],
+        )
+        questions = Question.objects.filter(category=self.category).order_by("id")
+        self.assertEqual([question.score for question in questions], [1.0, 2.0])
+        self.assertEqual(
+            sorted(questions[0].options.values_list("body_text", "is_correct")),
+            [("3", False), ("4", True), ("5", False)],
+        )
+
+    def test_unknown_category_is_refused(self):
+        line = {"question": "2 + 2", "correct": "4", "options": ["3"]}
+        for dry_run in (True, False):
+            response = self.upload([line], category=999, dry_run=dry_run)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {"detail": "Category 999 does not exist"})
+        self.assertFalse(Question.objects.exists())
+
+    def test_questions_are_counted_once(self):
+        line = {"question": "2 + 2", "correct": "4", "options": ["3"]}
+        # Without RETURNING on bulk inserts the questions are saved one by one
+        for total, can_return in ((2, True), (4, False)):
+            with mock.patch.object(
+                type(connection.features),
+                "can_return_rows_from_bulk_insert",
+                can_return,
+            ):
+                response = self.upload([line, line], category=self.category.id)
+            self.assertEqual(response.status_code, 201)
+            self.category.refresh_from_db()
+            self.assertEqual(self.category.total_questions, total)
+        self.assertEqual(stale_counters(), {})
+
+
+class QuestionSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.biology = QuestionCategory.objects.create(name="Biology")
+        self.chemistry = QuestionCategory.objects.create(name="Chemistry")
+        self.client = APIClient()
+        self.client.force_authenticate(
+            Profile.objects.create_user("admin", "password", is_staff=True)
+        )
+
+    def create(self, category, body_text, *options):
+        # The index is written when the question is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            question = Question.objects.create(category=category, body_text=body_text)
+            for order, text in enumerate(options, start=1):
+                QuestionOption.objects.create(
+                    question=question, body_text=text, order_number=order
+                )
+        return question
+
+    def search(self, text, **params):
+        response = self.client.get("/api/v1/quiz/question/", {"search": text, **params})
+        self.assertEqual(response.status_code, 200)
+        return [question["id"] for question in response.json()["results"]]
+
+    def test_best_match_comes_first(self):
+        weak = self.create(self.biology, "Which organelle holds the membrane protein")
+        strong = self.create(self.biology, "Membrane of the cell", "Cell membrane")
+        self.create(self.biology, "Photosynthesis")
+        self.assertEqual(self.search("membrane"), [strong.id, weak.id])
+        # Every word has to match, as a prefix
+        self.assertEqual(self.search("memb prot"), [weak.id])
+        # Option text is searched too
+        self.assertEqual(search_question_ids("cell membrane"), [strong.id])
+
+    def test_number_matches_the_id(self):
+        question = self.create(self.chemistry, "Atomic mass of carbon")
+        same = self.create(self.chemistry, f"Question {question.id}")
+        self.assertEqual(self.search(str(question.id)), [question.id, same.id])
+        # A question matching both ways is listed once
+        self.assertEqual(self.search(str(same.id)), [same.id])
+
+    def test_category_filter(self):
+        first = self.create(self.biology, "Water cycle")
+        second = self.create(self.chemistry, "Water molecule")
+        self.assertEqual(sorted(self.search("water")), [first.id, second.id])
+        self.assertEqual(self.search("water", category=self.chemistry.id), [second.id])
+        self.assertEqual(search_question_ids("water", self.biology.id), [first.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(search_question_ids("water"), [first.id])
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = QuestionCategory.objects.create(name="Optics")
+        self.quiz_category = QuizCategory.objects.create(name="Olympiad")
+        self.students = [
+            Profile.objects.create_user(f"student{index}", "password")
+            for index in range(3)
+        ]
+
+    def counters(self, *rows):
+        for row in rows:
+            row.refresh_from_db()
+        self.assertEqual(stale_counters(), {})
+
+    def test_signals_move_the_counters(self):
+        questions = create_questions(self.category, 3)
+        quiz = create_quiz(questions[:2], category=self.quiz_category)
+        QuizQuestionGroup.objects.create(
+            quiz=quiz, title="Optics", group=self.category, total_questions=2
+        )
+        AllowedUser.objects.create(quiz=quiz, user=self.students[0])
+        self.counters(self.category, self.quiz_category, quiz)
+        self.assertEqual(self.category.total_questions, 3)
+        self.assertEqual(self.quiz_category.total_quizes, 1)
+        self.assertEqual((quiz.quiz_question_count, quiz.group_question_count), (2, 2))
+        self.assertEqual(quiz.total_participants, 1)
+
+        other_category = QuestionCategory.objects.create(name="Mechanics")
+        questions[2].category = other_category
+        questions[2].save()
+        questions[0].delete()
+        quiz.category = None
+        quiz.save()
+        self.counters(self.category, other_category, self.quiz_category, quiz)
+        self.assertEqual(self.category.total_questions, 1)
+        self.assertEqual(other_category.total_questions, 1)
+        self.assertEqual(self.quiz_category.total_quizes, 0)
+        self.assertEqual(quiz.quiz_question_count, 1)
+
+    def test_bulk_allowed_users(self):
+        grade = Grade.objects.create(name="9")
+        Profile.objects.filter(pk__in=[s.pk for s in self.students]).update(grade=grade)
+        quiz = create_quiz(create_questions(self.category, 1), access="private")
+        client = APIClient()
+        client.force_authenticate(
+            Profile.objects.create_user("admin", "password", is_staff=True)
+        )
+
+        client.post(
+            f"/api/v1/quiz/allowed-grade/{quiz.id}/",
+            {"values": [grade.id]},
+            format="json",
+        )
+        self.counters(quiz)
+        self.assertEqual(quiz.total_participants, 3)
+        client.delete(
+            f"/api/v1/quiz/allowed-user-bulk/{quiz.id}/",
+            {"values": [self.students[0].id]},
+            format="json",
+        )
+        self.counters(quiz)
+        self.assertEqual(quiz.total_participants, 2)
+
+    def test_save_keeps_counters_it_has_read(self):
+        stale = QuestionCategory.objects.get(pk=self.category.pk)
+        create_questions(self.category, 2)
+        stale.name = "Waves"
+        stale.save()
+        self.counters(self.category)
+        self.assertEqual(self.category.total_questions, 2)
+
+    def test_repair(self):
+        create_questions(self.category, 2)
+        QuestionCategory.objects.update(total_questions=5)
+        self.assertEqual(
+            stale_counters(),
+            {("QuestionCategory", "total_questions"): [self.category.pk]},
+        )
+        repair_counters()
+        self.counters(self.category)
+        self.assertEqual(self.category.total_questions, 2)
+
+
+class BlueprintCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = QuestionCategory.objects.create(name="Statistics")
+        self.questions = create_questions(self.category, 4)
+        self.quiz = create_quiz(self.questions[:2])
+
+    def assertDropped(self, change):
+        get_quiz_blueprint(self.quiz)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.assertIsNone(cache.get(blueprint_cache_key(self.quiz.id)))
+        return get_quiz_blueprint(self.quiz)
+
+    def test_quiz_changes(self):
+        self.quiz.has_random_options = True
+        blueprint = self.assertDropped(self.quiz.save)
+        self.assertTrue(blueprint["random_options"])
+
+    def test_quiz_question_changes(self):
+        added = self.assertDropped(
+            lambda: QuizQuestion.objects.create(
+                quiz=self.quiz, question=self.questions[2], order_number=3
+            )
+        )
+        self.assertEqual(len(added["question_ids"]), 3)
+        removed = self.assertDropped(
+            lambda: QuizQuestion.objects.get(question=self.questions[0]).delete()
+        )
+        self.assertEqual(
+            sorted(removed["question_ids"].tolist()),
+            [self.questions[1].id, self.questions[2].id],
+        )
+
+    def test_question_group_changes(self):
+        self.quiz = create_grouped_quiz([self.category], 2)
+        group = self.quiz.question_groups.get()
+        group.point = 3
+        blueprint = self.assertDropped(group.save)
+        self.assertEqual(blueprint["groups"][0]["point"], 3)
+        blueprint = self.assertDropped(group.delete)
+        self.assertEqual(blueprint["groups"], [])
+
+    def test_bulk_update(self):
+        client = APIClient()
+        client.force_authenticate(
+            Profile.objects.create_user("admin", "password", is_staff=True)
+        )
+        ids = list(self.quiz.quiz_questions.values_list("id", flat=True))
+        blueprint = self.assertDropped(
+            lambda: client.put(
+                "/api/v1/quiz/quiz-question-bulk/",
+                {"objects": ids, "score": 3},
+                format="json",
+            )
+        )
+        self.assertEqual(blueprint["scores"].tolist(), [3.0, 3.0])
+
+
+class QuestionPoolTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.categories = [
+            QuestionCategory.objects.create(name=name) for name in ("Logic", "Sets")
+        ]
+        self.questions = create_questions(self.categories[0], 3)
+
+    def pools(self):
+        pools = get_category_pools([category.id for category in self.categories])
+        return [sorted(pools[category.id].tolist()) for category in self.categories]
+
+    def test_pools_follow_the_questions(self):
+        first, second, third = (question.id for question in self.questions)
+        self.assertEqual(self.pools(), [[first, second, third], []])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added = Question.objects.create(
+                category=self.categories[1], body_text="New"
+            )
+        self.assertEqual(self.pools(), [[first, second, third], [added.id]])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.questions[0].category = self.categories[1]
+            self.questions[0].save()
+        self.assertEqual(self.pools(), [[second, third], [first, added.id]])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.questions[1].delete()
+        self.assertEqual(self.pools(), [[third], [first, added.id]])
+
+    def test_pools_are_dropped_after_the_commit(self):
+        self.pools()
+        Question.objects.create(category=self.categories[0], body_text="New")
+        # Other transactions still see the old rows until the commit
+        self.assertIsNotNone(cache.get(pool_cache_key(self.categories[0].id)))
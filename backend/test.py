@@ -1,3 +1,5 @@
+import csv
+import json
 import openpyxl
 
 questions = [
@@ -205,6 +207,51 @@ def export_to_excel(questions, filename):
     print(f"Questions exported to {filename} successfully.")
 
 
-# Export questions to an Excel file
-filename = "questions.xlsx"
-export_to_excel(questions, filename)
\ No newline at end of file
+def question_options(question):
+    return [
+        question[f"option_{index}"]
+        for index in range(1, 9)
+        if question.get(f"option_{index}", None)
+    ]
+
+
+def export_to_csv(questions, filename):
+    with open(filename, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        # Columns after the options are read as score and category
+        options = max(len(question_options(question)) for question in questions)
+        writer.writerow(
+            [
+                "Question",
+                "Correct Option",
+                *(f"Option {i}" for i in range(2, options + 1)),
+            ]
+        )
+        for question in questions:
+            writer.writerow([question["question_text"], *question_options(question)])
+
+    print(f"Questions exported to {filename} successfully.")
+
+
+def export_to_jsonl(questions, filename):
+    with open(filename, "w", encoding="utf-8") as file:
+        for question in questions:
+            correct, *options = question_options(question)
+            record = {
+                "question": question["question_text"],
+                "correct": correct,
+                "options": options,
+            }
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    print(f"Questions exported to {filename} successfully.")
+
+
+if __name__ == "__main__":
+    # Export questions to an Excel file
+    filename = "questions.xlsx"
+    export_to_excel(questions, filename)
+
+    # CSV and JSON Lines files load much faster through /quiz/question-import/
+    export_to_csv(questions, "questions.csv")
+    export_to_jsonl(questions, "questions.jsonl")
@@ -12,6 +12,10 @@ import { formatTime } from "./QuizCard";
 import useAxiosPrivate from "../../../Hooks/useAxiosPrivate";
 import { useNavigate } from "react-router-dom";
 
+// A queued start whose build was lost fails within a minute on the server,
+// stop polling well after that
+const TICKET_POLL_TIMEOUT = 90 * 1000;
+
 type Props = {
 	open: boolean;
 	setOpen: (open: boolean) => void;
@@ -22,26 +26,41 @@ const StartDialog = ({ open, setOpen, quiz }: Props) => {
 	const axiosPrivate = useAxiosPrivate();
 	const navigate = useNavigate();
 	const [loading, setLoading] = useState(true); // New state variable for loading
+	const [error, setError] = useState("");
 
 	useEffect(() => {
 		if (open) {
 			setLoading(false);
+			setError("");
 		}
 	}, [open]);
 
 	const startQuiz = async () => {
 		try {
 			setLoading(true); // Set loading to true when starting the quiz
-			const response = await axiosPrivate.post(
+			setError("");
+			let response = await axiosPrivate.post(
 				`/quiz/start-quiz/${quiz?.id}/`
 			);
+			// Attempts may be built in the background, poll the ticket
+			const ticket = response.data["ticket"];
+			const deadline = Date.now() + TICKET_POLL_TIMEOUT;
+			while (response.status === 202) {
+				if (Date.now() > deadline) {
+					throw new Error("Start timed out");
+				}
+				await new Promise((resolve) => setTimeout(resolve, 1000));
+				response = await axiosPrivate.get(
+					`/quiz/start-quiz/ticket/${ticket}/`
+				);
+			}
 			if (response.status === 200) {
 				setLoading(false); // Set loading back to false when the request is successful
 				navigate(`/user/attempt/${response.data["attempt_id"]}`);
 			}
 		} catch (error) {
 			setLoading(false); // Set loading back to false in case of an error
-			// Handle error (e.g., show an error message)
+			setError("The quiz could not be started, please try again.");
 		}
 	};
 
@@ -82,6 +101,11 @@ const StartDialog = ({ open, setOpen, quiz }: Props) => {
 				</Typography>
 			</DialogBody>
 			<DialogFooter>
+				{error && (
+					<Typography color="red" className="mb-3 w-full text-center">
+						{error}
+					</Typography>
+				)}
 				<Button
 					variant="gradient"
 					onClick={startQuiz}
@@ -1,4 +1,5 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
+import { isAxiosError } from "axios";
 import useAxiosPrivate from "../../../Hooks/useAxiosPrivate";
 import { QuestionGroup, QuizCategory } from "../Quizes/Grid";
 import { useNavigate, useParams } from "react-router-dom";
@@ -25,6 +26,30 @@ type Question = {
 	options: Option[];
 };
 
+type PaperOption = {
+	id: number;
+	body_text: string | null;
+	body_photo: string | null;
+};
+
+type PaperQuestion = {
+	id: number;
+	body_text: string | null;
+	body_photo: string | null;
+	options: PaperOption[];
+};
+
+type CompactQuestion = {
+	id: number;
+	group: number | null;
+	question: number;
+	question_order: number;
+	options: number[];
+	paper_options: number[];
+	selected: number | null;
+	version: number;
+};
+
 type Quiz = {
 	id: number;
 	title: string;
@@ -67,19 +92,66 @@ const UserAttemptPage = () => {
 	);
 	const navigate = useNavigate();
 	const axiosPrivate = useAxiosPrivate();
+	// Clicks are coalesced per question and sent in batches, each answer
+	// carries the version of the question it was made on
+	const versions = useRef(new Map<number, number>());
+	const pending = useRef(new Map<number, number>());
+	const flushTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
+	const flushing = useRef(false);
+	const unmounted = useRef(false);
 
 	const fetchData = async () => {
 		try {
+			// The attempt only holds ordering and selections, the question
+			// content comes from the cacheable attempt paper
 			const response = await axiosPrivate.get(
-				`/quiz/user-attempt/${attemptId}/`
+				`/quiz/user-attempt/${attemptId}/?compact=1`
 			);
 			const data = response.data;
+			const paperResponse = await axiosPrivate.get(
+				`/quiz/user-attempt/${attemptId}/paper/?v=${data.paper_version}`
+			);
+			const paper = new Map<number, PaperQuestion>(
+				paperResponse.data.questions.map((question: PaperQuestion) => [
+					question.id,
+					question,
+				])
+			);
+			const questions: Question[] = data.questions.map(
+				(question: CompactQuestion) => {
+					versions.current.set(question.id, question.version);
+					const content = paper.get(question.question)!;
+					const options = new Map<number, PaperOption>(
+						content.options.map((option) => [option.id, option])
+					);
+					return {
+						id: question.id,
+						group: question.group,
+						question_order: question.question_order,
+						body_text: content.body_text,
+						body_photo: content.body_photo,
+						options: question.options.map((id, index) => {
+							const option = options.get(
+								question.paper_options[index]
+							)!;
+							return {
+								id,
+								body_text: option.body_text,
+								body_photo: option.body_photo,
+								option_order: index,
+								selected: id === question.selected,
+							};
+						}),
+					};
+				}
+			);
 			setAttempt({
 				...data,
+				questions,
 				started_at: new Date(data.start_time),
 				end_time: new Date(data.end_time),
 			});
-			setSelectedQuestion(data.questions[0] || null);
+			setSelectedQuestion(questions[0] || null);
 		} catch {
 			navigate("/user");
 		}
@@ -114,14 +186,81 @@ const UserAttemptPage = () => {
 					: question
 			),
 		});
-		await axiosPrivate.post("/quiz/select-option/", {
-			questionId,
-			optionId,
-		});
+		pending.current.set(questionId, optionId);
+		scheduleFlush(300);
+	};
+
+	const scheduleFlush = (delay: number) => {
+		if (flushTimer.current || unmounted.current) return;
+		flushTimer.current = setTimeout(flushAnswers, delay);
+	};
+
+	const flushAnswers = async () => {
+		flushTimer.current = null;
+		if (!pending.current.size) return;
+		if (flushing.current) {
+			scheduleFlush(300);
+			return;
+		}
+		flushing.current = true;
+		const answers = Array.from(pending.current.entries()).map(
+			([questionId, optionId]) => ({
+				questionId,
+				optionId,
+				version: versions.current.get(questionId) ?? 0,
+			})
+		);
+		pending.current.clear();
+		try {
+			const response = await axiosPrivate.post("/quiz/select-options/", {
+				attemptId: Number(attemptId),
+				answers,
+			});
+			const selections: Record<string, [number | null, number]> =
+				response.data.selections;
+			Object.entries(selections).forEach(([questionId, [, version]]) =>
+				versions.current.set(Number(questionId), version)
+			);
+			// Answers sent with an outdated version are resent once the
+			// current version is known
+			answers.forEach(({ questionId, optionId, version }) => {
+				if (
+					response.data.rejected.includes(questionId) &&
+					versions.current.get(questionId) !== version &&
+					!pending.current.has(questionId)
+				) {
+					pending.current.set(questionId, optionId);
+				}
+			});
+		} catch (error) {
+			if (isAxiosError(error) && error.response) {
+				// Refused (the attempt is over or not ours), sending the
+				// answers again can't succeed, show what the server holds
+				if (!unmounted.current) fetchData();
+			} else {
+				// Lost on the network, retry unless a newer click replaced
+				// the answer meanwhile
+				answers.forEach(({ questionId, optionId }) => {
+					if (!pending.current.has(questionId)) {
+						pending.current.set(questionId, optionId);
+					}
+				});
+				scheduleFlush(2000);
+			}
+		} finally {
+			flushing.current = false;
+		}
+		if (pending.current.size) scheduleFlush(300);
 	};
 
 	useEffect(() => {
 		fetchData();
+		return () => {
+			// Send the last clicks once, without retries
+			unmounted.current = true;
+			if (flushTimer.current) clearTimeout(flushTimer.current);
+			flushAnswers();
+		};
 	}, []);
 
 	if (!attempt) {